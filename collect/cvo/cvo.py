@@ -5,17 +5,30 @@ functions to support retrieving tabular data from CVO monthly report PDFs
 """
 # -*- coding: utf-8 -*-
 import calendar
+import concurrent.futures
 import datetime as dt
+import hashlib
+import importlib.util
+import io
+import json
 import os
+import pathlib
+import shutil
+import tempfile
+import threading
+import time
 
 import dateutil.parser
 import pandas as pd
-import requests
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from collect import utils
 
 try:
-    from tabula import read_pdf
+    from tabula import convert_into_by_batch, read_pdf
 except:
-    print('Module tabula is required for CVO report collection.  Install with `pip install tabula-py==2.4.0`')
+    print('Module tabula is required for CVO report collection.  Install with `pip install tabula-py==2.10.0`')
 
 
 REPORTS = [
@@ -56,6 +69,11 @@ SUPPORTED_REPORTS = [
     'slunit',
 ]
 
+# increment when changes to the report parsers change the parsed output
+PARSER_VERSION = 2
+
+_STORE_LOCK = threading.Lock()
+
 
 def get_area(date_structure, report_type):
     """
@@ -255,14 +273,20 @@ def get_area(date_structure, report_type):
     return area
 
 
-def get_data(start, end, report_type):
+def get_data(start, end, report_type, parallel=False, workers=None, chunksize=1, cache=True):
     """
-    retrieve CVO report data spanning multiple months, as specified by query date range
+    retrieve CVO report data spanning multiple months, as specified by query date range; in parallel mode,
+    reports are downloaded concurrently and parsed on a process pool.  Parsed months are stored locally
+    and only re-parsed when the report content or PARSER_VERSION changes
 
     Arguments:
         start (datetime.date): start date given in datetime format
         end (datetime.date): end date given in datetime format
         report_type (str): specifies the CVO report type
+        parallel (bool): flag to parse months on a process pool
+        workers (int): number of concurrent downloads and extraction/parsing processes; defaults to the CPU count
+        chunksize (int): number of months sent to each parsing process at a time
+        cache (bool): flag to read/write parsed months from the local parsed dataset (one parquet file per month)
     Returns:
         result (dict): dictionary of data and metadata of report
     """
@@ -280,27 +304,60 @@ def get_data(start, end, report_type):
     info = {'urls': [],
             'title': get_title(report_type),
             'dates published': [],
-            'date retrieved': dt.datetime.now()}
-
-    # loop through all months in defined date range
-    frames = []
-    for date_structure in months_between(start, end):
+            'date retrieved': dt.datetime.now(),
+            'errors': []}
+
+    # retrieve report files; archived months are read from the local report store
+    workers = workers or os.cpu_count()
+    files = _get_report_files(list(months_between(start, end)), report_type, workers=workers)
+
+    # reuse stored parsed months when the report content and parser version are unchanged; the current
+    # month is always re-parsed, as its target areas depend on the current day
+    current = dt.date.today().replace(day=1)
+    reports = {}
+    for date_structure, path in files.items():
+        if not cache or isinstance(path, Exception) or date_structure == current:
+            continue
+        stored = get_parsed_month(report_type, date_structure, sha256=path.stem)
+        if stored is not None:
+            reports[date_structure] = {'data': stored['data'],
+                                       'info': {'url': stored['url'], 'date_published': stored['date_published']}}
+
+    # parse the new, current or changed months; only these months are written to the parsed dataset
+    pending = {k: v for k, v in files.items() if k not in reports}
+    if pending:
+        if parallel:
+            reports.update(_get_reports_parallel(pending, report_type, workers=workers, chunksize=chunksize))
+        else:
+            reports.update(_get_reports(pending, report_type))
 
-        try:
-            # extract report content for month/year
-            report = get_report(date_structure, report_type)
+        if cache:
+            for date_structure in pending:
+                report = reports[date_structure]
+                if not isinstance(report, Exception):
+                    _save_parsed_month(report_type, date_structure, {'sha256': files[date_structure].stem,
+                                                                     'url': report['info']['url'],
+                                                                     'date_published': report['info']['date_published'],
+                                                                     'data': report['data']})
 
-            # append report-specific info to query result metadata
-            info['urls'].append(report['info']['url'])
-            # info['dates published'].append(report['info']['date published'])
+    reports = {k: reports[k] for k in files}
 
-            # append dataframes for each month
-            frames.append(report['data'])
+    # combine months in order, recording a structured error for each month that could not be retrieved
+    frames = []
+    for date_structure, report in reports.items():
+        if isinstance(report, Exception):
+            info['errors'].append({'date': date_structure,
+                                   'url': get_url(date_structure, report_type),
+                                   'error': type(report).__name__,
+                                   'message': str(report)})
+            continue
 
-            print(f'SUCCESS: {report_type} {date_structure:%b %Y}')
+        # append report-specific info to query result metadata
+        info['urls'].append(report['info']['url'])
+        info['dates published'].append(report['info']['date_published'])
 
-        except:
-            print(f'ERROR: {report_type} {date_structure:%b %Y}')
+        # append dataframes for each month
+        frames.append(report['data'])
 
     # concatenate and set index for all appended dataframes
     df = pd.concat(frames, axis=0)
@@ -315,6 +372,241 @@ def get_data(start, end, report_type):
             'info': info}
 
 
+def _get_reports(files, report_type):
+    """
+    Arguments:
+        files (dict): report store paths (or the exception raised retrieving the report) keyed by month
+        report_type (str): specifies the CVO report type
+    Returns:
+        reports (dict): get_report results (or the exception raised) keyed by month
+    """
+    months = list(files)
+
+    # extract the tables for all PDF reports in the date range with a single tabula engine
+    jobs = {x: (str(path), [get_area(x, report_type), get_publish_area(x, report_type)])
+            for x, path in files.items() if not isinstance(path, Exception) and path.suffix == '.pdf'}
+    tables = read_pdf_tables(jobs)
+
+    # loop through all months in defined date range
+    reports = {}
+    for date_structure in months:
+
+        try:
+            # raise any retrieval or extraction error for the month's report
+            if isinstance(files[date_structure], Exception):
+                raise files[date_structure]
+            content = tables.get(date_structure)
+            if isinstance(content, Exception):
+                raise content
+
+            # extract report content for month/year
+            reports[date_structure] = get_report(date_structure, report_type, content=content)
+
+        except Exception as error:
+            reports[date_structure] = error
+
+    return reports
+
+
+def _get_reports_parallel(files, report_type, workers, chunksize=1):
+    """
+    extract the report tables and parse the months on a process pool; PDF reports are split into `workers`
+    chunks of consecutive months, each extracted with its own tabula engine
+
+    Arguments:
+        files (dict): report store paths (or the exception raised retrieving the report) keyed by month
+        report_type (str): specifies the CVO report type
+        workers (int): number of extraction and parsing processes
+        chunksize (int): number of months sent to each parsing process at a time
+    Returns:
+        reports (dict): get_report results (or the exception raised) keyed by month, in month order
+    """
+    months = list(files)
+    content = dict(files)
+
+    # text reports are read from the report store; an unreadable file is recorded for its month only
+    for date_structure, path in files.items():
+        if not isinstance(path, Exception) and path.suffix != '.pdf':
+            try:
+                content[date_structure] = path.read_text(encoding='utf-8')
+            except Exception as error:
+                content[date_structure] = error
+
+    jobs = {x: (str(path), [get_area(x, report_type), get_publish_area(x, report_type)])
+            for x, path in files.items() if not isinstance(path, Exception) and path.suffix == '.pdf'}
+    keys = list(jobs)
+    size = -(-len(keys) // workers) if keys else 1
+    chunks = [{x: jobs[x] for x in keys[i:i + size]} for i in range(0, len(keys), size)]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        for tables in executor.map(_read_pdf_tables_chunk, chunks):
+            content.update(tables)
+
+        # results are returned in submission order
+        items = [(x, report_type, content[x]) for x in months]
+        return dict(zip(months, executor.map(_parse_report, items, chunksize=chunksize)))
+
+
+def _read_pdf_tables_chunk(jobs):
+    """
+    process-pool entry point for read_pdf_tables
+
+    Arguments:
+        jobs (dict): (path, areas) tuples keyed by report month
+    Returns:
+        (dict): lists of tables keyed by report month, or the exception for failed months
+    """
+    return read_pdf_tables(jobs, workers=1)
+
+
+def get_parsed_month(report_type, date_structure, sha256=None):
+    """
+    the locally stored parsed month for report_type; each month is stored as a parquet file with the parser
+    version, report hash, url and date published in the file metadata.  The month is ignored if it was written
+    by a different PARSER_VERSION or, when provided, for a different report hash
+
+    Arguments:
+        report_type (str): one of SUPPORTED_REPORTS
+        date_structure (datetime.date): the report month
+        sha256 (str): optional hash of the current report content
+    Returns:
+        entry (dict): the report hash, url, date published and data for the month, or None if not stored
+    """
+    path = _get_parsed_month_path(report_type, date_structure)
+    if not path.exists():
+        return None
+
+    # the metadata is read from the file footer before any data
+    metadata = json.loads(pq.read_schema(path).metadata[b'collect'])
+    if metadata['parser version'] != PARSER_VERSION or (sha256 is not None and metadata['sha256'] != sha256):
+        return None
+
+    return {'sha256': metadata['sha256'],
+            'url': metadata['url'],
+            'date_published': (dt.date.fromisoformat(metadata['date_published'])
+                               if metadata['date_published'] else None),
+            'data': pd.read_parquet(path)}
+
+
+def _save_parsed_month(report_type, date_structure, entry):
+    """
+    Arguments:
+        report_type (str): one of SUPPORTED_REPORTS
+        date_structure (datetime.date): the report month
+        entry (dict): the report hash, url, date published and data for the month
+    """
+    path = _get_parsed_month_path(report_type, date_structure)
+    table = pa.Table.from_pandas(entry['data'])
+    metadata = {'parser version': PARSER_VERSION,
+                'sha256': entry['sha256'],
+                'url': entry['url'],
+                'date_published': entry['date_published'].isoformat() if entry['date_published'] else None}
+    table = table.replace_schema_metadata({**table.schema.metadata, b'collect': json.dumps(metadata)})
+    pq.write_table(table, path.with_suffix('.tmp'))
+    os.replace(path.with_suffix('.tmp'), path)
+
+
+def _get_parsed_month_path(report_type, date_structure):
+    """
+    Arguments:
+        report_type (str): one of SUPPORTED_REPORTS
+        date_structure (datetime.date): the report month
+    Returns:
+        path (pathlib.Path): the parquet file for the parsed month
+    """
+    return utils.get_cache_dir('cvo', 'parsed', report_type).joinpath(f'{date_structure:%Y-%m}.parquet')
+
+
+def _get_report_files(months, report_type, workers=8):
+    """
+    Arguments:
+        months (list): report months represented as datetime.date objects
+        report_type (str): specifies the CVO report type
+        workers (int): number of concurrent downloads
+    Returns:
+        (dict): report store paths (or the exception raised retrieving the report) keyed by month
+    """
+    session = utils.get_session(pool_size=workers)
+    return utils.get_concurrent_results(lambda x: get_report_file(x, report_type, session=session), months, workers)
+
+
+def get_report_file(date_structure, report_type, session=None):
+    """
+    path to the local copy of a CVO report in the content-addressed report store; reports for past months
+    are downloaded once, and the current month's report is revalidated with a conditional request
+
+    Arguments:
+        date_structure (datetime.date): report month/year represented as a python datetime.date
+        report_type (str): one of SUPPORTED_REPORTS
+        session (requests.Session): optional session for connection reuse
+    Returns:
+        path (pathlib.Path): the stored report file
+    """
+    url = get_url(date_structure, report_type)
+    store = utils.get_cache_dir('cvo')
+    manifest_path = store.joinpath('manifest.json')
+
+    with _STORE_LOCK:
+        manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    entry = manifest.get(url)
+
+    # archived reports do not change; only the current month's report is revalidated
+    headers = {}
+    if entry is not None and store.joinpath(entry['path']).exists():
+        if date_structure.strftime('%Y-%m') != dt.date.today().strftime('%Y-%m'):
+            return store.joinpath(entry['path'])
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    response = (session or utils.get_session(pool_size=1)).get(url, headers=headers)
+    if response.status_code == 304:
+        return store.joinpath(entry['path'])
+    response.raise_for_status()
+
+    # report files are stored by content hash
+    digest = hashlib.sha256(response.content).hexdigest()
+    path = pathlib.Path('objects', f'{digest}{pathlib.PurePosixPath(url).suffix}')
+    if not store.joinpath(path).exists():
+        store.joinpath('objects').mkdir(exist_ok=True)
+        store.joinpath(f'{path}.tmp').write_bytes(response.content)
+        os.replace(store.joinpath(f'{path}.tmp'), store.joinpath(path))
+
+    with _STORE_LOCK:
+        manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+        manifest.update({url: {'url': url,
+                               'report_type': report_type,
+                               'month': f'{date_structure:%Y-%m}',
+                               'sha256': digest,
+                               'path': path.as_posix(),
+                               'etag': response.headers.get('ETag'),
+                               'last_modified': response.headers.get('Last-Modified'),
+                               'retrieved': dt.datetime.now().isoformat(timespec='seconds')}})
+        manifest_path.with_suffix('.tmp').write_text(json.dumps(manifest, indent=4))
+        os.replace(manifest_path.with_suffix('.tmp'), manifest_path)
+
+    return store.joinpath(path)
+
+
+def _parse_report(item):
+    """
+    process-pool entry point for get_report with previously retrieved content
+
+    Arguments:
+        item (tuple): report month, report type and the extracted tables or report text (or a retrieval exception)
+    Returns:
+        (dict or Exception): get_report result, or the exception raised retrieving or parsing the report
+    """
+    date_structure, report_type, content = item
+    if isinstance(content, Exception):
+        return content
+    try:
+        return get_report(date_structure, report_type, content=content)
+    except Exception as error:
+        return error
+
+
 def get_date_published(url, date_structure, report_type):
     """
     Arguments:
@@ -323,59 +615,82 @@ def get_date_published(url, date_structure, report_type):
     Returns:
         date_published (datetime.date): the extracted date of report
     """
-    date_published = None
+    # reports are read from the local report store
+    if url == get_url(date_structure, report_type):
+        url = str(get_report_file(date_structure, report_type))
 
     if url.endswith('.pdf'):
-
-        # delta daily outflow report
-        if report_type == 'doutdly':
-
-            # Dates of specific changes to pdf publish date sizing
-            publish_date_target = [566, 566, 700, 800]
-            today_date = dt.date.today()
-            if (date_structure.strftime('%Y-%m') == today_date.strftime('%Y-%m')
-                    or (dt.datetime(2020, 1, 1) <= date_structure <= dt.datetime(2020, 8, 1))
-                    or (dt.datetime(2019, 3, 1) <= date_structure <= dt.datetime(2019, 8, 1))
-                    or (dt.datetime(2022, 6, 1) <= date_structure <= today_date)):
-                publish_date_target = [900, 850, 1200.78, 1400.67]
-
-            pages = read_pdf(url,
-                             encoding='ISO-8859-1',
-                             stream=True,
-                             area=publish_date_target,
-                             pages=1,
-                             pandas_options={'header': None})
-
-            # check that a response is provided
-            if len(pages) > 0:
-                date_published = pages[0]
-                if len(date_published.values) > 0:
-                    date_published = dateutil.parser.parse(date_published.values[0][0]).date()
-
-        # all others
-        else:
-            pages = read_pdf(url,
-                             encoding='ISO-8859-1',
-                             stream=True,
-                             area=[10, 0, 13, 100],
-                             relative_area=True,
-                             pages=1,
-                             pandas_options={'header': None})
-
-            # check that a response is provided
-            if len(pages) > 0:
-                if len(pages[0].values) > 0:
-                    date_text = pages[0].values.tolist()[-1][-1].replace('Run Date:', '')
-                    date_published = dateutil.parser.parse(date_text).date()
+        tables = read_pdf_tables({url: (url, [get_publish_area(date_structure, report_type)])})[url]
+        if isinstance(tables, Exception):
+            raise tables
+        return _parse_date_published(tables[0] if len(tables) > 0 else None, report_type)
 
     # alernate report formats
     elif url.endswith('.prn') or url.endswith('.txt'):
-        content = pd.read_fwf(url, nrows=1).columns[0]
-        if content.startswith('Unnamed'):
-            return None
-        date_published = dateutil.parser.parse(pd.read_fwf(url, nrows=1).columns[0]).date()
+        return _parse_text_date_published(url)
+
+    return None
+
+
+def get_publish_area(date_structure, report_type):
+    """
+    target area of the report run date, in the tabula-java notation accepted by read_pdf_tables
+
+    Arguments:
+        date_structure (datetime.date): report month/year represented as a datetime
+        report_type(str): specifies the report table type
+    Returns:
+        area (str): area dimensions in order of: top, left, bottom, right; prefixed with '%' if relative
+    """
+    # delta daily outflow report
+    if report_type == 'doutdly':
+
+        # Dates of specific changes to pdf publish date sizing
+        report_date = dt.date(date_structure.year, date_structure.month, 1)
+        today_date = dt.date.today()
+        if (report_date.strftime('%Y-%m') == today_date.strftime('%Y-%m')
+                or (dt.date(2020, 1, 1) <= report_date <= dt.date(2020, 8, 1))
+                or (dt.date(2019, 3, 1) <= report_date <= dt.date(2019, 8, 1))
+                or (dt.date(2022, 6, 1) <= report_date <= today_date)):
+            return '900,850,1200.78,1400.67'
+        return '566,566,700,800'
+
+    # all others
+    return '%10,0,13,100'
+
 
-    return date_published
+def _parse_date_published(table, report_type):
+    """
+    Arguments:
+        table (pandas.DataFrame): table extracted from the get_publish_area target area
+        report_type(str): specifies the report table type
+    Returns:
+        date_published (datetime.date): the extracted date of report, or None if the area is empty
+    """
+    # check that a response is provided
+    if table is None or len(table.values) == 0:
+        return None
+
+    # delta daily outflow report
+    if report_type == 'doutdly':
+        return dateutil.parser.parse(table.values[0][0]).date()
+
+    # all others
+    date_text = table.values.tolist()[-1][-1].replace('Run Date:', '')
+    return dateutil.parser.parse(date_text).date()
+
+
+def _parse_text_date_published(source):
+    """
+    Arguments:
+        source (str, pathlib.Path, io.StringIO): the .prn/.txt report path or content
+    Returns:
+        date_published (datetime.date): the extracted date of report, or None if the header has no date
+    """
+    content = pd.read_fwf(source, nrows=1).columns[0]
+    if content.startswith('Unnamed'):
+        return None
+    return dateutil.parser.parse(content).date()
 
 
 def get_report_columns(report_type, date_structure, expected_length=None, default=False):
@@ -518,13 +833,15 @@ def get_report_columns(report_type, date_structure, expected_length=None, defaul
     return tuples
 
 
-def get_report(date_structure, report_type):
+def get_report(date_structure, report_type, content=None):
     """
     get report content for one month for the specified report_type
 
     Arguments:
         date_structure (datetime.date): report month/year represented as a python datetime.date
         report_type(str): specifies the report table type
+        content (list or str): optional tables already extracted from a PDF report (i.e. with read_pdf_tables)
+                               for the get_area and get_publish_area target areas, or the text of a .prn/.txt report
     Returns:
         dictionary: dictionary of data and metadata of report
     """
@@ -534,25 +851,27 @@ def get_report(date_structure, report_type):
 
     # construct report url
     url = get_url(date_structure, report_type)
-    # if os.path.exists(f'pdfs/{report_type}/' + url.split('/')[-1]):
-    #     url = f'pdfs/{report_type}/' + url.split('/')[-1]
 
-    # using the url, read pdf with tabula based off area coordinates
+    # reports are read from the local report store unless content is provided
+    path = get_report_file(date_structure, report_type) if content is None else None
+
+    # using the url, read the report body and run date areas with tabula in one pass
     if url.endswith('.pdf'):
-        content = read_pdf(url,
-                           encoding='ISO-8859-1',
-                           stream=True,
-                           area=get_area(date_structure, report_type),
-                           pages=1,
-                           guess=False,
-                           pandas_options={'header': None})
+        if content is None:
+            content = read_pdf_tables({url: (str(path), [get_area(date_structure, report_type),
+                                                         get_publish_area(date_structure, report_type)])})[url]
+            if isinstance(content, Exception):
+                raise content
         if report_type == 'doutdly':
             df = doutdly_data_cleaner(content, report_type, date_structure)
         else:
             df = load_pdf_to_dataframe(content, date_structure, report_type)
 
+    # text reports are read from previously downloaded content if provided
+    source = io.StringIO(content) if isinstance(content, str) else path
+
     if url.endswith('.prn'):
-        df = pd.read_table(url,
+        df = pd.read_table(source,
                            skiprows=10,
                            names=get_report_columns(report_type, date_structure),
                            index_col=False,
@@ -561,21 +880,173 @@ def get_report(date_structure, report_type):
         df = doutdly_data_cleaner(df, report_type, date_structure)
 
     elif url.endswith('.txt'):
-        df = pd.read_csv(url,
+        df = pd.read_csv(source,
                          skiprows=10,
                          sep=r'\s{1,}',
                          index_col=False,
                          names=get_report_columns(report_type, date_structure))
         df = doutdly_data_cleaner(df, report_type, date_structure)
 
+    # the run date is read from the same extracted tables or text as the report body
+    try:
+        if url.endswith('.pdf'):
+            date_published = _parse_date_published(content[1] if len(content) > 1 else None, report_type)
+        else:
+            date_published = _parse_text_date_published(io.StringIO(content) if isinstance(content, str) else path)
+    except (AttributeError, IndexError, OverflowError, TypeError, ValueError):
+        print(f'WARNING: date published not found for {report_type} {date_structure:%b %Y}')
+        date_published = None
+
     # create date-indexed dataframe and convert numeric values to floats
     return {'data': df,
             'info': {'url': url,
                      'title': get_title(report_type),
-                     # 'date_published': get_date_published(url, date_structure, report_type),
+                     'date_published': date_published,
                      'date_retrieved': dt.datetime.now()}}
 
 
+def read_pdf_tables(jobs, encoding='ISO-8859-1', workers=8):
+    """
+    extract the first-page tables for many PDF reports and target areas without starting a Java process
+    for every report; if jpype is installed, tabula keeps a single JVM alive in-process across reports,
+    otherwise the reports are staged locally and each distinct set of target areas is extracted with one
+    tabula-java batch process
+
+    Arguments:
+        jobs (dict): (url or path, areas) tuples keyed by caller-defined keys, where areas is a list of
+                     target areas in order of: top, left, bottom, right; areas may also be given in the
+                     tabula-java notation, i.e. '%10,0,13,100' for percentages of the page
+        encoding (str): the tabula output encoding
+        workers (int): number of concurrent report downloads when staging reports for batch extraction
+    Returns:
+        (dict): lists of tables (one per target area) keyed as in jobs, or the exception for failed jobs
+    """
+    options = {'stream': True, 'pages': 1, 'guess': False}
+
+    # areas are passed as tabula-java options so that absolute and relative areas can be combined
+    def _area_options(areas):
+        return ' '.join(f'--area {x if isinstance(x, str) else ",".join(map(str, x))}' for x in areas)
+
+    # tabula-py reuses an in-process JVM for every read_pdf call when jpype is available
+    if importlib.util.find_spec('jpype') is not None:
+        result = {}
+        for key, (path, areas) in jobs.items():
+            try:
+                result[key] = _tables_from_json(read_pdf(path,
+                                                         output_format='json',
+                                                         encoding=encoding,
+                                                         options=_area_options(areas),
+                                                         **options))
+            except Exception as error:
+                result[key] = error
+        return result
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+
+        # stage each report in a directory shared by all reports with the same target areas
+        groups = {}
+        staged = {}
+        for i, (key, (path, areas)) in enumerate(jobs.items()):
+            group = groups.setdefault(json.dumps(areas), pathlib.Path(temp_dir).joinpath(f'{len(groups)}'))
+            staged.update({key: (path, group.joinpath(f'{i}.pdf'))})
+        for group in groups.values():
+            group.mkdir()
+
+        session = utils.get_session(pool_size=workers)
+
+        def _stage(key):
+            path, target = staged[key]
+            if os.path.exists(path):
+                shutil.copyfile(path, target)
+            else:
+                response = session.get(path)
+                response.raise_for_status()
+                target.write_bytes(response.content)
+
+        downloads = utils.get_concurrent_results(_stage, list(jobs), workers)
+
+        # one tabula-java process per group writes a JSON file alongside each PDF
+        failures = {}
+        for areas, group in groups.items():
+            try:
+                convert_into_by_batch(str(group),
+                                      output_format='json',
+                                      options=_area_options(json.loads(areas)),
+                                      **options)
+            except Exception as error:
+                failures.update({group: error})
+
+        result = {}
+        for key, (path, target) in staged.items():
+            if isinstance(downloads[key], Exception):
+                result[key] = downloads[key]
+            elif target.parent in failures:
+                result[key] = failures[target.parent]
+            else:
+                try:
+                    result[key] = _tables_from_json(json.loads(target.with_suffix('.json').read_text(encoding='utf-8')))
+                except Exception as error:
+                    result[key] = error
+        return result
+
+
+def _tables_from_json(content):
+    """
+    build tables from tabula-java JSON output, matching read_pdf with pandas_options={'header': None};
+    unlike read_pdf, empty tables are kept so that tables align with their target areas
+
+    Arguments:
+        content (list): decoded tabula-java JSON output, with one entry per page and target area
+    Returns:
+        tables (list): list of pandas.DataFrame tables
+    """
+    tables = []
+    for table in content:
+        df = pd.DataFrame([[x['text'] or float('nan') for x in row] for row in table['data']])
+        for column in df.columns:
+            try:
+                df[column] = pd.to_numeric(df[column])
+            except (ValueError, TypeError):
+                pass
+        tables.append(df)
+    return tables
+
+
+def benchmark_extraction(start, end, report_type):
+    """
+    compare PDF table extraction throughput for one read_pdf call per month (as in get_report) against
+    the read_pdf_tables engine
+
+    Arguments:
+        start (datetime.date): start date given in datetime format
+        end (datetime.date): end date given in datetime format
+        report_type (str): specifies the CVO report type
+    Returns:
+        (dict): months per second for each extraction approach
+    """
+    months = [x for x in months_between(start, end) if get_url(x, report_type).endswith('.pdf')]
+    jobs = {x: (get_url(x, report_type), [get_area(x, report_type)]) for x in months}
+
+    started = time.perf_counter()
+    for url, areas in jobs.values():
+        read_pdf(url,
+                 encoding='ISO-8859-1',
+                 area=areas[0],
+                 stream=True,
+                 pages=1,
+                 guess=False,
+                 pandas_options={'header': None})
+    per_call = time.perf_counter() - started
+
+    started = time.perf_counter()
+    read_pdf_tables(jobs)
+    engine = time.perf_counter() - started
+
+    return {'months': len(months),
+            'read_pdf (months/s)': len(months) / per_call,
+            'read_pdf_tables (months/s)': len(months) / engine}
+
+
 def get_title(report_type):
     """
     get the title for the identified CVO report
@@ -672,7 +1143,7 @@ def doutdly_data_cleaner(content, report_type, date_structure):
     df = pd.DataFrame(content if content.ndim <= 2 else content[0])
 
     # remove any "NaN" entries for cases where offset created in parsing fixed-width columns
-    df = pd.DataFrame(data=[row.split()[1:] for row in df.to_string().replace('NaN', '').splitlines()[1:]])
+    df = _collapse_cells(df)
 
     # set the multi-level column names
     df.columns = pd.MultiIndex.from_tuples(get_report_columns(report_type,
@@ -702,12 +1173,7 @@ def doutdly_data_cleaner(content, report_type, date_structure):
     df.index = [x.replace(year=date_structure.year) for x in df.index]
 
     # convert numeric data to floats, including parentheses notation to negative numbers
-    df = (df.replace(',', '', regex=True)
-            .replace('%', '', regex=True)
-            .replace('None', float('nan'), regex=True)
-            .replace(r'[\$,)]', '', regex=True)
-            .replace(r'[(]', '-', regex=True)
-            .astype(float))
+    df = _cells_to_float(df)
 
     # drop COA columns with no data
     if 'COA USBR' in df:
@@ -718,6 +1184,51 @@ def doutdly_data_cleaner(content, report_type, date_structure):
     return df.dropna(how='all').reindex()
 
 
+def _collapse_cells(df):
+    """
+    shift the cells of a table parsed from fixed-width columns into consecutive columns; the text of each
+    row's cells (excluding NaN cells) is split on whitespace, and short rows are padded with None
+
+    Arguments:
+        df (pandas.DataFrame): the parsed table
+    Returns:
+        (pandas.DataFrame): table of text tokens with a default index and integer column labels
+    """
+    values = df.to_numpy(dtype=object)
+    text = pd.DataFrame(values).astype(str)
+
+    # floating point columns keep the display formatting of DataFrame.to_string (i.e. 221.00 alongside 220.04)
+    for i, dtype in enumerate(df.dtypes):
+        if dtype.kind == 'f' and len(df) > 0:
+            text[i] = df.iloc[:, i].to_string(index=False).splitlines()
+
+    text = text.mask(pd.isna(values) & (values != None), '')
+
+    # join each row's cells in one vectorized concatenation
+    rows = text[0].str.cat([text[x] for x in text.columns[1:]], sep=' ')
+    return rows.str.replace('NaN', '', regex=False).str.split(expand=True)
+
+
+def _cells_to_float(df):
+    """
+    convert report cells to floats in one pass over the cell array: commas, percent and dollar signs are
+    removed, parentheses denote negative numbers, and cells containing 'None' are missing
+
+    Arguments:
+        df (pandas.DataFrame): table of report text cells
+    Returns:
+        (pandas.DataFrame): the table converted to floats
+    """
+    cells = pd.Series(df.to_numpy(dtype=object).ravel())
+    is_text = cells.map(lambda x: isinstance(x, str))
+
+    text = cells[is_text].str.replace(r'[,%]', '', regex=True)
+    text = text.mask(text.str.contains('None', regex=False))
+    cells[is_text] = text.str.replace(r'[$)]', '', regex=True).str.replace('(', '-', regex=False)
+
+    return pd.DataFrame(cells.to_numpy().reshape(df.shape), index=df.index, columns=df.columns).astype(float)
+
+
 def load_pdf_to_dataframe(content, date_structure, report_type, to_csv=False):
     """
     changes dataframe to an array and reshape it column names change to what is specified below
@@ -738,8 +1249,7 @@ def load_pdf_to_dataframe(content, date_structure, report_type, to_csv=False):
     df = df.loc[df[0].astype(str).str.match(r'\d+(\.\d+)?'), :]
 
     # remove any "NaN" entries for cases where offset created in parsing fixed-width columns
-    df = pd.DataFrame(data=[list(map(float, row.split()[1:]))
-                            for row in df.to_string().replace('NaN', '').splitlines()[1:]])
+    df = _collapse_cells(df).astype(float)
 
     # update the column names
     df.columns = pd.MultiIndex.from_tuples(get_report_columns(report_type, date_structure))
@@ -751,12 +1261,7 @@ def load_pdf_to_dataframe(content, date_structure, report_type, to_csv=False):
     # data cleaning specific to delta outflow report
     if report_type == 'doutdly':
         # convert numeric data to floats, including parentheses notation to negative numbers
-        df = (df.replace(',', '', regex=True)
-                .replace('%', '', regex=True)
-                .replace('None', float('nan'), regex=True)
-                .replace(r'[\$,)]', '', regex=True)
-                .replace(r'[(]', '-', regex=True)
-                .astype(float))
+        df = _cells_to_float(df)
 
     # drop any rows where all values are missing
     df = df.dropna(how='all').reindex()
@@ -783,7 +1288,8 @@ def load_pdf_to_dataframe(content, date_structure, report_type, to_csv=False):
 
 def download_files(start, end, report_type, destination='.'):
     """
-    download file contents for all reports within date range to specified destination directory
+    copy file contents for all reports within date range from the local report store to specified
+    destination directory; reports missing from the store are downloaded
 
     Arguments:
         start (datetime.date):  start date given by user input
@@ -791,14 +1297,18 @@ def download_files(start, end, report_type, destination='.'):
         report_type (str): the str identifier for CVO report
         destination (str): destination path for saving report files
     Returns:
-        None
+        errors (dict): the exception raised retrieving each report that could not be copied, keyed by month
     """
     if not os.path.exists(destination):
         os.makedirs(destination)
 
-    for date_structure in months_between(start, end):
+    errors = {}
+    for date_structure, path in _get_report_files(list(months_between(start, end)), report_type).items():
+        if isinstance(path, Exception):
+            errors[date_structure] = path
+            continue
+
         url = get_url(date_structure, report_type)
-        response = requests.get(url)
+        shutil.copyfile(path, os.path.join(destination, url.split('/')[-1]))
 
-        with open(os.path.join(destination, url.split('/')[-1]), 'wb') as f:
-            f.write(response.content)
+    return errors
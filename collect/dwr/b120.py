@@ -16,14 +16,27 @@ import datetime as dt
 import io
 import re
 
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+import dateutil.parser
 import pandas as pd
-import requests
 
 from collect.dwr import errors
+from collect import utils
 
 
-def get_b120_data(date_suffix=''):
+# only the forecast tables and report headings are parsed from B120 pages
+_B120_STRAINER = SoupStrainer(attrs={'class': ['doc-aj-table',
+                                               'doc-wy-table',
+                                               'fts-doc-title',
+                                               'doc-table-caption',
+                                               'doc-fcast-notes',
+                                               'fts-doc-notes']})
+
+# the first forecast table or heading of a B120 page; the page header and navigation before it are not parsed
+_B120_START_PATTERN = re.compile(rb'<[^<>]*class="[^"]*\b(?:fts-doc-title|doc-table-caption|doc-aj-table|doc-wy-table)\b')
+
+
+def get_b120_data(date_suffix='', session=None):
     """
     B-120 Water Supply Forecast Summary
     for current (latest) B120 forecast, use date_suffix = ''
@@ -31,6 +44,7 @@ def get_b120_data(date_suffix=''):
 
     Args:
         date_suffix (str):
+        session (requests.Session): optional session for connection reuse
     Returns:
         (dict): dictionary of extracted data and metadata (info)
     Raises:
@@ -41,38 +55,36 @@ def get_b120_data(date_suffix=''):
         # main B120 page (new DWR format)
         url = 'https://cdec.water.ca.gov/b120{}.html'.format(date_suffix)
 
-        # parse HTML file structure; AJ forecast table
-        soup = BeautifulSoup(requests.get(url).content, 'html.parser')
+        # parse HTML file structure, limited to the forecast tables and headings; AJ forecast table
+        soup = BeautifulSoup(_trim_page((session or utils.get_session(pool_size=1)).get(url).content),
+                             'html.parser',
+                             parse_only=_B120_STRAINER)
         table = soup.find('table', {'class': 'doc-aj-table'})
 
         # read HTML table with April-July Forecast Summary (TAF)
         aj_list = []
-        for tr in table.find('tbody').find_all('tr'):
-            cells = tr.find_all('td')
+        for cells in get_table_rows(table):
             if len(cells) == 1:
-                watershed = cells[0].text.strip()
+                watershed = cells[0].strip()
             else:
-                aj_list.append([watershed] + [clean_td(td.text) for td in cells])
+                aj_list.append([watershed] + cells)
 
         # dataframe storing Apr-Jul forecast table
         aj_df = april_july_dataframe(aj_list)
+        aj_df = clean_columns(aj_df, aj_df.columns[1:])
 
         # water-year (wy) forecast summary and monthly distribution (TAF)
         table = soup.find('table', {'class': 'doc-wy-table'})
 
         # read HTML table with Water-Year Forecast Summary
-        wy_list = []
-        for tr in table.find('tbody').find_all('tr'):            
-            clean_row = [clean_td(td.text) for td in tr.find_all('td')]
-            if clean_row[0] == 'Download in comma-delimited format':
-                continue
-            wy_list.append(clean_row)
-        
+        wy_list = [cells for cells in get_table_rows(table)
+                   if cells[0].strip() != 'Download in comma-delimited format']
+
         # header info
         headers = table.find('thead').find('tr', {'class': 'header-row2'}).find_all('th')
         columns = [th.text.replace('thru', '-').replace('%', ' % ').replace('WaterYear', 'WY') for th in headers]
         columns = columns[:-2] + ['90% Exceedance', '10% Exceedance'] + [columns[-1]]
-        wy_df = pd.DataFrame(wy_list, columns=columns)
+        wy_df = clean_columns(pd.DataFrame(wy_list, columns=columns))
 
         info = {
             'url': url,
@@ -93,7 +105,7 @@ def get_b120_data(date_suffix=''):
 
     elif validate_date_suffix(date_suffix, min_year=2011):
         report_date = dt.datetime.strptime(date_suffix, '_%Y%m')
-        return get_120_archived_reports(report_date.year, report_date.month)
+        return get_120_archived_reports(report_date.year, report_date.month, session=session)
 
     else:
         raise errors.B120SourceError('B120 Issuances before Feb. 2011 are available as PDFs.')
@@ -135,10 +147,58 @@ def clean_td(text):
     return value
 
 
-def get_b120_update_data(date_suffix=''):
+def clean_columns(df, columns=None):
+    """
+    apply the clean_td conversion to whole columns of table cell text in one vectorized pass
+
+    Args:
+        df (pandas.DataFrame): table of cell text
+        columns (list): the columns to clean; defaults to all columns
+    Returns:
+        df (pandas.DataFrame): table with numeric cells as floats, empty cells as None and other text stripped
+    """
+    df = df.copy()
+    columns = df.columns if columns is None else columns
+
+    # all cells are cleaned as one series
+    cells = pd.Series(df[columns].to_numpy(dtype=object).ravel())
+    text = cells.str.strip()
+    values = pd.to_numeric(text.str.replace('-', '', regex=False).str.replace(',', '', regex=False),
+                           errors='coerce').astype(float)
+    cleaned = text.astype(object).where(values.isna(), values).where(text != '', None).where(cells.notna(), None)
+
+    cleaned = cleaned.to_numpy().reshape(len(df), len(columns))
+    for i, column in enumerate(columns):
+        df[column] = pd.Series(cleaned[:, i], index=df.index, dtype=object).infer_objects()
+    return df
+
+
+def _trim_page(content):
+    """
+    Args:
+        content (bytes): B120 page content
+    Returns:
+        content (bytes): the page from the first forecast table or heading onwards
+    """
+    match = _B120_START_PATTERN.search(content)
+    return content if match is None else content[match.start():]
+
+
+def get_table_rows(table):
+    """
+    Args:
+        table (bs4.element.Tag): HTML table
+    Returns:
+        (list): the text of the cells in each row of the table body
+    """
+    return [[td.text for td in tr.find_all('td')] for tr in table.find('tbody').find_all('tr')]
+
+
+def get_b120_update_data(date_suffix='', session=None):
     """
     Args:
         date_suffix (str): optional 
+        session (requests.Session): optional session for connection reuse
 
     Returns:
 
@@ -150,8 +210,10 @@ def get_b120_update_data(date_suffix=''):
     if not validate_date_suffix(date_suffix, min_year=2018):
         raise errors.B120SourceError('B120 updates in this format not available before Feb. 2018.')
 
-    # parse HTML file structure; AJ forecast table
-    soup = BeautifulSoup(requests.get(url).content, 'html.parser')
+    # parse HTML file structure, limited to the forecast tables and headings; AJ forecast table
+    soup = BeautifulSoup(_trim_page((session or utils.get_session(pool_size=1)).get(url).content),
+                         'html.parser',
+                         parse_only=_B120_STRAINER)
     tables = soup.find_all('table', {'class': 'doc-aj-table'})
 
     # unused header info
@@ -168,17 +230,17 @@ def get_b120_update_data(date_suffix=''):
         for tr in table.find('tbody').find_all('tr'):        
             cells = tr.find_all('td')
 
-            clean_row = [clean_td(td.text) for td in cells]
-            if clean_row[0] == 'Download in comma-delimited format':
+            row = [td.text for td in cells]
+            if row[0].strip() == 'Download in comma-delimited format':
                 continue                
 
             if cells[0]['class'][0] == 'col-basin-name':
                 spans = cells[0].find_all('span')
                 watershed = spans[0].text.strip()
-                average = clean_td(spans[1].text.strip().split('= ')[-1])
+                average = spans[1].text.strip().split('= ')[-1]
                 continue
 
-            row_formatted = [watershed, average] + clean_row
+            row_formatted = [watershed, average] + row
             aj_list.append(row_formatted)
 
     # dataframe storing Apr-Jul forecast table
@@ -187,6 +249,7 @@ def get_b120_update_data(date_suffix=''):
         columns += ['{} AJ Vol'.format(date), '{} % Avg'.format(date)]
 
     df = pd.DataFrame(aj_list, columns=columns)
+    df = clean_columns(df, columns[1:])
 
     title = soup.find('div', {'class': 'fts-doc-title'}).text
 
@@ -209,7 +272,7 @@ def get_b120_update_data(date_suffix=''):
     return {'data': df, 'info': info}
 
 
-def get_120_archived_reports(year, month):
+def get_120_archived_reports(year, month, session=None):
     """
     Text-formatted reports available through CDEC javareports app for 2011-2017
     https://cdec.water.ca.gov/reportapp/javareports?name=B120.YYYYMM
@@ -217,6 +280,7 @@ def get_120_archived_reports(year, month):
     Args:
         year (int): the year as 4-digit integer
         month (int): the month as integer from 1 to 12
+        session (requests.Session): optional session for connection reuse
     Returns:
         (dict): nested dictionary with two result dataframes and metadata
     """
@@ -227,8 +291,8 @@ def get_120_archived_reports(year, month):
 
     url = f'https://cdec.water.ca.gov/reportapp/javareports?name=B120.{report_date:%Y%m}'
     
-    result = requests.get(url).content  
-    result = BeautifulSoup(result, 'html.parser').find('pre').text
+    result = (session or utils.get_session(pool_size=1)).get(url).content
+    result = BeautifulSoup(result, 'html.parser', parse_only=SoupStrainer('pre')).find('pre').text
     tables = result.split('Water-Year (WY) Forecast and Monthly Distribution')
 
     # read text table with April-July Forecast Summary (TAF)
@@ -239,10 +303,11 @@ def get_120_archived_reports(year, month):
         if len(cells) == 1:
             watershed = cells[0].strip()
         else:
-            aj_list.append([watershed] + [clean_td(td) for td in cells][1:])
+            aj_list.append([watershed] + cells[1:])
 
     # dataframe storing Apr-Jul forecast table
     aj_df = april_july_dataframe(aj_list)
+    aj_df = clean_columns(aj_df, aj_df.columns[1:])
     aj_df.dropna(subset=['Hydrologic Region'], inplace=True)
 
     # water-year (wy) forecast summary and monthly distribution (TAF)
@@ -300,3 +365,156 @@ def april_july_dataframe(data_list):
     columns = ['Hydrologic Region', 'Watershed', 'Apr-Jul Forecast', '% of Avg', '90% Exceedance', '10% Exceedance']
     df = pd.DataFrame(data_list, columns=columns)
     return df
+
+
+def get_b120_history(start_year=2011, end_year=None, updates=True, workers=8):
+    """
+    all B120 issuances (February through May) since start_year, in long format; parsed issuances are kept
+    in a permanent local cache, so only newly posted months are downloaded
+
+    Args:
+        start_year (int): first year of issuances, no earlier than 2011
+        end_year (int): last year of issuances; defaults to the current year
+        updates (bool): whether to include the forecast updates from the current B120 update report; updates
+                        are added to the cache as they are posted
+        workers (int): number of concurrent report downloads
+    Returns:
+        (dict): dictionary of the long-format data indexed by (issuance, watershed, period, exceedance) and metadata
+    Raises:
+        collect.dwr.errors.B120SourceError: raised when start_year is before 2011
+    """
+    if start_year < 2011:
+        raise errors.B120SourceError('B120 Issuances before Feb. 2011 are available as PDFs.')
+
+    today = dt.date.today()
+    end_year = end_year or today.year
+    months = [dt.date(year, month, 1) for year in range(start_year, end_year + 1) for month in range(2, 6)
+              if dt.date(year, month, 1) <= today]
+
+    # parsed issuances are stored permanently; only months not yet cached are requested
+    cache_dir = utils.get_cache_dir('dwr', 'b120', 'issuances')
+    frames = {x: pd.read_pickle(cache_dir.joinpath(f'{x:%Y%m}.pkl')) for x in months
+              if cache_dir.joinpath(f'{x:%Y%m}.pkl').exists()}
+    pending = [x for x in months if x not in frames]
+
+    session = utils.get_session(pool_size=workers)
+    results = utils.get_concurrent_results(lambda x: get_b120_issuance(x, session=session),
+                                           pending,
+                                           workers=workers)
+
+    failed = {}
+    for issuance, result in results.items():
+        if isinstance(result, Exception):
+            failed[f'{issuance:%Y-%m}'] = str(result)
+            continue
+        pd.to_pickle(result, cache_dir.joinpath(f'{issuance:%Y%m}.pkl'))
+        frames[issuance] = result
+
+    frames = [frames[x] for x in months if x in frames]
+
+    # forecast updates are only published for the current season; each posting is kept in the cache
+    if updates:
+        update_dir = utils.get_cache_dir('dwr', 'b120', 'updates')
+        try:
+            result = get_b120_update_data(session=session)
+            pd.to_pickle(_b120_update_long_frame(result),
+                         update_dir.joinpath(f'{result["info"]["posted"]:%Y%m%d%H%M}.pkl'))
+        except Exception as err:
+            failed['updates'] = str(err)
+        frames += [pd.read_pickle(x) for x in sorted(update_dir.glob('*.pkl'))]
+
+    df = pd.concat(frames) if len(frames) > 0 else _b120_long_frame_template()
+    df = df.loc[~df.set_index('type', append=True).index.duplicated(keep='last')].sort_index()
+
+    return {'data': df,
+            'info': {'issuances': [f'{x:%Y-%m}' for x in months if f'{x:%Y-%m}' not in failed],
+                     'units': 'TAF',
+                     'downloaded': dt.datetime.now().strftime('%Y-%m-%d %H:%M'),
+                     'errors': failed}}
+
+
+def get_b120_issuance(issuance, session=None):
+    """
+    one B120 issuance in long format
+
+    Args:
+        issuance (datetime.date): the month of the issuance
+        session (requests.Session): optional session for connection reuse
+    Returns:
+        df (pandas.DataFrame): forecast values indexed by (issuance, watershed, period, exceedance)
+    """
+    result = get_b120_data(issuance.strftime('_%Y%m'), session=session)
+    issuance = pd.Timestamp(issuance.year, issuance.month, 1)
+
+    # Apr-Jul forecast summary; the median forecast is the 50% exceedance
+    aj_df = result['data']['Apr-Jul'].rename(columns={'Apr-Jul Forecast': 50,
+                                                      '90% Exceedance': 90,
+                                                      '10% Exceedance': 10})
+    aj_df = aj_df.melt(id_vars=['Watershed'], value_vars=[50, 90, 10], var_name='exceedance')
+    aj_df['period'] = 'Apr-Jul'
+
+    # water-year forecast and monthly distribution, in order of: watershed, monthly distribution,
+    # water year, 90% and 10% exceedance, and % of average
+    wy_df = result['data']['WY']
+    columns = wy_df.columns.tolist()
+    periods = {x: re.sub(r'\s*(thru|-)\s*', '-', str(x)).strip() for x in columns[1:-4]}
+    monthly = wy_df.rename(columns=periods).melt(id_vars=[columns[0]], value_vars=list(periods.values()),
+                                                 var_name='period')
+    monthly['exceedance'] = 50
+    water_year = wy_df.rename(columns={columns[-4]: 50, columns[-3]: 90, columns[-2]: 10})
+    water_year = water_year.melt(id_vars=[columns[0]], value_vars=[50, 90, 10], var_name='exceedance')
+    water_year['period'] = 'WY'
+    wy_df = pd.concat([monthly, water_year]).rename(columns={columns[0]: 'Watershed'})
+
+    return _b120_long_frame(pd.concat([aj_df, wy_df]), issuance, 'B120 Forecast')
+
+
+def _b120_update_long_frame(result):
+    """
+    B120 forecast updates in long format; each forecast date is an issuance
+
+    Args:
+        result (dict): the get_b120_update_data result
+    Returns:
+        df (pandas.DataFrame): forecast values indexed by (issuance, watershed, period, exceedance)
+    """
+    df = result['data']
+    frames = []
+    for column in [x for x in df.columns if str(x).endswith(' AJ Vol')]:
+        date = column[:-len(' AJ Vol')]
+        issuance = pd.Timestamp(dateutil.parser.parse(date, default=dt.datetime(result['info']['posted'].year, 1, 1)))
+        frame = pd.DataFrame({'Watershed': df['Hydrologic Region'],
+                              'exceedance': df['Percentile'].astype(str).str.extract(r'(\d+)')[0],
+                              'period': 'Apr-Jul',
+                              'value': df[column]})
+        frames.append(_b120_long_frame(frame, issuance, 'B120 Update'))
+    return pd.concat(frames) if len(frames) > 0 else _b120_long_frame_template()
+
+
+def _b120_long_frame(df, issuance, report_type):
+    """
+    Args:
+        df (pandas.DataFrame): table with Watershed, period, exceedance and value columns
+        issuance (pandas.Timestamp): the issuance date
+        report_type (str): one of 'B120 Forecast', 'B120 Update'
+    Returns:
+        df (pandas.DataFrame): numeric forecast values indexed by (issuance, watershed, period, exceedance)
+    """
+    df = pd.DataFrame({'issuance': issuance,
+                       'watershed': df['Watershed'].astype(str).str.strip(),
+                       'period': df['period'],
+                       'exceedance': pd.to_numeric(df['exceedance'], errors='coerce'),
+                       'value': pd.to_numeric(df['value'], errors='coerce'),
+                       'type': report_type})
+    df = df.dropna(subset=['exceedance', 'value'])
+    df['exceedance'] = df['exceedance'].astype(int)
+    return df.set_index(['issuance', 'watershed', 'period', 'exceedance'])
+
+
+def _b120_long_frame_template():
+    """
+    Returns:
+        df (pandas.DataFrame): empty long-format frame
+    """
+    index = pd.MultiIndex.from_arrays([[]] * 4, names=['issuance', 'watershed', 'period', 'exceedance'])
+    return pd.DataFrame({'value': [], 'type': []}, index=index)
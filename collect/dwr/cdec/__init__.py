@@ -4,4 +4,6 @@ collect.dwr.cdec
 access CDEC gage data
 """
 # -*- coding: utf-8 -*-
-from .queries import *
\ No newline at end of file
+from .queries import *
+from .catalog import *
+from .poller import *
\ No newline at end of file
@@ -0,0 +1,380 @@
+"""
+collect.dwr.cdec.catalog
+============================================================
+locally cached catalog of CDEC stations, sensors, durations and periods of record
+"""
+# -*- coding: utf-8 -*-
+import datetime as dt
+import json
+import math
+
+from bs4 import BeautifulSoup
+import numpy as np
+import pandas as pd
+
+from collect import utils
+from collect.dwr.cdec.queries import _get_table_index, _parse_station_sensors_table
+
+
+__all__ = ['StationCatalog',
+           'get_catalog_path',
+           'get_station_list',
+           'get_station_sensors',
+           'build_station_catalog',
+           'get_station_catalog']
+
+
+STATION_SEARCH_URL = 'https://cdec.water.ca.gov/dynamicapp/staSearch?sta=&sensor=&dur=&active=&lon1=&lon2=&lat1=&lat2=&elev1=&elev2=&nearby=&basin=&hydro=&county=&agency_num=&display=sta'
+
+STATION_META_URL = 'https://cdec.water.ca.gov/dynamicapp/staMeta?station_id={station}'
+
+EARTH_RADIUS_MILES = 3958.8
+
+
+class StationCatalog:
+    """
+    in-memory CDEC station catalog with sensor/duration and spatial indexes; all queries are
+    answered locally, so query planning requires no network access
+
+    Arguments:
+        stations (list): station records as dictionaries with ID, name, basin, county, latitude,
+            longitude and a `sensors` list of {sensor, duration, description, start, end} entries
+        updated (str): timestamp of the last catalog refresh
+    """
+    def __init__(self, stations, updated=None):
+        self.stations = {x['ID']: x for x in stations}
+        self.updated = updated
+        self._build_indexes()
+
+    def __len__(self):
+        return len(self.stations)
+
+    def __contains__(self, station):
+        return station.upper() in self.stations
+
+    def _build_indexes(self):
+        """
+        construct the sensor, duration, (sensor, duration) and latitude-sorted spatial indexes
+        """
+        self.sensor_index = {}
+        self.duration_index = {}
+        self.series_index = {}
+        self.coverage = {}
+
+        for station, record in self.stations.items():
+            for entry in record.get('sensors', []):
+                sensor, duration = int(entry['sensor']), entry['duration']
+                self.sensor_index.setdefault(sensor, set()).add(station)
+                self.duration_index.setdefault(duration, set()).add(station)
+                self.series_index.setdefault((sensor, duration), set()).add(station)
+                self.coverage[(station, sensor, duration)] = (entry['start'], entry['end'])
+
+        # stations without valid coordinates are excluded from spatial queries
+        located = [(x['latitude'], x['longitude'], k) for k, x in self.stations.items()
+                   if x.get('latitude') is not None and x.get('longitude') is not None]
+        located.sort()
+        self._latitudes = np.array([x[0] for x in located], dtype=float)
+        self._longitudes = np.array([x[1] for x in located], dtype=float)
+        self._located_ids = np.array([x[2] for x in located], dtype=object)
+
+    def get_station(self, station):
+        """
+        Arguments:
+            station (str): the 3-letter CDEC station ID
+        Returns:
+            (dict): the catalog record for the station
+        """
+        return self.stations[station.upper()]
+
+    def get_coverage(self, station, sensor, duration):
+        """
+        Arguments:
+            station (str): the 3-letter CDEC station ID
+            sensor (int): the numeric sensor code
+            duration (str): the sensor duration (i.e. 'daily', 'hourly', 'event', 'monthly')
+        Returns:
+            (tuple): first and last year of available data, or None if the series does not exist
+        """
+        return self.coverage.get((station.upper(), int(sensor), duration))
+
+    def within_bbox(self, min_lon, min_lat, max_lon, max_lat):
+        """
+        Arguments:
+            min_lon (float): western boundary
+            min_lat (float): southern boundary
+            max_lon (float): eastern boundary
+            max_lat (float): northern boundary
+        Returns:
+            (set): IDs of stations within the bounding box
+        """
+        lower = np.searchsorted(self._latitudes, min_lat, side='left')
+        upper = np.searchsorted(self._latitudes, max_lat, side='right')
+        longitudes = self._longitudes[lower:upper]
+        mask = (longitudes >= min_lon) & (longitudes <= max_lon)
+        return set(self._located_ids[lower:upper][mask])
+
+    def within_radius(self, lon, lat, miles):
+        """
+        Arguments:
+            lon (float): longitude of the search center
+            lat (float): latitude of the search center
+            miles (float): search radius in miles
+        Returns:
+            (set): IDs of stations within the great-circle radius
+        """
+        # prefilter with the enclosing bounding box
+        dlat = math.degrees(miles / EARTH_RADIUS_MILES)
+        dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+        lower = np.searchsorted(self._latitudes, lat - dlat, side='left')
+        upper = np.searchsorted(self._latitudes, lat + dlat, side='right')
+
+        latitudes = np.radians(self._latitudes[lower:upper])
+        longitudes = self._longitudes[lower:upper]
+        mask = np.abs(longitudes - lon) <= dlon
+
+        # haversine distance for remaining candidates
+        phi = math.radians(lat)
+        a = (np.sin((latitudes - phi) / 2)**2
+             + math.cos(phi) * np.cos(latitudes) * np.sin(np.radians(longitudes - lon) / 2)**2)
+        distance = 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a))
+        return set(self._located_ids[lower:upper][mask & (distance <= miles)])
+
+    def query(self, sensor=None, duration=None, start_year=None, end_year=None, basin=None, county=None,
+              bbox=None, near=None, radius=None):
+        """
+        find stations matching all of the provided criteria; for example, all stations with sensor 15
+        daily data in the American River basin since 1990:
+
+            catalog.query(sensor=15, duration='daily', start_year=1990, basin='AMERICAN R')
+
+        Arguments:
+            sensor (int): the numeric sensor code
+            duration (str): the sensor duration (i.e. 'daily', 'hourly', 'event', 'monthly')
+            start_year (int): require data available on or before this year
+            end_year (int): require data available on or after this year
+            basin (str): river basin name (case-insensitive)
+            county (str): county name (case-insensitive)
+            bbox (tuple): bounding box as (min_lon, min_lat, max_lon, max_lat)
+            near (tuple): search center as (lon, lat), used with `radius`
+            radius (float): search radius in miles
+        Returns:
+            (list): sorted list of matching station IDs
+        """
+        if sensor is not None and duration is not None:
+            result = set(self.series_index.get((int(sensor), duration), set()))
+        elif sensor is not None:
+            result = set(self.sensor_index.get(int(sensor), set()))
+        elif duration is not None:
+            result = set(self.duration_index.get(duration, set()))
+        else:
+            result = set(self.stations)
+
+        if bbox is not None:
+            result &= self.within_bbox(*bbox)
+
+        if near is not None and radius is not None:
+            result &= self.within_radius(*near, radius)
+
+        if basin is not None:
+            result = {x for x in result if (self.stations[x].get('basin') or '').upper() == basin.upper()}
+
+        if county is not None:
+            result = {x for x in result if (self.stations[x].get('county') or '').upper() == county.upper()}
+
+        if start_year is not None or end_year is not None:
+            result = {x for x in result if self._covers(x, sensor, duration, start_year, end_year)}
+
+        return sorted(result)
+
+    def _covers(self, station, sensor, duration, start_year, end_year):
+        """
+        check whether any matching series for the station spans the requested years
+        """
+        for entry in self.stations[station].get('sensors', []):
+            start, end = entry['start'], entry['end']
+            if ((sensor is None or int(entry['sensor']) == int(sensor))
+                    and (duration is None or entry['duration'] == duration)
+                    and (start_year is None or (start is not None and start <= start_year))
+                    and (end_year is None or (end is not None and end >= end_year))):
+                return True
+        return False
+
+    def to_frame(self):
+        """
+        Returns:
+            (pandas.DataFrame): one row per station/sensor/duration series with station attributes
+        """
+        rows = []
+        for station, record in self.stations.items():
+            attributes = {k: v for k, v in record.items() if k != 'sensors'}
+            for entry in record.get('sensors', []):
+                rows.append({**attributes, **entry})
+        return pd.DataFrame(rows)
+
+    def to_dict(self):
+        """
+        Returns:
+            (dict): JSON-serializable catalog content
+        """
+        return {'updated': self.updated, 'stations': list(self.stations.values())}
+
+    def save(self, path=None):
+        """
+        Arguments:
+            path (str, pathlib.Path): optional catalog file; defaults to the collect cache directory
+        """
+        with open(path or get_catalog_path(), 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path=None):
+        """
+        Arguments:
+            path (str, pathlib.Path): optional catalog file; defaults to the collect cache directory
+        Returns:
+            (StationCatalog): the catalog read from disk
+        """
+        with open(path or get_catalog_path(), 'r') as f:
+            content = json.load(f)
+        return cls(content['stations'], updated=content.get('updated'))
+
+
+def get_catalog_path():
+    """
+    Returns:
+        (pathlib.Path): default location of the cached station catalog
+    """
+    return utils.get_cache_dir('dwr', 'cdec').joinpath('station_catalog.json')
+
+
+def get_station_list(session=None):
+    """
+    scrape the CDEC station search (staSearch) table of all stations
+
+    Arguments:
+        session (requests.Session): optional session for connection reuse
+    Returns:
+        (list): station records with ID, name, basin, county, latitude, longitude, elevation and operator
+    """
+    session = session or utils.get_session()
+    return _parse_station_list(session.get(STATION_SEARCH_URL).content)
+
+
+def _parse_station_list(content):
+    """
+    Arguments:
+        content (bytes, str): the staSearch HTML content
+    Returns:
+        (list): station records
+    """
+    df = pd.read_html(content, flavor='html5lib', header=0)[0]
+
+    # normalize column labels (i.e. 'Elevation Feet', 'ElevationFeet')
+    columns = {'id': 'ID', 'station name': 'name', 'river basin': 'basin', 'county': 'county',
+               'longitude': 'longitude', 'latitude': 'latitude', 'elevationfeet': 'elevation',
+               'elevation feet': 'elevation', 'operator': 'operator'}
+    df = df.rename({x: columns.get(str(x).strip().lower(), x) for x in df.columns}, axis=1)
+    df = df[[x for x in ['ID', 'name', 'basin', 'county', 'longitude', 'latitude', 'elevation', 'operator']
+             if x in df.columns]]
+    df = df.loc[df['ID'].astype(str).str.len() == 3]
+
+    for column in ['longitude', 'latitude', 'elevation']:
+        if column in df:
+            df[column] = pd.to_numeric(df[column].astype(str).str.strip('°'), errors='coerce')
+
+    return [{k: (None if isinstance(v, float) and math.isnan(v) else v) for k, v in x.items()}
+            for x in df.to_dict('records')]
+
+
+def get_station_sensors(station, session=None):
+    """
+    scrape the sensor table from the station detail page (staMeta)
+
+    Arguments:
+        station (str): the 3-letter CDEC station ID
+        session (requests.Session): optional session for connection reuse
+    Returns:
+        (list): sensor entries with sensor, duration, description, start and end years
+    """
+    session = session or utils.get_session()
+    tables = BeautifulSoup(session.get(STATION_META_URL.format(station=station)).content,
+                           'html.parser').find_all('table')
+    return _flatten_sensors(_parse_station_sensors_table(tables[_get_table_index('sensors', tables)]))
+
+
+def _flatten_sensors(sensors):
+    """
+    Arguments:
+        sensors (dict): nested sensor/duration dictionary from _parse_station_sensors_table
+    Returns:
+        (list): flat list of sensor entries with year coverage
+    """
+    result = []
+    for sensor, durations in sensors.items():
+        for duration, entry in durations.items():
+            years = entry.get('years') or [None]
+            result.append({'sensor': int(sensor),
+                           'duration': duration,
+                           'description': entry['description'],
+                           'start': years[0],
+                           'end': years[-1]})
+    return result
+
+
+def build_station_catalog(catalog=None, max_age=30, workers=8, save=True):
+    """
+    build or refresh the local station catalog; stations new to the station list, and stations whose
+    sensor listing is older than `max_age` days, are scraped concurrently over a pooled session
+
+    Arguments:
+        catalog (StationCatalog): optional existing catalog to refresh
+        max_age (int): days before a station's sensor listing is refreshed
+        workers (int): number of concurrent requests
+        save (bool): flag to write the result to the catalog cache file
+    Returns:
+        catalog (StationCatalog): the refreshed catalog
+    """
+    session = utils.get_session(pool_size=workers)
+    now = dt.datetime.now()
+    existing = catalog.stations if catalog is not None else {}
+
+    stations = []
+    pending = []
+    for record in get_station_list(session=session):
+        previous = existing.get(record['ID'], {})
+        fetched = previous.get('fetched')
+        if fetched is None or (now - dt.datetime.fromisoformat(fetched)).days >= max_age:
+            pending.append(record['ID'])
+        stations.append({**previous, **record})
+
+    results = utils.get_concurrent_results(lambda x: get_station_sensors(x, session=session), pending, workers)
+    for record in stations:
+        sensors = results.get(record['ID'])
+        if isinstance(sensors, list):
+            record.update({'sensors': sensors, 'fetched': now.isoformat(timespec='seconds')})
+        elif isinstance(sensors, Exception):
+            print(f'WARNING: sensor listing unavailable for {record["ID"]}: {sensors}')
+        record.setdefault('sensors', [])
+
+    catalog = StationCatalog(stations, updated=now.isoformat(timespec='seconds'))
+    if save:
+        catalog.save()
+    return catalog
+
+
+def get_station_catalog(refresh=False, max_age=30, workers=8):
+    """
+    load the cached station catalog, building it on first use
+
+    Arguments:
+        refresh (bool): flag to refresh stale/new stations before returning
+        max_age (int): days before a station's sensor listing is refreshed
+        workers (int): number of concurrent requests used when building
+    Returns:
+        catalog (StationCatalog): the station catalog
+    """
+    path = get_catalog_path()
+    catalog = StationCatalog.load(path) if path.exists() else None
+    if catalog is None or refresh:
+        catalog = build_station_catalog(catalog, max_age=max_age, workers=workers)
+    return catalog
@@ -0,0 +1,193 @@
+"""
+collect.dwr.cdec.poller
+============================================================
+incremental polling of CDEC real-time data
+"""
+# -*- coding: utf-8 -*-
+import datetime as dt
+import json
+import time
+
+import pandas as pd
+
+from collect.dwr.cdec import queries
+
+
+__all__ = ['CDECPoller']
+
+
+class CDECPoller:
+    """
+    polls CDEC for observations newer than the last observation of each (station, sensor, duration) series;
+    stations sharing a sensor/duration are combined into one comma-separated `Stations=` request, and
+    only new rows are emitted to the optional callback and/or queue
+
+    Arguments:
+        series (list): (station, sensor, duration) tuples, i.e. [('FOL', 15, 'H'), ('SHA', 15, 'H')]
+        callback (callable): optional function called with each DataFrame of new rows
+        queue (queue.Queue): optional queue receiving each DataFrame of new rows
+        lookback (datetime.timedelta): window requested for series without a high-water mark, and the
+                                       maximum window requested for any series
+        batch_size (int): maximum number of stations combined in a single request
+        state (dict): optional high-water marks keyed by (station, sensor, duration)
+        tolerance (datetime.timedelta): maximum spread of the high-water marks combined in one request; stale
+                                        or unmarked stations are requested separately from current stations
+    """
+    def __init__(self, series, callback=None, queue=None, lookback=dt.timedelta(days=3), batch_size=25, state=None,
+                 tolerance=dt.timedelta(hours=6)):
+        self.series = [(station.upper(), int(sensor), duration.upper()) for station, sensor, duration in series]
+        self.callback = callback
+        self.queue = queue
+        self.lookback = lookback
+        self.batch_size = batch_size
+        self.tolerance = tolerance
+        self.high_water_marks = {k: pd.Timestamp(v) for k, v in (state or {}).items()}
+
+    def get_batches(self):
+        """
+        group series by sensor and duration, with up to `batch_size` stations per request
+
+        Returns:
+            batches (list): list of (sensor, duration, stations) tuples
+        """
+        groups = {}
+        for station, sensor, duration in self.series:
+            groups.setdefault((sensor, duration), []).append(station)
+
+        batches = []
+        for (sensor, duration), stations in groups.items():
+            for i in range(0, len(stations), self.batch_size):
+                batches.append((sensor, duration, stations[i:i + self.batch_size]))
+        return batches
+
+    def poll(self, now=None):
+        """
+        request the interval since the oldest high-water mark of each batch and emit only new rows; request
+        start times are clamped to the lookback window, and stations with marks more than `tolerance` apart are
+        requested separately so that one stale station does not widen the window for the rest of its batch
+
+        Arguments:
+            now (datetime.datetime): optional query end time (defaults to current time)
+        Returns:
+            df (pandas.DataFrame): the new observations across all series
+        """
+        now = now or dt.datetime.now()
+        frames = []
+
+        for sensor, duration, batch in self.get_batches():
+            for start, stations in self.split_by_start(sensor, duration, batch, now):
+                frames.append(self._poll_stations(sensor, duration, stations, start, now))
+
+        frames = [x for x in frames if x is not None]
+        df = pd.concat(frames, axis=0).sort_index(kind='mergesort') if frames else pd.DataFrame()
+        if not df.empty:
+            if self.callback is not None:
+                self.callback(df)
+            if self.queue is not None:
+                self.queue.put(df)
+        return df
+
+    def split_by_start(self, sensor, duration, stations, now):
+        """
+        group the stations of a batch by request start time; each station starts at its high-water mark,
+        clamped to the lookback window, and stations are combined only while their starts are within
+        `tolerance` of the group's earliest start
+
+        Arguments:
+            sensor (int): CDEC sensor number
+            duration (str): CDEC duration code
+            stations (list): station identifiers of the batch
+            now (datetime.datetime): query end time
+        Returns:
+            groups (list): list of (start, stations) tuples
+        """
+        earliest = pd.Timestamp(now - self.lookback)
+        starts = {}
+        for station in stations:
+            mark = self.high_water_marks.get((station, sensor, duration))
+            starts[station] = earliest if mark is None else max(mark, earliest)
+
+        groups = []
+        for station in sorted(stations, key=starts.get):
+            if groups and starts[station] - groups[-1][0] <= self.tolerance:
+                groups[-1][1].append(station)
+            else:
+                groups.append((starts[station], [station]))
+        return groups
+
+    def _poll_stations(self, sensor, duration, stations, start, now):
+        """
+        Arguments:
+            sensor (int): CDEC sensor number
+            duration (str): CDEC duration code
+            stations (list): station identifiers combined in the request
+            start (pandas.Timestamp): request start time
+            now (datetime.datetime): query end time
+        Returns:
+            new (pandas.DataFrame): rows newer than each series' high-water mark, or None
+        """
+        marks = {x: self.high_water_marks.get((x, sensor, duration)) for x in stations}
+
+        # CDEC queries are bounded by date; rows at or before each series' mark are dropped below
+        raw = queries.get_raw_station_csv(stations, start, now + dt.timedelta(days=1),
+                                          sensors=[sensor], duration=duration)
+        if raw.empty:
+            return None
+
+        raw = raw.loc[raw['VALUE'].notna()]
+        threshold = raw['STATION_ID'].map(marks).fillna(pd.Timestamp.min)
+        new = raw.loc[raw.index.values > threshold.values]
+        if new.empty:
+            return None
+
+        # advance the high-water mark of each series to its latest new observation
+        for station, last in new.groupby('STATION_ID').apply(lambda x: x.index.max()).items():
+            self.high_water_marks[(station, sensor, duration)] = last
+
+        return new
+
+    def run(self, interval=900, iterations=None):
+        """
+        poll repeatedly, sleeping `interval` seconds between polls
+
+        Arguments:
+            interval (int): seconds between polls
+            iterations (int): optional number of polls before returning; runs indefinitely if None
+        """
+        count = 0
+        while iterations is None or count < iterations:
+            try:
+                self.poll()
+            except Exception as error:
+                print(f'ERROR: CDEC poll failed at {dt.datetime.now():%Y-%m-%d %H:%M}: {error}')
+            count += 1
+            if iterations is None or count < iterations:
+                time.sleep(interval)
+
+    def get_state(self):
+        """
+        Returns:
+            (dict): JSON-serializable high-water marks, keyed by 'STATION,SENSOR,DURATION'
+        """
+        return {','.join(map(str, k)): v.isoformat() for k, v in self.high_water_marks.items()}
+
+    def save_state(self, filename):
+        """
+        Arguments:
+            filename (str): path for the JSON high-water mark file
+        """
+        with open(filename, 'w') as f:
+            json.dump(self.get_state(), f, indent=4)
+
+    @staticmethod
+    def load_state(filename):
+        """
+        Arguments:
+            filename (str): path of the JSON high-water mark file
+        Returns:
+            (dict): high-water marks keyed by (station, sensor, duration), for use as the `state` argument
+        """
+        with open(filename, 'r') as f:
+            content = json.load(f)
+        return {(station, int(sensor), duration): value
+                for (station, sensor, duration), value in ((k.split(','), v) for k, v in content.items())}
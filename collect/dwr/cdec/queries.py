@@ -5,14 +5,23 @@ access CDEC gage data
 """
 # -*- coding: utf-8 -*-
 import datetime as dt
+import hashlib
 import json
+import re
 from bs4 import BeautifulSoup
+import numpy as np
 import pandas as pd
 import requests
 from six import string_types
+from collect import utils
 from collect.utils import get_web_status
 
 
+SNOWPACK_REGIONS = ['NORTH', 'CENTRAL', 'SOUTH', 'STATE']
+
+_SNOWPACK_CACHE = {}
+
+
 def get_station_url(station, start, end, data_format='CSV', sensors=[], duration=''):
     """ 
     Generate URL for CDEC station query for CSV- or JSON-formatted data 
@@ -211,6 +220,100 @@ def get_sensor_frame(station, start, end, sensor=None, duration=''):
     return df
 
 
+def get_wide_frame(responses, interval=None, how='mean'):
+    """
+    pivot one or more long-format CDEC responses into a single time-aligned DataFrame with
+    (station, sensor, duration) MultiIndex columns; rows are reshaped with one sorted scatter
+    rather than masking the response once per series
+
+    Arguments:
+        responses (pandas.DataFrame, list): CSV result(s) from get_station_data/get_raw_station_csv
+            and/or JSON record list(s) from get_raw_station_json
+        interval (str): optional pandas offset alias (ex: 'H', 'D') to resample all series to a common interval
+        how (str): aggregation applied when resampling (ex: 'mean', 'last', 'sum')
+    Returns:
+        df (pandas.DataFrame): the wide timeseries, indexed by observation date/time
+    """
+    if isinstance(responses, pd.DataFrame) or _is_json_response(responses):
+        responses = [responses]
+
+    long = pd.concat([_normalize_long_frame(x) for x in responses], axis=0, ignore_index=True)
+
+    # factorize row (time) and column (series) keys in sorted order; duplicate observations keep the last value
+    row_codes, times = pd.factorize(long['DATE TIME'], sort=True)
+    column_codes, series = pd.MultiIndex.from_arrays([long['STATION_ID'],
+                                                       long['SENSOR_NUMBER'],
+                                                       long['DURATION']],
+                                                      names=['station', 'sensor', 'duration']).factorize(sort=True)
+
+    values = np.full((len(times), len(series)), np.nan)
+    values[row_codes, column_codes] = long['VALUE'].values
+
+    df = pd.DataFrame(values,
+                      index=pd.DatetimeIndex(times, name='DATE TIME'),
+                      columns=series)
+
+    if bool(interval):
+        df = df.resample(interval).agg(how)
+
+    return df
+
+
+def get_wide_data(stations, start, end, sensors=[], duration='', interval=None, how='mean'):
+    """
+    query multiple CDEC stations with a single comma-separated `Stations=` request and return
+    the result as a wide, time-aligned DataFrame (see get_wide_frame)
+
+    Arguments:
+        stations (str, list): comma-separated `str` or `list` of 3-letter CDEC station IDs
+        start (dt.datetime): query start date
+        end (dt.datetime): query end date
+        sensors (list): list of the numeric sensor codes
+        duration (str): interval code for timeseries data (ex: 'H')
+        interval (str): optional pandas offset alias to resample all series to a common interval
+        how (str): aggregation applied when resampling
+    Returns:
+        df (pandas.DataFrame): the wide timeseries with (station, sensor, duration) columns
+    """
+    return get_wide_frame(get_station_data(stations, start, end, sensors=sensors, duration=duration),
+                          interval=interval,
+                          how=how)
+
+
+def _is_json_response(response):
+    """
+    Arguments:
+        response (object): a CDEC query result
+    Returns:
+        (bool): flag to indicate whether the response is a list of JSON records
+    """
+    return isinstance(response, list) and (len(response) == 0 or isinstance(response[0], dict))
+
+
+def _normalize_long_frame(response):
+    """
+    convert a CSV- or JSON-formatted CDEC response to a long frame with the CSV column names
+
+    Arguments:
+        response (pandas.DataFrame, list): the CDEC query result
+    Returns:
+        df (pandas.DataFrame): long frame with STATION_ID, SENSOR_NUMBER, DURATION, DATE TIME and VALUE columns
+    """
+    if isinstance(response, pd.DataFrame):
+        df = response.reset_index()
+    else:
+        df = pd.DataFrame(response, columns=['stationId', 'SENSOR_NUM', 'durCode', 'date', 'value'])
+        df = df.rename({'stationId': 'STATION_ID',
+                        'SENSOR_NUM': 'SENSOR_NUMBER',
+                        'durCode': 'DURATION',
+                        'date': 'DATE TIME',
+                        'value': 'VALUE'}, axis=1)
+
+    df = df[['STATION_ID', 'SENSOR_NUMBER', 'DURATION', 'DATE TIME', 'VALUE']]
+    return df.assign(**{'DATE TIME': pd.to_datetime(df['DATE TIME']),
+                        'VALUE': pd.to_numeric(df['VALUE'], errors='coerce').replace([-9999, -9998, -9997], np.nan)})
+
+
 def get_station_metadata(station, as_geojson=False):
     """
     get the gage meta data and datum, monitor/flood/danger stage information
@@ -459,19 +562,14 @@ def get_daily_snowpack_data(region, start, end):
         (dict): dictionary containing dataframe with % of normal and % of April 1 values
     """
     # validate region string is one of the 4 provided
-    if region not in ['NORTH', 'SOUTH', 'CENTRAL', 'STATE']:
+    if region not in SNOWPACK_REGIONS:
         raise ValueError(f'<region> string must be NORTH, SOUTH, CENTRAL, or STATE.')
 
-    # read in snowpack region table as dataframe
-    df = pd.read_html(f'https://cdec.water.ca.gov/dynamicapp/querySWC?reg={region}', flavor='html5lib')[0]
-    df['Date'] = pd.to_datetime(df['Date'])
-
-    # sort and index dataframe by ascending date 
-    df.sort_values('Date', inplace=True)
-    df.set_index('Date', inplace=True)
+    # cached, date-sorted snowpack history for region
+    df = _get_snowpack_region(region, dt.timedelta(hours=1), utils.get_session(pool_size=1))
 
-    # slice dataframe for query range
-    df_query = df.loc[start:end]
+    # slice dataframe for query range; copied so that the cached history is not modified by callers
+    df_query = df.loc[start:end].copy()
 
     # issue warning if dates are outside of possible query range
     if start < df.index[0]:
@@ -482,3 +580,93 @@ def get_daily_snowpack_data(region, start, end):
     return {'info': {'interval': 'daily',
                      'region': region},
             'data': df_query}
+
+
+def get_snowpack_history(regions=SNOWPACK_REGIONS, max_age=dt.timedelta(hours=1), workers=4):
+    """
+    return the full querySWC snowpack history for each region, indexed by sorted date; regions are fetched
+    concurrently and re-parsed only when the upstream page changes.  Within `max_age` of the last check,
+    the in-memory history is returned without a request.
+
+    Arguments:
+        regions (list): regions to include; any of 'NORTH', 'CENTRAL', 'SOUTH', 'STATE'
+        max_age (datetime.timedelta): time before the upstream page is revalidated
+        workers (int): number of concurrent requests
+    Returns:
+        (dict): dictionary of region names and date-indexed snowpack dataframes
+    """
+    session = utils.get_session(pool_size=workers)
+    results = utils.get_concurrent_results(lambda x: _get_snowpack_region(x, max_age, session), regions, workers)
+
+    for region, result in results.items():
+        if isinstance(result, Exception):
+            raise result
+    return results
+
+
+def _get_snowpack_region(region, max_age, session):
+    """
+    Arguments:
+        region (str): one of 'NORTH', 'CENTRAL', 'SOUTH', 'STATE'
+        max_age (datetime.timedelta): time before the upstream page is revalidated
+        session (requests.Session): session for connection reuse
+    Returns:
+        df (pandas.DataFrame): the date-indexed snowpack history for region
+    """
+    cached = _SNOWPACK_CACHE.get(region)
+    now = dt.datetime.now()
+    if cached is not None and now - cached['checked'] < max_age:
+        return cached['data']
+
+    cache_dir = utils.get_cache_dir('dwr', 'cdec', 'snowpack')
+    content, changed = utils.get_cached_content(f'https://cdec.water.ca.gov/dynamicapp/querySWC?reg={region}',
+                                                cache_dir,
+                                                session=session)
+    digest = hashlib.sha256(content).hexdigest()
+
+    # reuse parsed history from memory or disk if the page is unchanged
+    path = cache_dir.joinpath(f'{region}.pkl')
+    if cached is None and path.exists():
+        cached = pd.read_pickle(path)
+    if cached is not None and cached['sha256'] == digest:
+        df = cached['data']
+    else:
+        df = _parse_snowpack_table(content)
+        pd.to_pickle({'sha256': digest, 'data': df}, path)
+
+    _SNOWPACK_CACHE[region] = {'checked': now, 'sha256': digest, 'data': df}
+    return df
+
+
+def _parse_snowpack_table(content):
+    """
+    extract the querySWC snowpack table, identified by its Date column; rows of nested tables are excluded
+
+    Arguments:
+        content (bytes, str): the querySWC HTML content
+    Returns:
+        df (pandas.DataFrame): the snowpack history, indexed by ascending date
+    """
+    soup = BeautifulSoup(content, 'html.parser')
+    for table in soup.find_all('table'):
+        rows = [[''.join(y for y in x.find_all(string=True) if y.find_parent('table') is table).replace('\xa0', ' ').strip()
+                 for x in row.find_all(['th', 'td'], recursive=False)]
+                for row in table.find_all('tr') if row.find_parent('table') is table]
+        rows = [x for x in rows if bool(x)]
+        if bool(rows) and 'Date' in rows[0]:
+            break
+    else:
+        raise ValueError('snowpack table not found in querySWC content')
+
+    df = pd.DataFrame(rows[1:], columns=rows[0])
+    df = df.replace('', np.nan)
+    for column in df.columns:
+        if column != 'Date':
+            df[column] = pd.to_numeric(df[column], errors='ignore')
+
+    df['Date'] = pd.to_datetime(df['Date'])
+
+    # sort and index dataframe by ascending date
+    df.sort_values('Date', inplace=True, kind='mergesort')
+    df.set_index('Date', inplace=True)
+    return df
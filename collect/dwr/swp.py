@@ -4,12 +4,19 @@ collect.dwr.swp
 access select DWR delta conditions PDFs and State Water Project files
 """
 # -*- coding: utf-8 -*-
+import concurrent.futures
 import datetime as dt
+import hashlib
 import io
+import json
+import os
 import re
+import threading
+import time
 
 import pandas as pd
-import requests
+
+from collect import utils
 
 try:
     import pdftotext
@@ -95,6 +102,10 @@ def get_report_catalog(console=True):
     return catalog
 
 
+# flattened catalog of report names and URLs, built once on import
+_REPORT_URLS = {k: v for d in get_report_catalog(console=False).values() for k, v in d.items()}
+
+
 def get_report_url(report):
     """
     Arguments:
@@ -102,19 +113,67 @@ def get_report_url(report):
     Returns:
         url (str): the path to the PDF report
     """
-    # flatten the catalog
-    flat = {k: v for d in get_report_catalog(console=False).values() for k, v in d.items() }
-
     # look up the URL by the name of the report
-    return flat.get(report)
+    return _REPORT_URLS.get(report)
+
+
+def get_report_content(report, session=None):
+    """
+    return the content of a report on the SWP website; reports are kept in a local cache and revalidated
+    with conditional requests, so unchanged reports are not downloaded again
+
+    Arguments:
+        report (str): designates which report to retrieve
+        session (requests.Session): optional session for connection reuse
+    Returns:
+        content (bytes): the report content
+    Raises:
+        ValueError: if the specified report is not in the catalog, raise a ValueError
+    """
+    url = get_report_url(report)
+    if url is None:
+        raise ValueError(f'ERROR: {report} is not a valid report name')
+
+    content, _ = utils.get_cached_content(url, utils.get_cache_dir('dwr', 'swp'), session=session)
+    return content
+
 
+def get_reports(reports=None, workers=8):
+    """
+    fetch many SWP reports concurrently over a pooled session; by default, all PDF-formatted OCO reports
 
-def get_raw_text(report, filename=None, preserve_white_space=True):
+    Arguments:
+        reports (list): report names from the catalog; if None, all PDF-formatted reports are fetched
+        workers (int): number of concurrent report downloads
+    Returns:
+        result (dict): report content (bytes) keyed by report name, and metadata including failed reports
+    """
+    if reports is None:
+        reports = [k for k, v in _REPORT_URLS.items() if v.endswith('.pdf')]
+
+    # fetch all reports with one connection pool
+    session = utils.get_session(pool_size=workers)
+    results = utils.get_concurrent_results(lambda x: get_report_content(x, session=session),
+                                           reports,
+                                           workers=workers)
+
+    errors = {k: str(v) for k, v in results.items() if isinstance(v, Exception)}
+    for report, message in errors.items():
+        print(f'ERROR: {report} could not be retrieved: {message}')
+
+    return {'data': {k: v for k, v in results.items() if k not in errors},
+            'info': {'urls': {k: get_report_url(k) for k in reports},
+                     'retrieved': dt.datetime.now().strftime('%Y-%m-%d'),
+                     'errors': errors}}
+
+
+def get_raw_text(report, filename=None, preserve_white_space=True, content=None):
     """
     extract text data from a PDF report on the SWP website
 
     Arguments:
         filename (str): optional filename (.txt) for raw report export
+        content (bytes): optional PDF content previously retrieved with get_reports
     Returns:
         content (str): the string contents of the PDF (preserves whitespace)
     Raises:
@@ -126,8 +185,11 @@ def get_raw_text(report, filename=None, preserve_white_space=True):
     if not url.endswith('.pdf'):
         raise ValueError(f'ERROR: {report} is not PDF-formatted')
 
-    # request report content from URL
-    with io.BytesIO(requests.get(url).content) as buf:
+    # request report content from URL, or the local cache if unchanged
+    if content is None:
+        content = get_report_content(report)
+
+    with io.BytesIO(content) as buf:
 
         # parse PDF and extract as string
         content = pdftotext.PDF(buf, raw=False, physical=True)[0]
@@ -147,23 +209,51 @@ def get_raw_text(report, filename=None, preserve_white_space=True):
     return content
 
 
-def get_delta_daily_data(export_as='dict'):
+# patterns for the report date and the delta and storage variables of the daily delta operations report
+_DELTA_DATE_PATTERN = re.compile(r'(?P<date>\d{1,2}/\d{1,2}/\d{4})')
+_DELTA_ENTRY_PATTERN = re.compile(r'(?:\s+)(?P<key>.*)\s+(?P<operator>=|\~{1}|>|<)\s+(?P<value>.+)')
+_DELTA_NEGATIVE_PATTERN = re.compile(r'^(‐\d+)')
+_DELTA_UNITS_PATTERN = re.compile(r'(?P<units>cfs|TAF|km|%|% \(14-day avg\))$')
+
+# the categories of the daily delta operations report and their variables
+_DELTA_DAILY_TEMPLATE = {
+    'Scheduled Exports for Today': ['Clifton Court Inflow',
+                                    'Jones Pumping Plant'],
+    'Estimated Delta Hydrology': ['Total Delta Inflow',
+                                  'Sacramento River',
+                                  'San Joaquin River'],
+    'Delta Operations': ['Delta Conditions',
+                         'Delta x-channel Gates (% of day is open)',
+                         'Outflow Index',
+                         '% Inflow Diverted',
+                         'X2 Position (yesterday)',
+                         'Controlling Factor(s)',
+                         'OMR Index Daily Value'],
+    'Reservoir Storages (as of midnight)': ['Shasta Reservoir',
+                                            'Folsom Reservoir',
+                                            'Oroville Reservoir',
+                                            'San Luis Res. Total',
+                                            'SWP Share'],
+    'Reservoir Releases': ['Keswick',
+                           'Nimbus',
+                           'Oroville'],
+}
+
+
+def get_delta_daily_data(export_as='dict', content=None):
     """
     fetch and return SWP OCO's daily delta operations report
 
     Arguments:
         export_as (str): designates which format to use for returned data
+        content (bytes): optional PDF content previously retrieved with get_reports
     Returns:
         result (dict): the report contents and metadata
     """
-    content = get_raw_text('Delta Operations Summary (daily)', 'raw_export.txt')
-
-    with open ('helper.txt', 'w') as f:
-        f.write(content)
+    content = get_raw_text('Delta Operations Summary (daily)', content=content)
 
     # extract current report's date
-    rx = re.compile(r'(?P<date>\d{1,2}/\d{1,2}/\d{4})')
-    date = rx.search(content).group('date')
+    date = _DELTA_DATE_PATTERN.search(content).group('date')
 
     # parse the report date
     date_reformat = dt.datetime.strptime(date, '%m/%d/%Y').strftime('%Y-%m-%d')
@@ -178,99 +268,116 @@ def get_delta_daily_data(export_as='dict'):
         'raw': content,
     }
 
-    # pattern to match delta and storage variables
-    rx = re.compile(r'(?:\s+)(?P<key>.*)\s+(?P<operator>=|\~{1}|>|<)\s+(?P<value>.+)')
-
-    def _parse_entry(match):
-        value = match.group('value')
-
-        # clean up dash to be parsed as minus sign for numeric entries
-        if re.match(r'^(‐\d+)', value) is not None:
-            value = value.replace('‐', '-')
+    entries = _extract_delta_daily_entries([content])
 
-        units_match = re.findall(r'(cfs|TAF|km|%|% \(14-day avg\))$', value)
-        units = units_match[0] if bool(units_match) else ''
-
-        if bool(units):
-            value = value.rstrip(units).strip().replace(',', '')
-
-        if match.group('operator') == '=':
-            if bool(units):
-                return {'value': float(value), 'units': units}
-            return {'value': value, 'units': units}
-        return {'value': ' '.join([match.group('operator'), value]), 'units': units}
-
-    # extract all groups matching this regular expression pattern
-    extract = {match.group('key').strip(): _parse_entry(match)
-               for match in rx.finditer(content)}
-
-    # structured dictionary template organizes the categories of the report
-    result = {
-        # 'date': date_reformat,
-        'Scheduled Exports for Today': {
-            'Clifton Court Inflow': [],
-            'Jones Pumping Plant': []
-        },
-        'Estimated Delta Hydrology': {
-            'Total Delta Inflow': [],
-            'Sacramento River': [],
-            'San Joaquin River': [],
-        },
-        'Delta Operations': {
-            'Delta Conditions': [],
-            'Delta x-channel Gates (% of day is open)': [],
-            'Outflow Index': [],
-            '% Inflow Diverted': [],
-            'X2 Position (yesterday)': [],
-            'Controlling Factor(s)': [],
-            'OMR Index Daily Value': [],
-        },
-        'Reservoir Storages (as of midnight)': {
-            'Shasta Reservoir': [],
-            'Folsom Reservoir': [],
-            'Oroville Reservoir': [],
-            'San Luis Res. Total': [],
-            'SWP Share': [],
-        },
-        'Reservoir Releases': {
-            'Keswick': [],
-            'Nimbus': [],
-            'Oroville': [],
-        }
-    }
+    # return formatted report extraction
+    if export_as == 'dict':
+        records = {(x.section, x.key): {'value': x.value, 'units': x.units} for x in entries.itertuples()}
+        result = {section: {k: records.get((section, k)) for k in keys}
+                  for section, keys in _DELTA_DAILY_TEMPLATE.items()}
+        return {'info': meta, 'data': result}
 
-    # create dataframe
-    df = pd.DataFrame(index=[date_reformat])
+    return {'info': meta, 'data': _build_delta_daily_frame(entries, [date_reformat])}
 
-    # update nested dictionary from extraction
-    for x, v in result.items():
-        if isinstance(v, dict):
-            for k in v.keys():
 
-                # cleaning for n-dash vs m-dash in source content
-                element = extract.get(k, extract.get(k.replace('-', '‐')))
+def parse_delta_daily_reports(texts):
+    """
+    parse many daily delta operations report texts (i.e. archived get_raw_text output) in one pass
 
-                v.update({k: element})
+    Arguments:
+        texts (iterable): the report texts
+    Returns:
+        df (pandas.DataFrame): one row per report indexed by report date, with the columns of
+                               get_delta_daily_data(export_as='dataframe')
+    """
+    texts = pd.Series(list(texts), dtype=object)
+    dates = texts.str.extract(_DELTA_DATE_PATTERN)['date']
+    index = pd.to_datetime(dates, format='%m/%d/%Y').dt.strftime('%Y-%m-%d').tolist()
+    return _build_delta_daily_frame(_extract_delta_daily_entries(texts), index)
 
-                # update frame
-                df[x, k, element['units']] = element['value']
 
-    df.columns = pd.MultiIndex.from_tuples(df.columns)
+def _extract_delta_daily_entries(texts):
+    """
+    extract the report variables from daily delta operations report texts
 
-    # return formatted report extraction
-    return {'info': meta, 'data': result if export_as == 'dict' else df}
+    Arguments:
+        texts (iterable): the report texts
+    Returns:
+        entries (pandas.DataFrame): long table of section, key, units, value and template position,
+                                    indexed by the position of the report in texts
+    """
+    texts = pd.Series(list(texts), dtype=object)
+    entries = texts.str.extractall(_DELTA_ENTRY_PATTERN).droplevel('match').rename_axis('report')
+    entries['key'] = entries['key'].str.strip()
+
+    # the last entry for each key is used
+    entries = entries.loc[~entries.set_index('key', append=True).index.duplicated(keep='last')]
+
+    # match entries to the template, preferring keys written with a hyphen over those with an n-dash
+    lookup = pd.DataFrame([(variant, section, key, position, variant == key)
+                           for position, (section, key) in enumerate((x, k) for x, v in _DELTA_DAILY_TEMPLATE.items()
+                                                                     for k in v)
+                           for variant in [key.replace('-', '‐'), key]],
+                          columns=['variant', 'section', 'template', 'position', 'exact']).drop_duplicates('variant')
+    entries = (entries.reset_index()
+                      .merge(lookup, left_on='key', right_on='variant')
+                      .sort_values(['report', 'exact'], kind='stable')
+                      .drop_duplicates(['report', 'template'], keep='last')
+                      .set_index('report'))
+    entries['key'] = entries['template']
+
+    # clean up dash to be parsed as minus sign for numeric entries
+    value = entries['value']
+    negative = value.str.match(_DELTA_NEGATIVE_PATTERN)
+    value = value.where(~negative, value.str.replace('‐', '-', regex=False))
+
+    # separate units from values
+    units = value.str.extract(_DELTA_UNITS_PATTERN)['units'].fillna('')
+    for x in units.unique():
+        if bool(x):
+            value = value.where(units != x, value.str[:-len(x)])
+    value = value.where(units == '', value.str.strip().str.replace(',', '', regex=False))
+
+    # values with units are numeric; values with comparison operators are kept as text with the operator
+    value = value.astype(object)
+    numeric = (entries['operator'] == '=') & (units != '')
+    value.loc[numeric] = value.loc[numeric].astype(float)
+    other = entries['operator'] != '='
+    value.loc[other] = entries['operator'].loc[other] + ' ' + value.loc[other]
+
+    return pd.DataFrame({'section': entries['section'],
+                         'key': entries['key'],
+                         'units': units,
+                         'value': value,
+                         'position': entries['position']})
+
+
+def _build_delta_daily_frame(entries, index):
+    """
+    Arguments:
+        entries (pandas.DataFrame): long table from _extract_delta_daily_entries
+        index (list): the report dates
+    Returns:
+        df (pandas.DataFrame): one row per report, with (section, key, units) columns in template order
+    """
+    columns = entries.groupby(['section', 'key', 'units'])['position'].min().sort_values(kind='stable').index
+    df = entries.reset_index().pivot(index='report', columns=['section', 'key', 'units'], values='value')
+    df = df.reindex(index=range(len(index)), columns=columns)
+    df.index = index
+    df.columns = pd.MultiIndex.from_tuples(df.columns.tolist())
+    return df.infer_objects()
 
 
-def get_barker_slough_data():
+def get_barker_slough_data(content=None):
     """
     fetch and return SWP OCO's Barker Slough Flows (weekly) report
 
     Arguments:
-        report (str): designates which report to retrieve
+        content (bytes): optional PDF content previously retrieved with get_reports
     Returns:
         result (dict): the report contents and metadata
     """
-    content = get_raw_text('Barker Slough Flows (weekly)')
+    content = get_raw_text('Barker Slough Flows (weekly)', content=content)
 
     # report information
     meta = {
@@ -295,112 +402,328 @@ def get_barker_slough_data():
     return {'info': meta, 'data': df}
 
 
-def get_oco_tabular_data(report):
+def get_oco_tabular_data(report, content=None, parallel=False, workers=None):
     """
     support for Hydrologic Conditions Summary (daily) and Miscellaneous Monitoring Data (daily)
     reports; combines multi-page reporting into single date-indexed dataframe
 
     Arguments:
         report (str): designates which report to retrieve
+        content (bytes): optional PDF content previously retrieved with get_reports
+        parallel (bool): if True, the extracted pages are parsed in a process pool
+        workers (int): number of worker processes for parallel mode; defaults to the number of processors
     Returns:
         content (str): the string contents of the PDF (preserves whitespace)
     """
     # construct URL
     url = get_report_url(report)
 
-    # request report content from URL
-    with io.BytesIO(requests.get(url).content) as buf:
+    # request report content from URL, or the local cache if unchanged
+    if content is None:
+        content = get_report_content(report)
 
-        # parse PDF and extract as string
-        content = list(pdftotext.PDF(buf, raw=False, physical=True))
+    if parallel:
+        pages = _get_oco_pages_parallel(content, report, workers)
+    else:
+        pages = _get_oco_pages(content, report)
 
     # report information
-    meta =  {
+    meta = {
         'filename': url.split('/')[-1],
         # 'title': content[0].splitlines()[0],
         'contact': 'OCO_Export_Management@water.ca.gov',
         'retrieved': dt.datetime.now().strftime('%Y-%m-%d'),
-        'raw': content,
-        'pages': len(content)
+        'raw': [x[0] for x in pages],
+        'pages': len(pages),
+        'timings': [x[2] for x in pages]
     }
 
-    def _process_page(i, page, report):
-        """
-        Arguments:
-            i (int): the index of the page
-            page (str): the text content of the page
-        Returns:
-            df (pandas.DataFrame): tabular results as dataframe
-        """
-        # strip leading white space, filter out empty rows, and split rows
-        # based variable # of whitespace characters (2 or more)
-        page = page.replace(',', '')
-        rows = [re.split(r'\s{2,}', x.lstrip())
-                for x in page.splitlines() if bool(x)]
-
-        # convert table to a dataframe
-        df = pd.DataFrame(rows)
-
-        # fill missing column entry (first line of date header)
-        if report == 'Miscellaneous Monitoring Data (daily)':
-            rows[2] = [''] + rows[2]
-            rows[4][0] = '(30 days)'
-            df.columns = [' '.join(list(x)).strip() for x in zip(*rows[2:5])]
-
-        elif report == 'Water Quality Summary (daily)':
-            if i == 0:
-                return pd.DataFrame()
-            # delta water quality conditions (page 2)
-            if i == 1:
-                rows[2][0] = 'Date (30 days)'
-                rows[2][2] = 'ANT Half'
-                rows[2].insert(3, 'PCT@64km mdEC')
-                df.columns = rows[2]
-            # delta water quality conditions (page 3)
-            elif i == 2:
-                rows[2][0] = 'Date (30 days)'
-                df.columns = rows[2]
-            # delta water quality conditions (page 4)
-            elif i == 3:
-                rows[2][0] = 'Date (30 days)'
-                df.columns = rows[2]
-            # south delta stations (page 5)
-            elif i == 4:
-                rows[3][0] = 'Date (30 days)'
-                df.columns = rows[3]
-            # Suisun marsh stations (page 6)
-            elif i == 5:
-                rows[3][0] = 'Date (30 days)'
-                df.columns = rows[3]
-
-        # page 1 of hydrology report
-        elif i == 0:
-            rows[2] = [''] + rows[2]
-            rows[4] = [''] + rows[4]
-            rows[6] = ['Date (30 days)'] + rows[6]
-            df.columns = [' '.join(list(x)).strip() for x in zip(*[rows[2], rows[4], rows[6]])]
-
-        # page 2 of hydrology report
-        elif i == 1:
-            rows[2] = [''] + rows[2]
+    # return string content
+    return {'info': meta, 'data': pd.concat([x[1] for x in pages], axis=1)}
+
+
+# patterns for splitting report rows on 2 or more whitespace characters and matching dated rows
+_ROW_SPLIT_PATTERN = re.compile(r'\s{2,}')
+_ROW_DATE_PATTERN = re.compile(r'\d{2}/\d{2}/\d{4}')
+
+
+def _get_oco_pages(content, report):
+    """
+    extract and parse the pages of an OCO tabular report in order
+
+    Arguments:
+        content (bytes): the PDF content
+        report (str): designates which report to retrieve
+    Returns:
+        pages (list): (text, dataframe, seconds) for each page
+    """
+    return [_parse_oco_page((i, page, report)) for i, page in enumerate(_get_oco_page_texts(content))]
+
+
+def _get_oco_pages_parallel(content, report, workers=None):
+    """
+    parse the pages of an OCO tabular report in a process pool; the PDF text is extracted once and each
+    worker receives only the text of the page it parses
+
+    Arguments:
+        content (bytes): the PDF content
+        report (str): designates which report to retrieve
+        workers (int): number of worker processes
+    Returns:
+        pages (list): (text, dataframe, seconds) for each page, in page order
+    """
+    items = [(i, page, report) for i, page in enumerate(_get_oco_page_texts(content))]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_parse_oco_page, items))
+
+
+def _get_oco_page_texts(content):
+    """
+    Arguments:
+        content (bytes): the PDF content
+    Returns:
+        pages (list): the text of each page, preserving whitespace
+    """
+    with io.BytesIO(content) as buf:
+        return list(pdftotext.PDF(buf, raw=False, physical=True))
+
+
+def _parse_oco_page(item):
+    """
+    parse one page of extracted report text; used directly and as the process pool worker
+
+    Arguments:
+        item (tuple): the page index, page text and report name
+    Returns:
+        page (tuple): the page text, dataframe and seconds spent parsing the page
+    """
+    i, page, report = item
+    start = time.perf_counter()
+    df = _process_oco_page(i, page, report)
+    return page, df, time.perf_counter() - start
+
+
+def _process_oco_page(i, page, report):
+    """
+    Arguments:
+        i (int): the index of the page
+        page (str): the text content of the page
+        report (str): designates which report to retrieve
+    Returns:
+        df (pandas.DataFrame): tabular results as dataframe
+    """
+    # strip leading white space, filter out empty rows, and split rows
+    # based variable # of whitespace characters (2 or more)
+    page = page.replace(',', '')
+    rows = [_ROW_SPLIT_PATTERN.split(x.lstrip())
+            for x in page.splitlines() if bool(x)]
+
+    # convert table to a dataframe
+    df = pd.DataFrame(rows)
+
+    # fill missing column entry (first line of date header)
+    if report == 'Miscellaneous Monitoring Data (daily)':
+        rows[2] = [''] + rows[2]
+        rows[4][0] = '(30 days)'
+        df.columns = [' '.join(list(x)).strip() for x in zip(*rows[2:5])]
+
+    elif report == 'Water Quality Summary (daily)':
+        if i == 0:
+            return pd.DataFrame()
+        # delta water quality conditions (page 2)
+        if i == 1:
+            rows[2][0] = 'Date (30 days)'
+            rows[2][2] = 'ANT Half'
+            rows[2].insert(3, 'PCT@64km mdEC')
+            df.columns = rows[2]
+        # delta water quality conditions (page 3)
+        elif i == 2:
+            rows[2][0] = 'Date (30 days)'
+            df.columns = rows[2]
+        # delta water quality conditions (page 4)
+        elif i == 3:
+            rows[2][0] = 'Date (30 days)'
+            df.columns = rows[2]
+        # south delta stations (page 5)
+        elif i == 4:
+            rows[3][0] = 'Date (30 days)'
+            df.columns = rows[3]
+        # Suisun marsh stations (page 6)
+        elif i == 5:
             rows[3][0] = 'Date (30 days)'
-            df.columns = [' '.join(list(x)).strip() for x in zip(*[rows[2], rows[3]])]
+            df.columns = rows[3]
+
+    # page 1 of hydrology report
+    elif i == 0:
+        rows[2] = [''] + rows[2]
+        rows[4] = [''] + rows[4]
+        rows[6] = ['Date (30 days)'] + rows[6]
+        df.columns = [' '.join(list(x)).strip() for x in zip(*[rows[2], rows[4], rows[6]])]
+
+    # page 2 of hydrology report
+    elif i == 1:
+        rows[2] = [''] + rows[2]
+        rows[3][0] = 'Date (30 days)'
+        df.columns = [' '.join(list(x)).strip() for x in zip(*[rows[2], rows[3]])]
+
+    else:
+        raise NotImplementedError('Report is expected to include a maximum of 2 pages.')
+
+    # filter for date format and set date index
+    df = df.loc[df['Date (30 days)'].str.match(_ROW_DATE_PATTERN)]
+    df.set_index('Date (30 days)', drop=True, inplace=True)
+    df.index = pd.to_datetime(df.index)
 
-        else:
-            raise NotImplementedError('Report is expected to include a maximum of 2 pages.')
+    # filter out all rows/columns where all entries are null/None
+    df = df.dropna(axis=0, how='all').dropna(axis=1, how='all')
 
-        # filter for date format and set date index
-        df = df.loc[df['Date (30 days)'].str.match(r'\d{2}/\d{2}/\d{4}')]
-        df.set_index('Date (30 days)', drop=True, inplace=True)
-        df.index = pd.to_datetime(df.index)
+    return df
 
-        # filter out all rows/columns where all entries are null/None
-        df = df.dropna(axis=0, how='all').dropna(axis=1, how='all')
 
-        return df
+# reports captured in the snapshot history; each publication overwrites the previous report on the SWP website
+SNAPSHOT_REPORTS = ['Delta Operations Summary (daily)',
+                    'Hydrologic Conditions Summary (daily)',
+                    'Barker Slough Flows (weekly)']
 
-    # process multiple pages
-    frames = [_process_page(i, page, report) for i, page in enumerate(content)]
+# guards the snapshot manifests for concurrent captures
+_SNAPSHOT_LOCK = threading.Lock()
 
-    # return string content
-    return {'info': meta, 'data': pd.concat(frames, axis=1)}
+
+def capture_snapshots(reports=None, workers=8):
+    """
+    fetch the current publication of each report and add any new publications to the snapshot history;
+    intended to be run on a schedule, since the SWP reports are overwritten in place
+
+    Arguments:
+        reports (list): report names from SNAPSHOT_REPORTS; if None, all snapshot reports are captured
+        workers (int): number of concurrent report downloads
+    Returns:
+        result (dict): the snapshot manifest entry for each report, and the new and failed captures
+    """
+    reports = SNAPSHOT_REPORTS if reports is None else reports
+    fetched = get_reports(reports, workers=workers)
+
+    snapshots, new, errors = {}, [], dict(fetched['info']['errors'])
+    for report, content in fetched['data'].items():
+        try:
+            snapshots[report], captured = capture_snapshot(report, content=content)
+        except Exception as err:
+            print(f'ERROR: {report} snapshot could not be parsed: {err}')
+            errors[report] = str(err)
+            continue
+        if captured:
+            new.append(report)
+
+    return {'data': snapshots, 'info': {'new': new, 'errors': errors}}
+
+
+def capture_snapshot(report, content=None):
+    """
+    add the current publication of report to the snapshot history, unless a publication with the same
+    content hash has already been captured; snapshots are never modified once written
+
+    Arguments:
+        report (str): one of SNAPSHOT_REPORTS
+        content (bytes): optional PDF content previously retrieved with get_reports
+    Returns:
+        entry (dict): the manifest entry for the publication
+        captured (bool): flag to indicate the publication was added to the history
+    """
+    if report not in SNAPSHOT_REPORTS:
+        raise ValueError(f'ERROR: {report} is not one of {SNAPSHOT_REPORTS}')
+
+    if content is None:
+        content = get_report_content(report)
+
+    store = _get_snapshot_dir(report)
+    digest = hashlib.sha256(content).hexdigest()
+    for entry in _get_snapshot_manifest(report):
+        if entry['sha256'] == digest:
+            return entry, False
+
+    # parsed values are stored as a date-indexed frame per publication
+    df = _parse_snapshot(report, content)
+    path = f'{df.index.max():%Y%m%d}_{digest[:12]}.pkl'
+    if not store.joinpath(path).exists():
+        pd.to_pickle(df, store.joinpath(f'{path}.tmp'))
+        os.replace(store.joinpath(f'{path}.tmp'), store.joinpath(path))
+
+    entry = {'sha256': digest,
+             'path': path,
+             'start': df.index.min().strftime('%Y-%m-%d'),
+             'end': df.index.max().strftime('%Y-%m-%d'),
+             'retrieved': dt.datetime.now().isoformat(timespec='seconds')}
+
+    with _SNAPSHOT_LOCK:
+        manifest = _get_snapshot_manifest(report)
+        manifest.append(entry)
+        store.joinpath('manifest.tmp').write_text(json.dumps(manifest, indent=4))
+        os.replace(store.joinpath('manifest.tmp'), store.joinpath('manifest.json'))
+
+    return entry, True
+
+
+def get_snapshot_history(report, start=None, end=None):
+    """
+    date-indexed history of report values from the captured publications; where publications overlap,
+    values from the latest publication are used
+
+    Arguments:
+        report (str): one of SNAPSHOT_REPORTS
+        start (datetime.datetime): optional start of the date range
+        end (datetime.datetime): optional end of the date range
+    Returns:
+        df (pandas.DataFrame): the report values for the date range
+    """
+    start = pd.Timestamp.min if start is None else pd.Timestamp(start)
+    end = pd.Timestamp.max if end is None else pd.Timestamp(end)
+
+    # only publications overlapping the date range are read
+    store = _get_snapshot_dir(report)
+    frames = [pd.read_pickle(store.joinpath(x['path'])) for x in _get_snapshot_manifest(report)
+              if pd.Timestamp(x['start']) <= end and pd.Timestamp(x['end']) >= start]
+    if len(frames) == 0:
+        return pd.DataFrame()
+
+    df = pd.concat(frames)
+    df = df.loc[~df.index.duplicated(keep='last')].sort_index()
+    return df.loc[start:end]
+
+
+def _get_snapshot_dir(report):
+    """
+    Arguments:
+        report (str): one of SNAPSHOT_REPORTS
+    Returns:
+        store (pathlib.Path): the snapshot directory for report
+    """
+    return utils.get_cache_dir('dwr', 'swp', 'snapshots', get_report_url(report).split('/')[-1].split('.')[0])
+
+
+def _get_snapshot_manifest(report):
+    """
+    Arguments:
+        report (str): one of SNAPSHOT_REPORTS
+    Returns:
+        manifest (list): manifest entries for the captured publications, in order of capture
+    """
+    path = _get_snapshot_dir(report).joinpath('manifest.json')
+    return json.loads(path.read_text()) if path.exists() else []
+
+
+def _parse_snapshot(report, content):
+    """
+    Arguments:
+        report (str): one of SNAPSHOT_REPORTS
+        content (bytes): the PDF content
+    Returns:
+        df (pandas.DataFrame): the date-indexed report values
+    """
+    if report == 'Delta Operations Summary (daily)':
+        df = get_delta_daily_data(export_as='dataframe', content=content)['data']
+        df.index = pd.to_datetime(df.index)
+    elif report == 'Barker Slough Flows (weekly)':
+        df = get_barker_slough_data(content=content)['data']
+    else:
+        df = get_oco_tabular_data(report, content=content)['data']
+    return df
@@ -5,12 +5,24 @@ access DWR water supply index data
 """
 # -*- coding: utf-8 -*-
 import datetime as dt
-from bs4 import BeautifulSoup
+import hashlib
+from bs4 import BeautifulSoup, SoupStrainer
 import pandas as pd
-import requests
 import re
 from io import StringIO
 
+from collect import utils
+
+
+# parsed reports by name, with the time of the last upstream check and the content hash
+_WSI_CACHE = {}
+
+# header line of a forecast table, labelled with exceedance probabilities
+_EXCEEDANCE_PATTERN = re.compile(r'\d{1,2}\s*%')
+
+# forecast table cell value; missing values are reported as dashes or N/A
+_FORECAST_VALUE_PATTERN = re.compile(r'^(?:-?\d+(?:\.\d+)?|-+|N/?A)$')
+
 
 def clean_fwf_df(table_text, col_spec, header, skiprows=[]):
     """
@@ -27,17 +39,32 @@ def clean_fwf_df(table_text, col_spec, header, skiprows=[]):
                        skiprows=skiprows).dropna()
 
 
-def get_wsi_data():
-    """
-    Water Supply Index Info
+def get_wsi_data(max_age=dt.timedelta(days=1)):
     """
+    Water Supply Index Info; the parsed tables are cached locally.  The page is revalidated with a conditional
+    request (ETag/Last-Modified) once per `max_age`, so that in-season updates to the current water year are
+    picked up, and is re-parsed only if it has changed.
 
+    Arguments:
+        max_age (datetime.timedelta): time before the upstream page is revalidated
+    Returns:
+        (dict): dictionary of the wyi, 8-river and official tables and metadata
+    """
     # main WRWSIHIST url
     url = 'http://cdec.water.ca.gov/reportapp/javareports?name=wsihist'
+    return _get_cached_report(url, 'wsihist', _parse_wsi_history, max_age)
+
 
+def _parse_wsi_history(content, url):
+    """
+    Arguments:
+        content (bytes): the WRWSIHIST page content
+        url (str): the WRWSIHIST url
+    Returns:
+        (dict): dictionary of the wyi, 8-river and official tables and metadata
+    """
     # parse HTML file structure; AJ forecast table
-    soup = BeautifulSoup(requests.get(url).content, 'html.parser')
-    table = soup.find('pre').text
+    table = _get_report_text(content)
 
     # three tables on this page
     wyi_table, eight_river_runoff_table, official_year_class_table = table.strip().rstrip('.END').strip().split('\n\n\n')
@@ -75,8 +102,141 @@ def get_wsi_data():
     return {'data': {'wyi': wyi_data, '8-river': eight_river_data, 'official': official_year_data}, 'info': info}
 
 
-def get_wsi_forecast():
+def get_wsi_forecast(max_age=dt.timedelta(days=1)):
     """
     http://cdec.water.ca.gov/reportapp/javareports?name=wsi
+    Water Supply Index forecast; each forecast table is labelled with exceedance probabilities and is
+    parsed as fixed-width text.  The page is revalidated with a conditional request once per `max_age`.
+
+    Arguments:
+        max_age (datetime.timedelta): time before the upstream page is revalidated
+    Returns:
+        (dict): dictionary of forecast tables keyed by 'sac' and 'sjv' (or the table title) and metadata
+    """
+    url = 'http://cdec.water.ca.gov/reportapp/javareports?name=wsi'
+    return _get_cached_report(url, 'wsi', _parse_wsi_forecast, max_age)
+
+
+def _parse_wsi_forecast(content, url):
+    """
+    Arguments:
+        content (bytes): the WSI forecast page content
+        url (str): the WSI forecast url
+    Returns:
+        (dict): dictionary of forecast tables and metadata
+    """
+    text = _get_report_text(content)
+
+    # tables are separated by blank lines; each table is titled by the nearest preceding index name, or
+    # otherwise by the nearest text before the table header
+    data, titles = {}, {}
+    index_title = None
+    for section in re.split(r'\n[ \t]*\n', text.strip().rstrip('.END').strip()):
+        lines = section.splitlines()
+        header = next((i for i, x in enumerate(lines) if _EXCEEDANCE_PATTERN.search(x)), None)
+        index_title = next((x.strip() for x in lines[:header][::-1] if 'INDEX' in x.upper()), index_title)
+        if header is None:
+            continue
+
+        title = index_title or next((x.strip() for x in lines[:header][::-1] if bool(x.strip())),
+                                    f'Table {len(data) + 1}')
+        index_title = None
+        if 'SACRAMENTO' in title.upper():
+            key = 'sac'
+        elif 'SAN JOAQUIN' in title.upper():
+            key = 'sjv'
+        else:
+            key = title
+
+        df = _parse_forecast_table(lines[header], lines[header + 1:])
+        data[key] = df
+        titles[key] = title
+
+    info = {
+        'url': url,
+        'type': 'WSI Forecast',
+        'title': text.strip().splitlines()[0].strip(),
+        'tables': titles,
+        'units': 'MAF',
+        'downloaded': dt.datetime.now().strftime('%Y-%m-%d %H:%M')
+    }
+
+    return {'data': data, 'info': info}
+
+
+def _parse_forecast_table(header, rows):
+    """
+    parse a forecast table from its header and rows; each row is a forecast date followed by one value per
+    exceedance label, and rows that do not match (underlines, classification legends, notes) are skipped
+
+    Arguments:
+        header (str): the table header line, i.e. 'Forecast Date    90%    75%    50%    25%    10%'
+        rows (list): the lines following the header
+    Returns:
+        df (pandas.DataFrame): forecast values indexed by forecast date, with one column per exceedance label
+    """
+    labels = [re.sub(r'\s+', '', x) for x in _EXCEEDANCE_PATTERN.findall(header)]
+    name = header[:_EXCEEDANCE_PATTERN.search(header).start()].strip() or 'Forecast'
+
+    records = {}
+    for row in rows:
+        tokens = row.split()
+        label, values = ' '.join(tokens[:-len(labels)]), tokens[-len(labels):]
+        if not re.search(r'\w', label) or not all(_FORECAST_VALUE_PATTERN.match(x) for x in values):
+            continue
+        records[label] = pd.to_numeric(values, errors='coerce')
+
+    df = pd.DataFrame.from_dict(records, orient='index', columns=labels).astype(float)
+    df.index.name = name
+    return df
+
+
+def _get_report_text(content):
     """
-    return {'data': {}, 'info': {}}
+    Arguments:
+        content (bytes): the report page content
+    Returns:
+        (str): the preformatted report text
+    """
+    return BeautifulSoup(content, 'html.parser', parse_only=SoupStrainer('pre')).find('pre').text
+
+
+def _get_cached_report(url, name, parser, max_age):
+    """
+    return the parsed report from memory or the local cache, revalidating the page with a conditional request
+    after `max_age` and re-parsing only if the page content has changed
+
+    Arguments:
+        url (str): the report url
+        name (str): the report name used for the cached files
+        parser (callable): function of the page content and url returning the parsed report
+        max_age (datetime.timedelta): time before the upstream page is revalidated
+    Returns:
+        (dict): the parsed report
+    """
+    cache_dir = utils.get_cache_dir('dwr', 'wsi')
+    path = cache_dir.joinpath(f'{name}.pkl')
+
+    cached = _WSI_CACHE.get(name)
+    if cached is None and path.exists():
+        cached = pd.read_pickle(path)
+
+    now = dt.datetime.now()
+    if cached is not None:
+        if now - cached['checked'] < max_age:
+            _WSI_CACHE[name] = cached
+            return cached['result']
+
+    content, _ = utils.get_cached_content(url, cache_dir, session=utils.get_session(pool_size=1))
+    digest = hashlib.sha256(content).hexdigest()
+
+    # the page is only re-parsed if it has changed
+    if cached is not None and cached['sha256'] == digest:
+        result = cached['result']
+    else:
+        result = parser(content, url)
+
+    cached = {'checked': now, 'sha256': digest, 'result': result}
+    _WSI_CACHE[name] = cached
+    pd.to_pickle(cached, path)
+    return result
@@ -32,59 +32,109 @@ Available Sites (generate with `nid.get_sites()`)
 # -*- coding: utf-8 -*-
 import datetime as dt
 import io
+import json
+import os
 import re
+import threading
 
 from bs4 import BeautifulSoup
+import numpy as np
 import pandas as pd
 import requests
 
 from collect import utils
 
 
-def get_sites():
+# file listings by site, with the time retrieved
+_SITE_FILES = {}
+
+# guards the file listing cache for concurrent requests
+_SITE_FILES_LOCK = threading.Lock()
+
+# month offsets of the daily report table header labels
+_MONTH_OFFSETS = {'JAN': 0, 'FEB': 1, 'MAR': 2, 'APR': 3, 'MAY': 4, 'JUN': 5,
+                  'JUL': 6, 'AUG': 7, 'SEP': 8, 'OCT': 9, 'NOV': 10, 'DEC': 11}
+
+
+def get_sites(content=None):
     """
     reads hyquick index and returns dictionary of included sites
 
+    Arguments:
+        content (bytes): optional hyquick index page content, previously retrieved with get_index_content
     Returns:
         sites (dict): dictionary of site IDs and titles
     """
-    url = 'https://river-lake.nidwater.com/hyquick/index.htm'
-    df = pd.read_html(requests.get(url).content, flavor='html5lib', header=1, index_col=0)[0]
+    content = content or get_index_content()
+    df = pd.read_html(content, flavor='html5lib', header=1, index_col=0)[0]
     sites = df.to_dict()['Name']
     return sites
 
 
-def get_issue_date():
+def get_issue_date(content=None):
     """
     reads timestamp on hyquick index page and returns as a datetime
 
+    Arguments:
+        content (bytes): optional hyquick index page content, previously retrieved with get_index_content
     Returns:
         issue_date (datetime.datetime): the last update of the NID hyquick page
     """
-    url = 'https://river-lake.nidwater.com/hyquick/index.htm'
-    df = pd.read_html(requests.get(url).content, flavor='html5lib', header=None)[0]
+    content = content or get_index_content()
+    df = pd.read_html(content, flavor='html5lib', header=None)[0]
     return dt.datetime.strptime(df.iloc[0, 1], 'Run on %Y/%m/%d %H:%M:%S')
 
 
-def get_site_files(site):
+def get_index_content(session=None):
+    """
+    Arguments:
+        session (requests.Session): optional session for connection reuse
+    Returns:
+        content (bytes): the hyquick index page content
+    """
+    url = 'https://river-lake.nidwater.com/hyquick/index.htm'
+    return (session or utils.get_session(pool_size=1)).get(url).content
+
+
+def get_site_files(site, session=None, max_age=dt.timedelta(days=1)):
     """
+    file listings are kept in memory and in the local cache, and are requested again after `max_age`
+
     Arguments:
         site (str): the site id
-        interval (str): the site interval
+        session (requests.Session): optional session for connection reuse
+        max_age (datetime.timedelta): time before the site index is requested again
     Returns:
         links (list): sorted list of linked files available for site
     """
+    path = utils.get_cache_dir('nid').joinpath('site_files.json')
+    with _SITE_FILES_LOCK:
+        if not _SITE_FILES and path.exists():
+            _SITE_FILES.update(json.loads(path.read_text()))
+        cached = _SITE_FILES.get(site)
+
+    now = dt.datetime.now()
+    if cached is not None and now - dt.datetime.fromisoformat(cached['retrieved']) < max_age:
+        return cached['files']
+
     url = get_station_url(site, metric='index')
-    soup = BeautifulSoup(requests.get(url).content, 'html.parser')
-    links = {a.get('href') for a in soup.find_all('a')}
-    return sorted(links)
+    soup = BeautifulSoup((session or utils.get_session(pool_size=1)).get(url).content, 'html.parser')
+    links = sorted({a.get('href') for a in soup.find_all('a')})
+
+    with _SITE_FILES_LOCK:
+        _SITE_FILES.update({site: {'files': links, 'retrieved': now.isoformat(timespec='seconds')}})
+        path.with_suffix('.tmp').write_text(json.dumps(_SITE_FILES, indent=4))
+        os.replace(path.with_suffix('.tmp'), path)
+
+    return links
 
 
-def get_site_metric(site, interval='daily'):
+def get_site_metric(site, interval='daily', session=None):
     """
     Arguments:
         site (str): the site id
         interval (str): the site interval
+        session (requests.Session): optional session for connection reuse
     Returns:
         metric (str): 
     """
@@ -92,7 +142,7 @@ def get_site_metric(site, interval='daily'):
     search_pattern = r'usday_daily_(.*?)\.txt' if interval == 'daily' else r'csv_(.*?)\.csv'
 
     # loop through available links to determine product matching interval
-    for link in get_site_files(site):
+    for link in get_site_files(site, session=session):
         matches = re.search(search_pattern, link)
         if matches is not None:
             return matches.group(1)
@@ -117,61 +167,41 @@ def get_station_url(site, metric='index', interval=None):
         return f'https://river-lake.nidwater.com/hyquick/{site}/{site}.csv_{metric}.csv'
 
 
-def get_daily_data(site, json_compatible=False):
+def get_daily_data(site, json_compatible=False, session=None):
     """
     returns a `dict` and creates JSON file of the data and info for NID sites provided
 
     Arguments:
         site (str): NID site identifier
-        water_year (int): current water year
+        json_compatible (bool or str): whether to serialize the data for export to JSON; 'columnar' returns
+                                       columnar JSON bytes
+        session (requests.Session): optional session for connection reuse
     Returns:
         result (dict): dictionary of data and info for each site
     """
-    metric = get_site_metric(site, interval='daily')
+    metric = get_site_metric(site, interval='daily', session=session)
     url = get_station_url(site, metric=metric, interval='daily')
-    response = requests.get(url).text
+    response = (session or utils.get_session(pool_size=1)).get(url).text
 
-    frames = []
+    tables, years = [], []
     for group in re.split(r'(?=Nevada Irrigation District\s+)', response):
 
         if not bool(group):
             continue
 
         # split by start of table header line
-        pre_table, table = re.split(r'(?=Day\s{2,}JAN)', group)
+        pre_table, table = re.split(r'(?=Day\s{2,}[A-Z]{3}\s)', group)
 
         # get water year, site info for water year table
         meta = get_daily_meta(content=pre_table)
 
-        # load water year table to dataframe
-        data = pd.read_fwf(io.StringIO(re.split(r'\nMax', table)[0]),
-                           header=0, 
-                           skiprows=[1],
-                           nrows=36,
-                           na_values=['------', 'NaN', '']).dropna(how='all')
-
-        # convert from monthly table to water-year series
-        df = pd.melt(data, id_vars='Day').rename({'variable': 'month', 'value': metric}, axis=1)
-
-        # defunct for report formatted by water year
-        # df['year'] = df['month'].apply(lambda x: meta['water_year'] -1 if x in ['OCT', 'NOV', 'DEC']
-        #                                           else meta['water_year'])
-
-        # assign calendar year to each entry
-        df['year'] = meta['year']
-        df.index = df['Day'].astype(str) + df['month'] + df['year'].astype(str)
-
-        # drop non-existent date entries (i.e. 31NOVYYYY)
-        df.dropna(inplace=True)
-
-        # convert index to datetimes
-        df.index = pd.to_datetime(df.index, format='%d%b%Y')
-        df = df.reindex(pd.date_range(start=df.index[0], end=df.index[-1]))
-
-        frames.append(df)
+        # table header and rows, following the header underline
+        lines = re.split(r'\nMax', table)[0].splitlines()
+        tables.append((lines[0], [x for x in lines[2:] if bool(x.strip())]))
+        years.append(meta['year'])
 
     # return the dataset
-    df = pd.concat(frames, axis=0)
+    df = parse_daily_tables(tables, years).to_frame(metric)
     return {'info': {'site': site,
                      'description': meta['Site'], 
                      'usgs_id': meta['USGS #'], 
@@ -183,7 +213,67 @@ def get_daily_data(site, json_compatible=False):
                      'metric': metric, 
                      'timeseries_type': {'flow': 'flows', 'volume': 'storages'}.get(metric),
                      'timeseries_units': {'flow': 'cfs', 'volume': 'AF'}.get(metric)}, 
-            'data': serialize(df[[metric]]) if json_compatible else df[[metric]]}
+            'data': serialize(df[[metric]], columnar=json_compatible == 'columnar') if json_compatible else df[[metric]]}
+
+
+def parse_daily_tables(tables, years):
+    """
+    parse the monthly tables of a daily report with one read per distinct table header; dates are constructed
+    from the integer day, header month and year of each cell, and cells for non-existent dates (i.e. 31NOVYYYY)
+    are masked. Months listed before JAN in a water year header (i.e. OCT, NOV, DEC) are assigned to the
+    previous calendar year.
+
+    Arguments:
+        tables (list): (header, rows) tuples for each year, where header is the table header line, i.e.
+                       'Day    JAN    FEB ...    DEC', and rows is a list of table rows (str)
+        years (list): the calendar year of each table
+    Returns:
+        series (pandas.Series): the daily values, from the first to last reported day of each table
+    """
+    groups = {}
+    for i, (header, rows) in enumerate(tables):
+        groups.setdefault(header, []).append(i)
+
+    dates, values, blocks = [], [], []
+    for header, indices in groups.items():
+        labels = header.split()[1:]
+        unknown = [x for x in labels if x not in _MONTH_OFFSETS]
+        if unknown:
+            raise ValueError(f'unrecognized month labels in daily table header: {unknown}')
+
+        # months preceding January in the header belong to the previous calendar year
+        offsets = np.array([_MONTH_OFFSETS[x] for x in labels])
+        offsets[:labels.index('JAN') if 'JAN' in labels else 0] -= 12
+
+        # columns are right-aligned with the header labels
+        ends = [x.end() for x in re.finditer(r'\S+', header)]
+        data = pd.read_fwf(io.StringIO('\n'.join(x for i in indices for x in tables[i][1])),
+                           colspecs=list(zip([0] + ends[:-1], ends)),
+                           header=None,
+                           names=header.split(),
+                           na_values=['------', 'NaN', ''])
+
+        day = data.iloc[:, 0].to_numpy(dtype=int)[:, None]
+        cells = data.iloc[:, 1:].to_numpy(dtype=float)
+        block = np.repeat(indices, [len(tables[i][1]) for i in indices])[:, None]
+
+        # first day of each month and the number of days in the month
+        months = ((np.asarray(years)[block] - 1970) * 12 + offsets[None, :]).astype('datetime64[M]')
+        start = months.astype('datetime64[D]')
+        days_in_month = ((months + 1).astype('datetime64[D]') - start).astype(int)
+        valid = day <= days_in_month
+
+        dates.append((start + (day - 1).astype('timedelta64[D]'))[valid])
+        values.append(cells[valid])
+        blocks.append(np.broadcast_to(block, valid.shape)[valid])
+
+    # sort by date within each table, then trim to the first and last reported day of each table
+    dates, values, block = np.concatenate(dates), np.concatenate(values), np.concatenate(blocks)
+    order = np.lexsort((dates, block))
+    dates, values, block = dates[order], values[order], block[order]
+    reported = pd.Series(~np.isnan(values))
+    keep = (reported.groupby(block).cummax() & reported[::-1].groupby(block[::-1]).cummax()).to_numpy()
+    return pd.Series(values[keep], index=pd.DatetimeIndex(dates[keep]))
 
 
 def get_daily_meta(url=None, content=None):
@@ -210,18 +300,23 @@ def get_daily_meta(url=None, content=None):
     return result
 
 
-def get_hourly_data(site, json_compatible=False):
+def get_hourly_data(site, json_compatible=False, session=None):
     """
     returns a `dict` and creates JSON file of the data and info for NID sites provided
 
     Arguments:
         site (str): NID site identifier
+        json_compatible (bool or str): whether to serialize the data for export to JSON; 'columnar' returns
+                                       columnar JSON bytes
+        session (requests.Session): optional session for connection reuse
     Returns:
         result (dict): dictionary of data and info for each site
     """
-    metric = get_site_metric(site, interval='hourly')
+    metric = get_site_metric(site, interval='hourly', session=session)
     url = get_station_url(site, metric=metric, interval='hourly')
-    df = pd.read_csv(url, header=1, na_values=[' ""', 'nan', '', ' '])
+    df = pd.read_csv(io.BytesIO((session or utils.get_session(pool_size=1)).get(url).content),
+                     header=1,
+                     na_values=[' ""', 'nan', '', ' '])
 
     # clean up extra spaces in column names
     df.columns = df.columns.map(lambda x: x.strip())
@@ -251,7 +346,48 @@ def get_hourly_data(site, json_compatible=False):
                      'qualifiers': qualifiers,
                      'timeseries_type': {'flow': 'flows', 'volume': 'storages'}.get(metric),
                      'timeseries_units': {'flow': 'cfs', 'volume': 'AF'}.get(metric)}, 
-            'data': serialize(df) if json_compatible else df}
+            'data': serialize(df, columnar=json_compatible == 'columnar') if json_compatible else df}
+
+
+def get_all_data(interval='daily', sites=None, workers=8):
+    """
+    collect data for every NID site; the hyquick index is read once, site file listings are cached, and
+    site data files are fetched concurrently over one pooled session
+
+    Arguments:
+        interval (str): data interval, one of daily or hourly
+        sites (list): optional site IDs; defaults to all sites on the hyquick index
+        workers (int): number of concurrent site requests
+    Returns:
+        result (dict): dictionary of data and info; data columns are keyed by (site, variable)
+    """
+    session = utils.get_session(pool_size=workers)
+    content = get_index_content(session=session)
+    index = get_sites(content=content)
+    sites = list(index) if sites is None else sites
+
+    function = get_daily_data if interval == 'daily' else get_hourly_data
+    results = utils.get_concurrent_results(lambda x: function(x, session=session), sites, workers)
+
+    frames = {}
+    metadata = {}
+    errors = {}
+    for site, result in results.items():
+        if isinstance(result, Exception):
+            errors.update({site: str(result)})
+            print(f'WARNING: NID {interval} data not retrieved for {site}')
+            continue
+        frames.update({site: result['data']})
+        metadata.update({site: result['info']})
+
+    df = pd.concat(frames, axis=1, names=['site', 'variable']) if frames else pd.DataFrame()
+
+    return {'data': df,
+            'info': {'sites': {x: index.get(x) for x in frames},
+                     'interval': interval,
+                     'issue_date': get_issue_date(content=content),
+                     'metadata': metadata,
+                     'errors': errors}}
 
 
 def parse_qualifiers(series):
@@ -266,13 +402,21 @@ def parse_qualifiers(series):
     return {x: y for x, y in map(lambda x: x.split(' - '), entries)}
 
 
-def serialize(df, day_format='%Y-%-m-%-d'):
+def serialize(df, day_format='%Y-%-m-%-d', columnar=False):
     """
+    serialize the dataframe for export to JSON without modifying it; missing values are 'null'
+
     Arguments:
         df (pandas.DataFrame): a pandas dataframe with date/time index
+        day_format (str): date format of the nested dictionary keys
+        columnar (bool): if True, return columnar JSON bytes (see `collect.utils.serialize_columns`), with
+                         the Pacific local time index written as epoch milliseconds
     Returns:
-        df (pandas.DataFrame): a pandas dataframe formatted for export to JSON
+        result (dict or bytes): nested dictionary of {column: {date/time: value}}, or columnar JSON bytes
     """
-    df.index = df.index.strftime(f'{day_format} %H:%M')
-    df.fillna('null', inplace=True)
-    return df.to_dict()
+    if columnar:
+        return utils.serialize_columns(df, tz='US/Pacific')
+
+    index = df.index.strftime(f'{day_format} %H:%M')
+    return {column: dict(zip(index, values.astype(object).where(values.notna(), 'null')))
+            for column, values in df.items()}
@@ -4,19 +4,95 @@ collect.tests.test_cvo
 initial test suite for collect.cvo data access and utility functions; note: these tests require internet connection
 """
 # -*- coding: utf-8 -*-
+import concurrent.futures
 import datetime as dt
+import functools
 import io
+import json
+import multiprocessing
 import os
+import pathlib
+import tempfile
 import textwrap
+import timeit
 import unittest
 import unittest.mock
 
+import numpy as np
 import pandas as pd
 
 from collect import cvo
 from collect import utils
 
 
+# report eras covering changes in column count for each of the SUPPORTED_REPORTS
+REPORT_ERAS = [('doutdly', dt.date(2012, 5, 1), 23),
+               ('doutdly', dt.date(2023, 3, 1), 24),
+               ('kesdop', dt.date(2015, 2, 1), 11),
+               ('fedslu', dt.date(2016, 4, 1), 10),
+               ('shadop', dt.date(2020, 2, 1), 11),
+               ('shafln', dt.date(2018, 9, 1), 12),
+               ('slunit', dt.date(2011, 5, 1), 18),
+               ('slunit', dt.date(2013, 3, 1), 21),
+               ('slunit', dt.date(2019, 7, 1), 22)]
+
+
+def _legacy_collapse_cells(df):
+    """
+    reference implementation of _collapse_cells using the original to_string/split round trip
+    """
+    return pd.DataFrame(data=[row.split()[1:] for row in df.to_string().replace('NaN', '').splitlines()[1:]])
+
+
+def _legacy_cells_to_float(df):
+    """
+    reference implementation of _cells_to_float using the original chained regex replacements
+    """
+    return (df.replace(',', '', regex=True)
+              .replace('%', '', regex=True)
+              .replace('None', float('nan'), regex=True)
+              .replace(r'[\$,)]', '', regex=True)
+              .replace(r'[(]', '-', regex=True)
+              .astype(float))
+
+
+def _make_report_table(report_type, date_structure, columns, seed=0):
+    """
+    build a table resembling tabula output for a report, with merged cells and offset NaN cells
+    """
+    rng = np.random.default_rng(seed)
+    rows = [[np.nan, 'STORAGE', 'RELEASE C.F.S.'], ['DAY', 'ELEV', np.nan, 'INFLOW']]
+    for day in range(1, 29):
+        values = rng.integers(-5000, 40000, columns - 1)
+        if report_type == 'doutdly':
+            tokens = [f'{date_structure:%m}/{day:02d}/{date_structure:%y}',
+                      *[f'({-x:,})' if x < 0 else f'{x:,}' for x in values[:19]],
+                      *[f'{x % 100}%' for x in values[19:22]],
+                      *['None' if x % 3 == 0 else f'${x:,}' for x in values[22:]]]
+        else:
+            tokens = [str(day), *[f'{x:,}' if x % 2 else f'{x / 100:.2f}' for x in values]]
+
+        # merge neighboring tokens into one cell and offset cells with NaN, as in fixed-width parsing
+        cells = [tokens[0]]
+        for token in tokens[1:]:
+            if rng.random() < 0.15:
+                cells.append(np.nan)
+            if rng.random() < 0.25 and isinstance(cells[-1], str):
+                cells[-1] = f'{cells[-1]} {token}'
+            else:
+                cells.append(token)
+        rows.append(cells)
+
+    width = max(map(len, rows))
+    df = pd.DataFrame([x + [np.nan] * (width - len(x)) for x in rows])
+    for column in df.columns:
+        try:
+            df[column] = pd.to_numeric(df[column])
+        except (ValueError, TypeError):
+            pass
+    return df
+
+
 class TestCVO(unittest.TestCase):
 
     def test_get_area(self):
@@ -38,6 +114,63 @@ class TestCVO(unittest.TestCase):
         self.assertEqual(result['data'].sum()['ELEV']['ELEV']['ELEV'], 96536.34)
         self.assertEqual(result['data'].shape, (92, 11))
 
+    @unittest.skipUnless('fork' in multiprocessing.get_all_start_methods(), 'requires the fork start method')
+    def test_get_data_parallel(self):
+        """
+        test that parallel mode parses months on a process pool in month order and records per-month errors,
+        and that parsed months are stored for later requests; the pool is created with the fork start method so
+        that workers inherit the mocked table extraction
+        """
+        def _mock_tables(jobs, **kwargs):
+            tables = {}
+            for date_structure in jobs:
+                if date_structure.month == 3:
+                    tables[date_structure] = ConnectionError('mocked failure')
+                else:
+                    rows = [[f'{date_structure:%m}/{day:02d}/{date_structure:%y}', *range(day, day + 22)]
+                            for day in range(1, 4)]
+                    tables[date_structure] = [pd.DataFrame(rows), pd.DataFrame([[f'{date_structure:%B} 5, 2020']])]
+            return tables
+
+        executor = functools.partial(concurrent.futures.ProcessPoolExecutor,
+                                     mp_context=multiprocessing.get_context('fork'))
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                unittest.mock.patch.dict(os.environ, {'COLLECT_CACHE_DIR': cache_dir}), \
+                unittest.mock.patch('collect.cvo.cvo.get_report_file', return_value=pathlib.Path('abc.pdf')), \
+                unittest.mock.patch('collect.cvo.cvo.read_pdf_tables', side_effect=_mock_tables) as mock_tables, \
+                unittest.mock.patch('concurrent.futures.ProcessPoolExecutor', executor):
+            result = cvo.get_data(dt.date(2020, 1, 1), dt.date(2020, 4, 30), 'doutdly',
+                                  parallel=True, workers=2, chunksize=2)
+            self.assertEqual(sorted(os.listdir(os.path.join(cache_dir, 'cvo', 'parsed', 'doutdly'))),
+                             ['2020-01.parquet', '2020-02.parquet', '2020-04.parquet'])
+            self.assertEqual(cvo.get_parsed_month('doutdly', dt.date(2020, 2, 1))['date_published'],
+                             dt.date(2020, 2, 5))
+
+            # unchanged months are read from the parsed dataset; only the failed month is parsed again
+            cached = cvo.get_data(dt.date(2020, 1, 1), dt.date(2020, 4, 30), 'doutdly')
+            self.assertEqual(list(mock_tables.call_args[0][0]), [dt.date(2020, 3, 1)])
+            pd.testing.assert_frame_equal(cached['data'], result['data'])
+
+        self.assertEqual(result['data'].dropna(how='all').index.strftime('%m-%d').tolist(),
+                         ['01-01', '01-02', '01-03', '02-01', '02-02', '02-03', '04-01', '04-02', '04-03'])
+        self.assertEqual(result['data']['Delta Inflow']['SRTP prev wk'].dropna().tolist()[:3], [2.0, 3.0, 4.0])
+        self.assertEqual([(x['date'], x['error']) for x in result['info']['errors']],
+                         [(dt.date(2020, 3, 1), 'ConnectionError')])
+
+        # the run date is extracted with the report body and kept in the parsed dataset
+        self.assertEqual(result['info']['dates published'], [dt.date(2020, 1, 5), dt.date(2020, 2, 5),
+                                                             dt.date(2020, 4, 5)])
+        self.assertEqual(cached['info']['dates published'], result['info']['dates published'])
+
+    def test_get_reports_parallel_unreadable_file(self):
+        """
+        test that an unreadable text report is recorded as an error for its month only
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = pathlib.Path(temp_dir).joinpath('missing.txt')
+            result = cvo.cvo._get_reports_parallel({dt.date(2020, 1, 1): path}, 'doutdly', workers=1)
+        self.assertIsInstance(result[dt.date(2020, 1, 1)], FileNotFoundError)
+
     def test_get_date_published(self):
         """
         test that date published can be extracted from a past report in the archive
@@ -47,6 +180,63 @@ class TestCVO(unittest.TestCase):
         self.assertEqual(result.strftime('%Y-%m-%d'), '2023-04-19')
         self.assertTrue(isinstance(result, dt.date))
 
+    def test_get_report_file(self):
+        """
+        test that archived reports are fetched once and the current month is revalidated with conditional requests
+        """
+        session = unittest.mock.Mock()
+        session.get.return_value = unittest.mock.Mock(status_code=200,
+                                                      content=b'%PDF-1.4',
+                                                      headers={'Last-Modified': 'Mon, 02 Jan 2023 00:00:00 GMT'})
+
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                unittest.mock.patch.dict(os.environ, {'COLLECT_CACHE_DIR': cache_dir}):
+            path = cvo.get_report_file(dt.date(2022, 2, 1), 'shadop', session=session)
+            self.assertEqual(path.read_bytes(), b'%PDF-1.4')
+            self.assertEqual(path.parent.name, 'objects')
+            self.assertEqual(cvo.get_report_file(dt.date(2022, 2, 1), 'shadop', session=session), path)
+            self.assertEqual(session.get.call_count, 1)
+
+            # identical content for another URL shares the stored file
+            today = dt.date.today().replace(day=1)
+            self.assertEqual(cvo.get_report_file(today, 'shadop', session=session), path)
+
+            session.get.return_value = unittest.mock.Mock(status_code=304, content=b'', headers={})
+            self.assertEqual(cvo.get_report_file(today, 'shadop', session=session), path)
+            self.assertEqual(session.get.call_args[1]['headers'],
+                             {'If-Modified-Since': 'Mon, 02 Jan 2023 00:00:00 GMT'})
+
+            with open(os.path.join(cache_dir, 'cvo', 'manifest.json')) as f:
+                manifest = json.load(f)
+            self.assertEqual(manifest[cvo.get_url(dt.date(2022, 2, 1), 'shadop')]['month'], '2022-02')
+
+    def test_read_pdf_tables(self):
+        """
+        test that reports sharing target areas are staged together and extracted with one batch process
+        """
+        def _mock_batch(directory, output_format='json', area=None, **kwargs):
+            for path in pathlib.Path(directory).glob('*.pdf'):
+                table = [[{'text': '1'}, {'text': '582.79'}], [{'text': 'DAY'}, {'text': ''}]]
+                path.with_suffix('.json').write_text(json.dumps([{'data': table}]))
+
+        session = unittest.mock.Mock()
+        session.get.return_value = unittest.mock.Mock(content=b'%PDF')
+
+        jobs = {dt.date(2023, 1, 1): ('https://example.com/a.pdf', [[140, 30, 700, 540]]),
+                dt.date(2023, 2, 1): ('https://example.com/b.pdf', [[140, 30, 700, 540]]),
+                dt.date(2023, 3, 1): ('https://example.com/c.pdf', [[140, 30, 680, 540]])}
+
+        with unittest.mock.patch('importlib.util.find_spec', return_value=None), \
+                unittest.mock.patch('collect.utils.get_session', return_value=session), \
+                unittest.mock.patch('collect.cvo.cvo.convert_into_by_batch', side_effect=_mock_batch) as mock_batch:
+            result = cvo.read_pdf_tables(jobs)
+
+        self.assertEqual(mock_batch.call_count, 2)
+        self.assertEqual(mock_batch.call_args[1]['options'], '--area 140,30,680,540')
+        self.assertEqual(list(result), list(jobs))
+        self.assertEqual(result[dt.date(2023, 2, 1)][0][1].tolist()[0], 582.79)
+        self.assertTrue(pd.isna(result[dt.date(2023, 3, 1)][0].iloc[1, 1]))
+
     def test_get_report_columns(self):
         """
         demonstration of expected behavior for get_report_columns with shafln report type
@@ -208,6 +398,39 @@ class TestCVO(unittest.TestCase):
         self.assertEqual(result.tail()['RELEASE - C.F.S.']['POWER'].tolist(),
                          [10967.0, 10947.0, 10168.0, 10081.0, 10080.0])
 
+    def test__collapse_cells(self):
+        """
+        test that collapsing offset cells matches the original to_string/split round trip for each report era
+        """
+        for report_type, date_structure, columns in REPORT_ERAS:
+            for seed in range(3):
+                table = _make_report_table(report_type, date_structure, columns, seed=seed)
+                pd.testing.assert_frame_equal(cvo.cvo._collapse_cells(table), _legacy_collapse_cells(table))
+
+    def test__cells_to_float(self):
+        """
+        test that the single-pass numeric conversion matches the original chained replacements for each report era
+        """
+        for report_type, date_structure, columns in REPORT_ERAS:
+            tokens = cvo.cvo._collapse_cells(_make_report_table(report_type, date_structure, columns)).iloc[2:, 1:]
+            pd.testing.assert_frame_equal(cvo.cvo._cells_to_float(tokens), _legacy_cells_to_float(tokens))
+
+    @unittest.skipUnless(os.getenv('COLLECT_BENCHMARKS'), 'set COLLECT_BENCHMARKS=1 to run benchmarks')
+    def test_cell_normalization_benchmark(self):
+        """
+        benchmark the vectorized cell normalization against the original implementation for a doutdly report;
+        timings are reported, not asserted
+        """
+        table = _make_report_table('doutdly', dt.date(2023, 3, 1), 24)
+        pd.testing.assert_frame_equal(cvo.cvo._cells_to_float(cvo.cvo._collapse_cells(table).iloc[2:, 1:]),
+                                      _legacy_cells_to_float(_legacy_collapse_cells(table).iloc[2:, 1:]))
+
+        legacy = min(timeit.repeat(lambda: _legacy_cells_to_float(_legacy_collapse_cells(table).iloc[2:, 1:]),
+                                   number=5, repeat=3))
+        vectorized = min(timeit.repeat(lambda: cvo.cvo._cells_to_float(cvo.cvo._collapse_cells(table).iloc[2:, 1:]),
+                                       number=5, repeat=3))
+        print(f'cell normalization: legacy {legacy / 5:.4f}s, vectorized {vectorized / 5:.4f}s per report')
+
     def deferred_test_download_files(self):
         """
         this test will eventually be implemented to check the appropriate creation of files from the downloading data
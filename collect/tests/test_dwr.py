@@ -7,6 +7,7 @@ initial test suite for collect.dwr data access and utility functions; note: thes
 import datetime as dt
 import io
 import os
+import tempfile
 import textwrap
 import unittest
 import unittest.mock
@@ -19,6 +20,7 @@ from collect.dwr import casgem
 from collect.dwr import cawdl
 from collect.dwr import b120
 from collect.dwr import swp
+from collect.dwr import wsi
 
 
 class TestCASGEM(unittest.TestCase):
@@ -107,6 +109,16 @@ class TestCDEC(unittest.TestCase):
         self.assertEqual(b120.clean_td('  5000 cfs'), '5000 cfs')
         self.assertIsNone(b120.clean_td(''))
 
+    def test_clean_columns(self):
+        """
+        test that vectorized column cleaning matches clean_td cell by cell
+        """
+        cells = [[' 8,000', '\xa0\xa0-', '55%'], ['  5000 cfs', '', '1,210'], ['12', None, ' -']]
+        result = b120.clean_columns(pd.DataFrame(cells, columns=['a', 'b', 'c']))
+        expected = pd.DataFrame([[b120.clean_td(x) if x is not None else None for x in row] for row in cells],
+                                columns=['a', 'b', 'c'])
+        pd.testing.assert_frame_equal(result, expected)
+
     def test_get_b120_update_data(self):
         """
         test for B120 data-retrieval function relying on https://cdec.water.ca.gov/b120up.html
@@ -134,6 +146,41 @@ class TestCDEC(unittest.TestCase):
         self.assertEqual(result['data']['WY'].shape, (16, 14))
         self.assertTrue('90% Exceedance' in result['data']['WY'].columns)
 
+    def test_get_b120_history(self):
+        """
+        test that B120 issuances are collected into one long-format frame and that cached issuances are not
+        requested again
+        """
+        wy_columns = ['Hydrologic Region', 'Oct thru Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep',
+                      'Water Year', '90% Exceedance', '10% Exceedance', 'WY % Avg']
+
+        def _mock_b120_data(date_suffix, session=None):
+            if date_suffix == '_201305':
+                raise AttributeError('mocked failure')
+            value = float(date_suffix[1:])
+            aj_df = b120.april_july_dataframe([['SACRAMENTO RIVER', 'Feather River at Oroville',
+                                                value, '55%', value - 100, value + 100]])
+            wy_df = pd.DataFrame([['Feather River at Oroville'] + [1.0] * 9 + [value, 1.0, 2.0, '60%']],
+                                 columns=wy_columns)
+            return {'data': {'Apr-Jul': aj_df, 'WY': wy_df}, 'info': {}}
+
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                unittest.mock.patch.dict(os.environ, {'COLLECT_CACHE_DIR': cache_dir}), \
+                unittest.mock.patch('collect.dwr.b120.get_b120_data', side_effect=_mock_b120_data) as mock_data:
+            result = b120.get_b120_history(2012, 2012, updates=False)
+            self.assertEqual(mock_data.call_count, 4)
+            self.assertEqual(result['data'].index.names, ['issuance', 'watershed', 'period', 'exceedance'])
+            self.assertEqual(result['data'].loc[(pd.Timestamp('2012-02-01'), 'Feather River at Oroville',
+                                                 'Apr-Jul', 90), 'value'], 201102.0)
+            self.assertEqual(result['data'].xs('Oct-Jan', level='period').shape[0], 4)
+
+            # only months that are not cached are requested
+            result = b120.get_b120_history(2012, 2013, updates=False)
+            self.assertEqual([x[0][0] for x in mock_data.call_args_list[4:]],
+                             ['_201302', '_201303', '_201304', '_201305'])
+            self.assertEqual(list(result['info']['errors']), ['2013-05'])
+            self.assertEqual(result['data'].index.get_level_values('issuance').nunique(), 7)
+
     def test_april_july_dataframe(self):
         data_list = [['SACRAMENTO RIVER', 'Sacramento River above Shasta Lake', 120.0, '41%', None, None],
                      ['SACRAMENTO RIVER', 'McCloud River above Shasta Lake', 260.0, '68%', None, None],
@@ -228,6 +275,33 @@ class TestCDEC(unittest.TestCase):
                                                                      ('2023-1-3 00:00', 105931),
                                                                      ('2023-1-4 00:00', 105185)])
 
+    def test_get_wide_frame(self):
+        """
+        test pivot of long-format CSV and JSON responses to (station, sensor, duration) columns
+        """
+        content = io.StringIO(textwrap.dedent("""\
+            STATION_ID,DURATION,SENSOR_NUMBER,SENSOR_TYPE,DATE TIME,OBS DATE,VALUE,DATA_FLAG,UNITS
+            FOL,H,6,RES ELE,20230101 0100,20230101 0100,400.10, ,FEET
+            CFW,H,6,RES ELE,20230101 0000,20230101 0000,300.48, ,FEET
+            CFW,H,6,RES ELE,20230101 0100,20230101 0100,300.50, ,FEET
+            CFW,H,15,STORAGE,20230101 0000,20230101 0000,-9999, ,AF
+        """))
+        csv_response = pd.read_csv(content, header=0, parse_dates=True, index_col=4)
+        json_response = [{'stationId': 'SHA', 'durCode': 'D', 'SENSOR_NUM': 15, 'sensorType': 'STORAGE',
+                          'date': '2023-1-1 00:00', 'obsDate': '2023-1-1 00:00', 'value': 105419,
+                          'dataFlag': ' ', 'units': 'AF'}]
+
+        result = cdec.get_wide_frame(csv_response)
+        self.assertEqual(result.columns.tolist(), [('CFW', 6, 'H'), ('CFW', 15, 'H'), ('FOL', 6, 'H')])
+        self.assertEqual(result.shape, (2, 3))
+        self.assertTrue(result[('CFW', 15, 'H')].isna().all())
+        self.assertEqual(result[('FOL', 6, 'H')].tolist()[-1], 400.10)
+
+        result = cdec.get_wide_frame([csv_response, json_response], interval='D')
+        self.assertEqual(result.shape, (1, 4))
+        self.assertAlmostEqual(result.loc['2023-01-01', ('CFW', 6, 'H')], 300.49)
+        self.assertEqual(result.loc['2023-01-01', ('SHA', 15, 'D')], 105419.0)
+
     def test_get_station_metadata(self):
         """
         test for retrieving station information from the CDEC detail page
@@ -380,6 +454,108 @@ class TestCDEC(unittest.TestCase):
         result = cdec.queries._parse_data_available('01/01/2021 to 01/01/2023')
         self.assertEqual(result, [2021, 2022, 2023])
 
+    def test_station_catalog_query(self):
+        """
+        test local sensor/duration, coverage and spatial queries against the station catalog
+        """
+        catalog = cdec.StationCatalog([
+            {'ID': 'FOL', 'name': 'FOLSOM LAKE', 'basin': 'AMERICAN R', 'county': 'SACRAMENTO',
+             'latitude': 38.683, 'longitude': -121.183,
+             'sensors': [{'sensor': 15, 'duration': 'daily', 'description': 'STORAGE', 'start': 1955, 'end': 2026},
+                         {'sensor': 6, 'duration': 'hourly', 'description': 'RES ELE', 'start': 1994, 'end': 2026}]},
+            {'ID': 'NAT', 'name': 'NIMBUS DAM', 'basin': 'AMERICAN R', 'county': 'SACRAMENTO',
+             'latitude': 38.636, 'longitude': -121.218,
+             'sensors': [{'sensor': 15, 'duration': 'daily', 'description': 'STORAGE', 'start': 1996, 'end': 2026}]},
+            {'ID': 'SHA', 'name': 'SHASTA DAM', 'basin': 'SACRAMENTO R', 'county': 'SHASTA',
+             'latitude': 40.718, 'longitude': -122.420,
+             'sensors': [{'sensor': 15, 'duration': 'daily', 'description': 'STORAGE', 'start': 1953, 'end': 2026}]},
+        ])
+        self.assertEqual(len(catalog), 3)
+        self.assertEqual(catalog.query(sensor=15, duration='daily'), ['FOL', 'NAT', 'SHA'])
+        self.assertEqual(catalog.query(sensor=15, duration='daily', start_year=1990, basin='american r'), ['FOL'])
+        self.assertEqual(catalog.query(sensor=6), ['FOL'])
+        self.assertEqual(catalog.query(duration='hourly'), ['FOL'])
+        self.assertEqual(catalog.query(duration='monthly'), [])
+        self.assertEqual(catalog.query(bbox=(-121.5, 38.5, -121.0, 39.0)), ['FOL', 'NAT'])
+        self.assertEqual(catalog.query(near=(-121.183, 38.683), radius=5), ['FOL', 'NAT'])
+        self.assertEqual(catalog.query(near=(-121.183, 38.683), radius=1), ['FOL'])
+        self.assertEqual(catalog.get_coverage('sha', 15, 'daily'), (1953, 2026))
+        self.assertEqual(catalog.to_frame().shape[0], 4)
+
+    def test_cdec_exports(self):
+        """
+        test that the catalog and poller modules re-export only their public API to collect.dwr.cdec
+        """
+        self.assertIs(cdec.StationCatalog, cdec.catalog.StationCatalog)
+        self.assertIs(cdec.CDECPoller, cdec.poller.CDECPoller)
+        self.assertFalse(hasattr(cdec, 'EARTH_RADIUS_MILES'))
+        self.assertFalse(hasattr(cdec, 'math'))
+
+    def test__flatten_sensors(self):
+        """
+        test conversion of the nested station sensors table to catalog sensor entries
+        """
+        result = cdec.catalog._flatten_sensors({'20': {'event': {'description': 'FLOW, RIVER DISCHARGE, CFS',
+                                                                 'sensor': '20',
+                                                                 'duration': 'event',
+                                                                 'collection': 'COMPUTED',
+                                                                 'availability': '01/01/2021 to 01/01/2023',
+                                                                 'years': [2021, 2022, 2023]}}})
+        self.assertEqual(result, [{'sensor': 20, 'duration': 'event', 'description': 'FLOW, RIVER DISCHARGE, CFS',
+                                   'start': 2021, 'end': 2023}])
+
+    def test_cdec_poller(self):
+        """
+        test that the poller batches stations by sensor/duration and emits only rows newer than each series' last
+        observation
+        """
+        content = textwrap.dedent("""\
+            STATION_ID,DURATION,SENSOR_NUMBER,SENSOR_TYPE,DATE TIME,OBS DATE,VALUE,DATA_FLAG,UNITS
+            FOL,H,15,STORAGE,20230101 0000,20230101 0000,100, ,AF
+            FOL,H,15,STORAGE,20230101 0100,20230101 0100,101, ,AF
+            SHA,H,15,STORAGE,20230101 0000,20230101 0000,200, ,AF
+            SHA,H,15,STORAGE,20230101 0100,20230101 0100,, ,AF
+        """)
+        responses = [content, content + 'FOL,H,15,STORAGE,20230101 0200,20230101 0200,102, ,AF\n']
+
+        def _mock_csv(station, start, end, sensors=[], duration=''):
+            return pd.read_csv(io.StringIO(responses.pop(0)), header=0, parse_dates=True, index_col=4)
+
+        emitted = []
+        poller = cdec.CDECPoller([('FOL', 15, 'H'), ('SHA', 15, 'H')], callback=emitted.append)
+        self.assertEqual(poller.get_batches(), [(15, 'H', ['FOL', 'SHA'])])
+
+        with unittest.mock.patch('collect.dwr.cdec.queries.get_raw_station_csv', side_effect=_mock_csv) as mock_csv:
+            first = poller.poll(now=dt.datetime(2023, 1, 1, 1))
+            second = poller.poll(now=dt.datetime(2023, 1, 1, 2))
+
+        self.assertEqual(mock_csv.call_count, 2)
+        self.assertEqual(first['VALUE'].tolist(), [100, 200, 101])
+        self.assertEqual(second['VALUE'].tolist(), [102])
+        self.assertEqual(len(emitted), 2)
+        self.assertEqual(poller.get_state(), {'FOL,15,H': '2023-01-01T02:00:00', 'SHA,15,H': '2023-01-01T00:00:00'})
+
+    def test_cdec_poller_stale_station(self):
+        """
+        test that a stale station is requested separately and clamped to the lookback window, so that it does not
+        widen the request for current stations in its batch
+        """
+        state = {('FOL', 15, 'H'): '2023-01-10T00:00:00', ('SHA', 15, 'H'): '2023-01-10T01:00:00',
+                 ('DEAD', 15, 'H'): '2022-06-01T00:00:00'}
+        poller = cdec.CDECPoller([('FOL', 15, 'H'), ('DEAD', 15, 'H'), ('SHA', 15, 'H'), ('NEW', 15, 'H')],
+                                 lookback=dt.timedelta(days=3), state=state)
+        now = dt.datetime(2023, 1, 10, 2)
+        self.assertEqual(poller.split_by_start(15, 'H', ['FOL', 'DEAD', 'SHA', 'NEW'], now),
+                         [(pd.Timestamp('2023-01-07 02:00'), ['DEAD', 'NEW']),
+                          (pd.Timestamp('2023-01-10 00:00'), ['FOL', 'SHA'])])
+
+        with unittest.mock.patch('collect.dwr.cdec.queries.get_raw_station_csv',
+                                 return_value=pd.DataFrame()) as mock_csv:
+            poller.poll(now=now)
+        self.assertEqual([(x.args[0], x.args[1]) for x in mock_csv.call_args_list],
+                         [(['DEAD', 'NEW'], pd.Timestamp('2023-01-07 02:00')),
+                          (['FOL', 'SHA'], pd.Timestamp('2023-01-10 00:00'))])
+
     def test_get_daily_snowpack_data(self):
         """
         test for retrieving past daily snowpack data
@@ -390,6 +566,57 @@ class TestCDEC(unittest.TestCase):
         self.assertEqual(result['data'].shape, (3, 5))
         self.assertEqual(result['data'].tail(1).values.tolist(), [['CENTRAL', 53, 19.0, 70, 185]])
 
+    def test__parse_snowpack_table(self):
+        """
+        test extraction of the querySWC regional snowpack table to a date-sorted dataframe
+        """
+        content = textwrap.dedent("""\
+            <html><body><table>
+                <tr><th>Region</th><th>Date</th><th>% of Normal</th><th>Avg SWC (in)</th><th>% of Apr 1</th><th>Stations</th></tr>
+                <tr><td>CENTRAL</td><td>01/03/2023</td><td>53</td><td>19.0</td><td>70</td><td>185</td></tr>
+                <tr><td>CENTRAL</td><td>01/01/2023</td><td>50</td><td>17.5</td><td>66</td><td>184</td></tr>
+                <tr><td>CENTRAL</td><td>01/02/2023</td><td>51</td><td>&nbsp;</td><td>68</td><td>185</td></tr>
+            </table></body></html>
+        """).encode('utf-8')
+        result = cdec.queries._parse_snowpack_table(content)
+        self.assertEqual(result.shape, (3, 5))
+        self.assertTrue(result.index.is_monotonic_increasing)
+        self.assertEqual(result.tail(1).values.tolist(), [['CENTRAL', 53, 19.0, 70, 185]])
+        self.assertTrue(pd.isna(result.loc['2023-01-02', 'Avg SWC (in)']))
+
+    def test__parse_snowpack_table_layout(self):
+        """
+        test that layout tables and tables nested in the snowpack table are excluded from the extraction
+        """
+        content = textwrap.dedent("""\
+            <html><body>
+            <table><tr><td>California Data Exchange Center</td></tr></table>
+            <table>
+                <tr><th>Region</th><th>Date</th><th>% of Normal</th><th>Avg SWC (in)</th><th>% of Apr 1</th><th>Stations</th></tr>
+                <tr><td>CENTRAL</td><td>01/02/2023</td><td>51</td><td>18.2</td><td>68</td>
+                    <td><table><tr><td>notes</td></tr></table>185</td></tr>
+                <tr><td>CENTRAL</td><td>01/01/2023</td><td>50</td><td>17.5</td><td>66</td><td>184</td></tr>
+            </table>
+            </body></html>
+        """)
+        result = cdec.queries._parse_snowpack_table(content)
+        self.assertEqual(result.shape, (2, 5))
+        self.assertEqual(result.loc['2023-01-01'].values.tolist(), ['CENTRAL', 50, 17.5, 66, 184])
+
+    def test_get_daily_snowpack_data_region(self):
+        """
+        test that only the requested region is retrieved and the cached history is not exposed to callers
+        """
+        history = pd.DataFrame({'Region': ['NORTH'] * 3, 'Stations': [80, 81, 82]},
+                               index=pd.date_range('2023-01-01', periods=3, name='Date'))
+        with unittest.mock.patch('collect.dwr.cdec.queries._get_snowpack_region',
+                                 return_value=history) as mock_region:
+            result = cdec.get_daily_snowpack_data('NORTH', dt.datetime(2023, 1, 2), dt.datetime(2023, 1, 3))
+        self.assertEqual(mock_region.call_count, 1)
+        self.assertEqual(mock_region.call_args.args[0], 'NORTH')
+        result['data'].loc[:, 'Stations'] = 0
+        self.assertEqual(history['Stations'].tolist(), [80, 81, 82])
+
 try:
     import pdftotext
 
@@ -432,6 +659,60 @@ try:
             # check for invalid input
             self.assertIsNone(swp.get_report_url('invalid'))
 
+        def test_get_reports(self):
+            """
+            test concurrent retrieval of all PDF reports over one session, with unchanged reports revalidated
+            """
+            def _mock_get(url, headers=None, **kwargs):
+                if 'Barker-Slough' in url:
+                    raise ConnectionError('mocked failure')
+                if headers:
+                    return unittest.mock.Mock(status_code=304, content=b'', headers={})
+                return unittest.mock.Mock(status_code=200, content=url.encode('utf-8'), headers={'ETag': '"abc"'})
+
+            session = unittest.mock.Mock()
+            session.get.side_effect = _mock_get
+
+            with tempfile.TemporaryDirectory() as cache_dir, \
+                    unittest.mock.patch.dict(os.environ, {'COLLECT_CACHE_DIR': cache_dir}), \
+                    unittest.mock.patch('collect.utils.get_session', return_value=session) as mock_session:
+                result = swp.get_reports(workers=4)
+                self.assertEqual(mock_session.call_count, 1)
+                self.assertEqual(session.get.call_count, 14)
+                self.assertEqual(list(result['info']['errors']), ['Barker Slough Flows (weekly)'])
+                self.assertEqual(result['data']['Oroville'], swp.get_report_url('Oroville').encode('utf-8'))
+                self.assertTrue(all(x.endswith('.pdf') for x in result['info']['urls'].values()))
+
+                # unchanged reports are read from the cache after a conditional request
+                result = swp.get_reports(['Oroville'])
+                self.assertEqual(session.get.call_args[1]['headers'], {'If-None-Match': '"abc"'})
+                self.assertEqual(result['data']['Oroville'], swp.get_report_url('Oroville').encode('utf-8'))
+
+        def test_get_snapshot_history(self):
+            """
+            test that each publication is captured once, and that overlapping publications are combined with
+            values from the latest publication
+            """
+            publications = {b'week 1': ['2023-01-01', '2023-01-02'], b'week 2': ['2023-01-02', '2023-01-03']}
+
+            def _mock_parse(report, content):
+                index = pd.to_datetime(publications[content])
+                return pd.DataFrame({'Flow': [content.decode()] * 2}, index=index)
+
+            with tempfile.TemporaryDirectory() as cache_dir, \
+                    unittest.mock.patch.dict(os.environ, {'COLLECT_CACHE_DIR': cache_dir}), \
+                    unittest.mock.patch('collect.dwr.swp._parse_snapshot', side_effect=_mock_parse) as mock_parse:
+                report = 'Barker Slough Flows (weekly)'
+                self.assertTrue(swp.capture_snapshot(report, content=b'week 1')[1])
+                self.assertFalse(swp.capture_snapshot(report, content=b'week 1')[1])
+                self.assertTrue(swp.capture_snapshot(report, content=b'week 2')[1])
+                self.assertEqual(mock_parse.call_count, 2)
+
+                result = swp.get_snapshot_history(report)
+                self.assertEqual(result['Flow'].tolist(), ['week 1', 'week 2', 'week 2'])
+                result = swp.get_snapshot_history(report, start=dt.datetime(2023, 1, 3))
+                self.assertEqual(result.index.tolist(), [pd.Timestamp('2023-01-03')])
+
         def test_get_raw_text(self):
             """
             test expected behavior for get_raw_text for pdf report and invalid text report
@@ -451,6 +732,29 @@ try:
             self.assertIsInstance(result['data'], dict)
             self.assertTrue('Reservoir Releases' in result['data'])
 
+        def test_parse_delta_daily_reports(self):
+            """
+            test batch parsing of archived daily delta operations report texts
+            """
+            def _report(date, storage):
+                return '\n'.join([f'EXECUTIVE OPERATIONS SUMMARY ON {date}',
+                                  '  Delta Operations',
+                                  '      Delta Conditions =    Balanced',
+                                  '      Delta x‐channel Gates (% of day is open) =    100%',
+                                  '      Outflow Index >    7,100 cfs',
+                                  '      OMR Index Daily Value =    ‐1,234 cfs',
+                                  '  Reservoir Storages (as of midnight)',
+                                  f'      Shasta Reservoir =    {storage} TAF'])
+
+            result = swp.parse_delta_daily_reports([_report('1/5/2023', '3,456'), _report('1/6/2023', '3,500')])
+            self.assertEqual(result.index.tolist(), ['2023-01-05', '2023-01-06'])
+            self.assertEqual(result[('Reservoir Storages (as of midnight)', 'Shasta Reservoir', 'TAF')].tolist(),
+                             [3456.0, 3500.0])
+            self.assertEqual(result[('Delta Operations', 'OMR Index Daily Value', 'cfs')].tolist(), [-1234.0] * 2)
+            self.assertEqual(result[('Delta Operations', 'Outflow Index', 'cfs')].tolist(), ['> 7100'] * 2)
+            self.assertEqual(result[('Delta Operations', 'Delta x-channel Gates (% of day is open)', '%')].tolist(),
+                             [100.0] * 2)
+
         def test_get_barker_slough_data(self):
             result = swp.get_barker_slough_data()
             self.assertEqual(result['info']['title'], 'BARKER SLOUGH PUMPING PLANT WEEKLY REPORT')
@@ -468,13 +772,141 @@ try:
             self.assertEqual(result['data'].shape, (30, 46))
             self.assertEqual(result['data'].index.name, 'Date (30 days)')
 
+        def test_get_oco_tabular_data_parallel(self):
+            """
+            test that pages parsed in a process pool are combined in page order, with per-page timings
+            """
+            content = swp.get_reports(['Hydrologic Conditions Summary (daily)'])['data']
+            content = content['Hydrologic Conditions Summary (daily)']
+            expected = swp.get_oco_tabular_data('Hydrologic Conditions Summary (daily)', content=content)
+            result = swp.get_oco_tabular_data('Hydrologic Conditions Summary (daily)', content=content,
+                                              parallel=True, workers=2)
+            pd.testing.assert_frame_equal(result['data'], expected['data'])
+            self.assertEqual(result['info']['raw'], expected['info']['raw'])
+            self.assertEqual(len(result['info']['timings']), result['info']['pages'])
+
 except:
     print('Module pdftotext is required for collect.dwr.swp testing.  Install with `pip install pdftotext==2.2.2`')
 
 
 class TestWSI(unittest.TestCase):
-    pass
 
+    def test_get_wsi_forecast(self):
+        """
+        test forecast table parsing from a mocked WSI page, with the parsed page cached between calls
+        """
+        content = textwrap.dedent("""\
+            <html><body><pre>
+            WATER SUPPLY INDEX FORECAST
+
+            SACRAMENTO VALLEY INDEX (40-30-30)
+            Date        90%    75%    50%    25%    10%
+            Feb 1       6.1    6.9    7.8    8.9    9.9
+            Mar 1       6.5    7.1    7.9    8.6    9.4
+
+            SAN JOAQUIN VALLEY INDEX (60-20-20)
+            Date        90%    75%    50%    25%    10%
+            Feb 1       2.0    2.3    2.7    3.1    3.5
+            .END</pre></body></html>
+        """).encode('utf-8')
+
+        session = unittest.mock.Mock()
+        session.get.return_value = unittest.mock.Mock(status_code=200, content=content, headers={'ETag': '"abc"'})
+
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                unittest.mock.patch.dict(os.environ, {'COLLECT_CACHE_DIR': cache_dir}), \
+                unittest.mock.patch.dict(wsi._WSI_CACHE, clear=True), \
+                unittest.mock.patch('collect.utils.get_session', return_value=session):
+            result = wsi.get_wsi_forecast()
+            self.assertEqual(list(result['data']), ['sac', 'sjv'])
+            self.assertEqual(result['data']['sac'].loc['Mar 1', '50%'], 7.9)
+            self.assertEqual(result['info']['tables']['sjv'], 'SAN JOAQUIN VALLEY INDEX (60-20-20)')
+
+            # cached within max_age, then revalidated with a conditional request
+            self.assertIs(wsi.get_wsi_forecast(), result)
+            self.assertEqual(session.get.call_count, 1)
+            session.get.return_value = unittest.mock.Mock(status_code=304, content=b'', headers={})
+            self.assertIs(wsi.get_wsi_forecast(max_age=dt.timedelta(0)), result)
+            self.assertEqual(session.get.call_args[1]['headers'], {'If-None-Match': '"abc"'})
+
+    def test_get_wsi_forecast_report_layout(self):
+        """
+        test forecast parsing for the published report layout, with titles separated from the tables, column
+        underlines, date labels with spaces, and classification legends and notes following each table
+        """
+        content = textwrap.dedent("""\
+            <html><body><pre>
+                              WATER SUPPLY INDEX (WSI) FORECASTS
+                        Department of Water Resources - Bulletin 120
+                             2024 Water Year as of May 1, 2024
+
+                     SACRAMENTO VALLEY WATER YEAR TYPE INDEX (40-30-30)
+
+                                              Probability of Exceedance
+               Forecast Date       99%       90%       75%       50%       25%       10%
+               -------------    ------    ------    ------    ------    ------    ------
+               Feb 1, 2024         5.7       6.6       7.5       8.6       9.8      10.9
+               Mar 1, 2024         7.1       7.6       8.0       8.6       9.3       9.9
+               Apr 1, 2024         8.1       8.3       8.5       8.8       9.1       9.4
+               May 1, 2024         8.7       8.8       8.9       9.0       9.1       9.2
+
+               Year Type:  Wet >= 9.2   Above Normal > 7.8   Below Normal > 6.5   Dry > 5.4   Critical <= 5.4
+
+                    SAN JOAQUIN VALLEY WATER YEAR TYPE INDEX (60-20-20)
+
+                                              Probability of Exceedance
+               Forecast Date       99%       90%       75%       50%       25%       10%
+               -------------    ------    ------    ------    ------    ------    ------
+               Feb 1, 2024         1.8       2.1       2.5       2.9       3.4       3.9
+               Mar 1, 2024         2.2       2.4       2.7       3.0       3.3       3.7
+               Apr 1, 2024          --       2.6       2.8       3.0       3.2       3.4
+
+               Year Type:  Wet >= 3.8   Above Normal > 3.1   Below Normal > 2.5   Dry > 2.1   Critical <= 2.1
+               Notes: Forecasts are based on observed and forecasted unimpaired runoff.
+            .END</pre></body></html>
+        """).encode('utf-8')
+
+        result = wsi._parse_wsi_forecast(content, 'http://cdec.water.ca.gov/reportapp/javareports?name=wsi')
+        self.assertEqual(list(result['data']), ['sac', 'sjv'])
+        self.assertEqual(result['info']['tables']['sac'], 'SACRAMENTO VALLEY WATER YEAR TYPE INDEX (40-30-30)')
+        self.assertEqual(result['data']['sac'].index.tolist(), ['Feb 1, 2024', 'Mar 1, 2024', 'Apr 1, 2024',
+                                                                'May 1, 2024'])
+        self.assertEqual(result['data']['sac'].columns.tolist(), ['99%', '90%', '75%', '50%', '25%', '10%'])
+        self.assertEqual(result['data']['sac'].loc['May 1, 2024', '50%'], 9.0)
+        self.assertEqual(result['data']['sjv'].shape, (3, 6))
+        self.assertTrue(pd.isnull(result['data']['sjv'].loc['Apr 1, 2024', '99%']))
+
+    def test_get_wsi_data_revalidated(self):
+        """
+        test that cached tables are revalidated with a conditional request after max_age, and re-parsed only
+        when the page changes
+        """
+        session = unittest.mock.Mock()
+        session.get.return_value = unittest.mock.Mock(status_code=200, content=b'<pre>v1</pre>',
+                                                      headers={'ETag': '"v1"'})
+
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                unittest.mock.patch.dict(os.environ, {'COLLECT_CACHE_DIR': cache_dir}), \
+                unittest.mock.patch.dict(wsi._WSI_CACHE, clear=True), \
+                unittest.mock.patch('collect.utils.get_session', return_value=session), \
+                unittest.mock.patch('collect.dwr.wsi._parse_wsi_history',
+                                    return_value={'data': {}, 'info': {}}) as mock_parse:
+            wsi.get_wsi_data()
+            wsi.get_wsi_data()
+            self.assertEqual(session.get.call_count, 1)
+
+            # unchanged page
+            session.get.return_value = unittest.mock.Mock(status_code=304, content=b'', headers={})
+            wsi.get_wsi_data(max_age=dt.timedelta(0))
+            self.assertEqual(session.get.call_args[1]['headers'], {'If-None-Match': '"v1"'})
+            self.assertEqual(mock_parse.call_count, 1)
+
+            # in-season update
+            session.get.return_value = unittest.mock.Mock(status_code=200, content=b'<pre>v2</pre>',
+                                                          headers={'ETag': '"v2"'})
+            wsi.get_wsi_data(max_age=dt.timedelta(0))
+            self.assertEqual(session.get.call_count, 3)
+            self.assertEqual(mock_parse.call_count, 2)
 
 if __name__ == '__main__':
     unittest.main()
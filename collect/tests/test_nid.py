@@ -6,8 +6,11 @@ initial test suite for collect.nid data access and utility functions; note: thes
 # -*- coding: utf-8 -*-
 import datetime as dt
 import io
+import os
+import tempfile
 import textwrap
 import unittest
+import unittest.mock
 import pandas as pd
 from collect import nid
 
@@ -141,6 +144,81 @@ class TestNID(unittest.TestCase):
         self.assertEqual(result['data'].head(4).index.strftime('%Y-%m-%d').tolist(),
                          [f'{year}-01-01', f'{year}-01-02', f'{year}-01-03', f'{year}-01-04'])
 
+    def test_parse_daily_tables(self):
+        """
+        test that dates are constructed for each year table, with non-existent dates masked and each year
+        trimmed to its reported days
+        """
+        header = 'Day             JAN       FEB       MAR       APR       MAY       JUN       JUL       AUG       SEP       OCT       NOV       DEC'
+        def _row(day, values):
+            return f'{day:>3}' + f'{values[0]:>16}' + ''.join(f'{x:>10}' for x in values[1:])
+
+        # January is not reported for 2023, and March 31 is missing for 2024
+        rows = [_row(day, [''] + [str(day)] * 11) for day in range(28, 32)]
+        leap = [_row(day, [str(day)] * 2 + ([''] if day == 31 else [str(day)]) + [str(day)] * 9)
+                for day in range(28, 32)]
+        result = nid.parse_daily_tables([(header, rows), (header, leap)], [2023, 2024])
+        self.assertEqual(result.index[0], pd.Timestamp('2023-02-28'))
+        self.assertEqual(result.index[-1], pd.Timestamp('2024-12-31'))
+        self.assertEqual(result['2023-02'].index.strftime('%Y-%m-%d').tolist(), ['2023-02-28'])
+        self.assertEqual(result[pd.Timestamp('2024-02-29')], 29)
+        self.assertEqual(result['2023-11'].index[-1], pd.Timestamp('2023-11-30'))
+        self.assertTrue(pd.isnull(result[pd.Timestamp('2024-03-31')]))
+        self.assertTrue(result.index.is_monotonic_increasing)
+
+        # months are taken from each table's header; months before JAN belong to the previous calendar year
+        water_year = 'Day        OCT    NOV    DEC    JAN    FEB    MAR    APR    MAY    JUN    JUL    AUG    SEP'
+        rows = [f'{day:>3}' + f'{day:>11}' + ''.join(f'{day + i:>7}' for i in range(1, 12)) for day in range(1, 3)]
+        result = nid.parse_daily_tables([(header, leap), (water_year, rows)], [2024, 2025])
+        self.assertEqual(result[pd.Timestamp('2024-10-01')], 1)
+        self.assertEqual(result[pd.Timestamp('2025-01-02')], 5)
+        self.assertEqual(result[pd.Timestamp('2024-12-31')], 31)
+
+        with self.assertRaises(ValueError):
+            nid.parse_daily_tables([(header.replace('JUN', 'JUNE'), leap)], [2024])
+
+    def test_get_all_data(self):
+        """
+        test that the hyquick index is requested once, site file listings are cached, and failed sites are
+        reported separately
+        """
+        index = textwrap.dedent("""\
+            <html><body><table>
+            <tr><td>NID Hyquick</td><td>Run on 2023/11/22 10:00:00</td></tr>
+            <tr><td>Site</td><td>Name</td></tr>
+            <tr><td>DC900</td><td>Scott's Flat Reservoir</td></tr>
+            <tr><td>BR100</td><td>Auburn Ravine I at Head</td></tr>
+            </table></body></html>
+        """).encode('utf-8')
+        daily = self.sample_daily_data.getvalue()
+
+        def _mock_get(url, **kwargs):
+            if url.endswith('hyquick/index.htm'):
+                return unittest.mock.Mock(content=index)
+            if 'BR100' in url:
+                raise ConnectionError('mocked failure')
+            if url.endswith('index.htm'):
+                return unittest.mock.Mock(content=b'<a href="DC900.usday_daily_volume.txt">daily</a>')
+            return unittest.mock.Mock(text=daily)
+
+        session = unittest.mock.Mock()
+        session.get.side_effect = _mock_get
+
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                unittest.mock.patch.dict(os.environ, {'COLLECT_CACHE_DIR': cache_dir}), \
+                unittest.mock.patch.dict(nid.nid._SITE_FILES, clear=True), \
+                unittest.mock.patch('collect.utils.get_session', return_value=session):
+            result = nid.get_all_data('daily')
+            self.assertEqual(session.get.call_count, 4)
+            self.assertEqual(result['data'].columns.tolist(), [('DC900', 'volume')])
+            self.assertEqual(result['data'].loc['2023-01-03', ('DC900', 'volume')], 46200)
+            self.assertEqual(list(result['info']['errors']), ['BR100'])
+            self.assertEqual(result['info']['issue_date'], dt.datetime(2023, 11, 22, 10))
+
+            # site file listings are not requested again
+            nid.get_all_data('daily', sites=['DC900'])
+            self.assertEqual(session.get.call_count, 6)
+
     def test_get_daily_meta(self):
         url = 'https://river-lake.nidwater.com/hyquick/DC140/DC140.usday_daily_flow.txt'
         result = nid.get_daily_meta(url=url, content=None)
@@ -187,6 +265,14 @@ class TestNID(unittest.TestCase):
         self.assertEqual(nid.serialize(df.copy(), day_format='%Y-%-m-%-d'),
                         {'VALUE': {'2020-12-1 00:00': 42, '2020-12-2 00:00': 42, '2020-12-3 00:00': 42}})
 
+        # the input frame is not modified, and missing values are serialized as null
+        df.iloc[1] = None
+        self.assertEqual(nid.serialize(df)['VALUE']['2020-12-2 00:00'], 'null')
+        self.assertEqual(df['VALUE'].dtype, float)
+        self.assertEqual(nid.serialize(df, columnar=True),
+                         b'{"columns":["VALUE"],"index":[1606809600000,1606896000000,1606982400000],'
+                         b'"data":[[42.0,null,42.0]]}')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -5,7 +5,14 @@ initial test suite for collect.usace data access and utility functions; note: th
 """
 # -*- coding: utf-8 -*-
 import datetime as dt
+import json
+import os
+import tempfile
+import textwrap
 import unittest
+import unittest.mock
+import pandas as pd
+from collect import utils
 from collect.usace import wcds
 
 
@@ -38,6 +45,73 @@ class TestUSACE(unittest.TestCase):
         self.assertEqual(result['data'].shape, (18, 16))
         self.assertEqual(result['data']['Storage'].tolist()[:4], [2235532.0, 2308907.0, 2357517.0, 2392661.0])
 
+    def test_get_data_cached_water_years(self):
+        """
+        test concurrent multi-water-year collection from mocked WCDS responses, with completed water years
+        cached locally and unchanged metadata shared between water years
+        """
+        def _mock_get(url, **kwargs):
+            water_year = int(url.split('_')[-1].split('.')[0])
+            if url.endswith('.meta'):
+                content = json.dumps({'allheaders': ['Storage (ac-ft)'],
+                                      'ymarkers': {'Gross Pool': {'value': 317100},
+                                                   'Gross Pool(elev)': {'value': 713}},
+                                      'generated': f'{water_year}-10-01'}).encode('utf-8')
+            else:
+                content = textwrap.dedent(f"""\
+                    ISO 8601 Date Time,Storage (ac-ft),Storage notes
+                    {water_year - 1}-10-01T24:00:00-08:00,{water_year},0
+                    {water_year - 1}-10-02T24:00:00-08:00,{water_year + 1},0
+                """).encode('utf-8')
+            return unittest.mock.Mock(content=content, json=lambda: json.loads(content))
+
+        session = unittest.mock.Mock()
+        session.get.side_effect = _mock_get
+
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                unittest.mock.patch.dict(os.environ, {'COLLECT_CACHE_DIR': cache_dir}), \
+                unittest.mock.patch('collect.utils.get_session', return_value=session):
+            result = wcds.get_data('nhg', dt.datetime(2020, 10, 1), dt.datetime(2022, 10, 5), interval='d')
+            self.assertEqual(result['data']['Storage'].tolist(), [2021, 2022, 2022, 2023, 2023, 2024])
+            self.assertEqual(result['info']['metadata changes'], [2021])
+            self.assertIs(result['info']['metadata'][2021], result['info']['metadata'][2023])
+            self.assertEqual(session.get.call_count, 6)
+
+            # completed water years are read from the cache
+            wcds.get_data('nhg', dt.datetime(2020, 10, 1), dt.datetime(2022, 10, 5), interval='d')
+            self.assertEqual(session.get.call_count, 6)
+
+    def test_get_all_data(self):
+        """
+        test batch collection across the reservoirs in a basin, with failed reservoirs reported separately
+        """
+        def _mock_get(url, **kwargs):
+            if 'tul' in url:
+                raise ConnectionError('mocked failure')
+            if url.endswith('.meta'):
+                content = json.dumps({'allheaders': ['Storage (ac-ft)'],
+                                      'ymarkers': {'Gross Pool': {'value': 2400000},
+                                                   'Gross Pool(elev)': {'value': 1088}},
+                                      'generated': '2021-01-03'}).encode('utf-8')
+            else:
+                content = textwrap.dedent("""\
+                    ISO 8601 Date Time,Storage (ac-ft)
+                    2021-01-01T24:00:00-08:00,100
+                    2021-01-02T24:00:00-08:00,200
+                """).encode('utf-8')
+            return unittest.mock.Mock(content=content, json=lambda: json.loads(content))
+
+        session = unittest.mock.Mock()
+        session.get.side_effect = _mock_get
+
+        with unittest.mock.patch('collect.utils.get_session', return_value=session):
+            result = wcds.get_all_data(dt.datetime(2021, 1, 1), dt.datetime(2021, 1, 5),
+                                       basin='Stanislaus River', cache=False)
+        self.assertEqual(result['data'].columns.tolist(), [('nml', 'Storage')])
+        self.assertEqual(result['data'][('nml', 'Storage')].tolist(), [100, 200])
+        self.assertEqual(result['info']['reservoirs'], ['nml'])
+        self.assertEqual(list(result['info']['errors']), ['tul'])
+
     def test_get_wcds_reservoirs(self):
         """
         show that 35 reservoirs exist in the internal collect record for WCDS reservoirs
@@ -53,6 +127,37 @@ class TestUSACE(unittest.TestCase):
         self.assertEqual(wcds.get_release_report('buc')['info']['units'], 'cfs')
         self.assertGreater(wcds.get_release_report('buc')['data'].shape[0], 0)
 
+    def test_get_release_reports(self):
+        """
+        test concurrent release report collection into a long table, with non-tabular reports kept as raw text
+        """
+        report = '\r\n'.join(['Release Notification Generated 05JAN2023 @ 1400 hours',
+                               'All flows reported in cfs.  ',
+                               '                                  |     From|       To|',
+                               'Release Change for 05JAN2023 @ 1500 |     1000|     2000|',
+                               'Release Change for 06JAN2023 @ 0800 |     2000|     1500|',
+                               ':' * 20,
+                               '  Increase for flood control',
+                               '  operations',
+                               ':' * 20])
+
+        def _mock_get(url, **kwargs):
+            content = report if 'project=buc' in url else 'No release changes'
+            return unittest.mock.Mock(content=content.encode('utf-8'))
+
+        session = unittest.mock.Mock()
+        session.get.side_effect = _mock_get
+
+        with unittest.mock.patch('collect.utils.get_session', return_value=session):
+            result = wcds.get_release_reports(['BUC', 'hid'], workers=2)
+        df = result['data']
+        self.assertEqual(df.index.tolist(), [('buc', pd.Timestamp('2023-01-05 15:00')),
+                                             ('buc', pd.Timestamp('2023-01-06 08:00'))])
+        self.assertEqual(df['To'].tolist(), [2000, 1500])
+        self.assertEqual(df['Comment'].tolist(), ['Increase for flood control operations'] * 2)
+        self.assertEqual(result['info']['units'], {'buc': 'cfs'})
+        self.assertEqual(result['info']['unparsed'], {'hid': 'No release changes'})
+
     def test_get_reservoir_metadata(self):
         result = wcds.get_reservoir_metadata('nhg', 2022, interval='d')
         self.assertEqual(int(result['gross pool (stor)']), 317100)
@@ -87,5 +192,56 @@ class TestUSACE(unittest.TestCase):
         self.assertEqual(float(result['folsom'].loc['14JAN2023 24z', '2-Day Forecasted Volume']), 123031)
         self.assertEqual(float(result['totals'].loc['BASIN TOTALS', 'Above Top of Conservation (acft)']), -1947118)
 
+    def test_get_fcr_history(self):
+        """
+        test that each FCR report is downloaded once per date and shared by the table parsers
+        """
+        session = unittest.mock.Mock()
+        session.get.return_value = unittest.mock.Mock(text='Sacramento Valley\n Shasta: ...\nSan Joaquin Valley')
+
+        def _mock_sac_valley(datetime_structure, content=None):
+            self.assertEqual(content, ['\n Shasta: ...\n'])
+            return pd.DataFrame({'Gross Pool (acft)': [4552000.0]}, index=pd.Index(['Shasta'], name='Reservoir'))
+
+        tz = utils.tz_function('US/Pacific')
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                unittest.mock.patch.dict(os.environ, {'COLLECT_CACHE_DIR': cache_dir}), \
+                unittest.mock.patch.dict(wcds._FCR_TEXT_CACHE, clear=True), \
+                unittest.mock.patch('collect.utils.get_session', return_value=session), \
+                unittest.mock.patch('collect.usace.wcds.extract_sac_valley_fcr_data', side_effect=_mock_sac_valley), \
+                unittest.mock.patch('collect.usace.wcds.extract_folsom_fcr_data', return_value=None), \
+                unittest.mock.patch('collect.usace.wcds.extract_basin_totals', return_value='raw text'):
+            result = wcds.get_fcr_history(dt.datetime(2023, 1, 1, tzinfo=tz), dt.datetime(2023, 1, 3, tzinfo=tz))
+            self.assertEqual(session.get.call_count, 3)
+            self.assertEqual(result['fcr'].index.tolist(),
+                             [(pd.Timestamp(f'2023-01-0{i}'), 'Shasta') for i in range(1, 4)])
+            self.assertTrue(result['folsom'].empty)
+            self.assertEqual(result['errors'], {})
+
+            # reports are read from the local cache after the first download
+            wcds._FCR_TEXT_CACHE.clear()
+            wcds.get_fcr_data(dt.datetime(2023, 1, 2, tzinfo=tz), session=session)
+            self.assertEqual(session.get.call_count, 3)
+
+    def test_extract_fcr_text_missing_section(self):
+        """
+        test that a report without the Sacramento Valley section is not cached in memory or on disk
+        """
+        session = unittest.mock.Mock()
+        session.get.return_value = unittest.mock.Mock(text='Service unavailable')
+
+        tz = utils.tz_function('US/Pacific')
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                unittest.mock.patch.dict(os.environ, {'COLLECT_CACHE_DIR': cache_dir}), \
+                unittest.mock.patch.dict(wcds._FCR_TEXT_CACHE, clear=True):
+            self.assertEqual(wcds.extract_fcr_text(dt.datetime(2023, 1, 1, tzinfo=tz), session=session), [])
+            self.assertEqual(os.listdir(os.path.join(cache_dir, 'usace', 'wcds', 'fcr')), [])
+
+            # the report is requested again on the next call
+            wcds.extract_fcr_text(dt.datetime(2023, 1, 1, tzinfo=tz), session=session)
+            self.assertEqual(session.get.call_count, 2)
+            self.assertEqual(wcds._FCR_TEXT_CACHE, {})
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -5,7 +5,12 @@ initial test suite for collect.utils utility functions; note: these tests requir
 """
 # -*- coding: utf-8 -*-
 import datetime as dt
+import io
+import json
+import tempfile
 import unittest
+import unittest.mock
+import numpy as np
 import pandas as pd
 import requests
 from collect import utils
@@ -22,6 +27,34 @@ class TestUtils(unittest.TestCase):
     def test_get_web_status(self):
         self.assertTrue(utils.get_web_status('https://example.com'))
 
+    def test_get_cached_content(self):
+        """
+        test that cached content is revalidated with conditional headers and reused on 304 responses
+        """
+        with tempfile.TemporaryDirectory() as cache_dir:
+            session = unittest.mock.Mock()
+            session.get.return_value = unittest.mock.Mock(status_code=200,
+                                                          content=b'report',
+                                                          headers={'ETag': '"abc"'})
+            self.assertEqual(utils.get_cached_content('https://example.com/a.pdf', cache_dir, session=session),
+                             (b'report', True))
+
+            session.get.return_value = unittest.mock.Mock(status_code=304, content=b'', headers={})
+            self.assertEqual(utils.get_cached_content('https://example.com/a.pdf', cache_dir, session=session),
+                             (b'report', False))
+            self.assertEqual(session.get.call_args[1]['headers'], {'If-None-Match': '"abc"'})
+
+            self.assertEqual(utils.get_cached_content('https://example.com/a.pdf', cache_dir, session=session,
+                                                      revalidate=False),
+                             (b'report', False))
+            self.assertEqual(session.get.call_count, 2)
+
+    def test_get_concurrent_results(self):
+        result = utils.get_concurrent_results(lambda x: 10 / x, [1, 2, 0, 5], workers=2)
+        self.assertEqual(list(result.keys()), [1, 2, 0, 5])
+        self.assertEqual(result[5], 2)
+        self.assertIsInstance(result[0], ZeroDivisionError)
+
     def test_clean_fixed_width_headers(self):
         test_headers = [
             ['Unnamed: 0_level_0', '90%', '75%', '50%', '25%', '10%'] + [f'Unnamed: {i}_level_0' for i in range (6, 10)],
@@ -45,10 +78,82 @@ class TestUtils(unittest.TestCase):
 
         self.assertEqual(utils.clean_fixed_width_headers(columns), expected_columns)
 
+    def test_parse_iso_datetimes(self):
+        """
+        test that ISO 8601 strings with T24:00 roll over to midnight of the next day across UTC offsets
+        """
+        result = utils.parse_iso_datetimes(['2020-08-31T24:00:00-07:00',
+                                            '2020-11-01T01:00:00-07:00',
+                                            '2020-11-01T01:00:00-08:00',
+                                            '2021-02-28T24:00:00-08:00'], tz='US/Pacific')
+        self.assertEqual(str(result.tz), 'US/Pacific')
+        self.assertEqual(result.strftime('%Y-%m-%d %H:%M %z').tolist(), ['2020-09-01 00:00 -0700',
+                                                                         '2020-11-01 01:00 -0700',
+                                                                         '2020-11-01 01:00 -0800',
+                                                                         '2021-03-01 00:00 -0800'])
+
+        # strings without offsets are local to tz; non-standard layouts use the general parser
+        result = utils.parse_iso_datetimes(['2021-01-01 24:00', '2021-01-01T24:00:00Z', '2021-01-01 5:00'],
+                                           tz='US/Pacific')
+        self.assertEqual(result.strftime('%Y-%m-%d %H:%M').tolist(), ['2021-01-02 00:00',
+                                                                      '2021-01-01 16:00',
+                                                                      '2021-01-01 05:00'])
+
+    def test_parse_iso_datetimes_dst(self):
+        """
+        test that the repeated fall-back hour of local times is kept, and that mixed-length ISO strings are
+        parsed without the general parser
+        """
+        result = utils.parse_iso_datetimes(['2023-11-05T00:00', '2023-11-05T01:00', '2023-11-05T01:00',
+                                            '2023-11-05T02:00'], tz='US/Pacific')
+        self.assertEqual(result.strftime('%H:%M %z').tolist(), ['00:00 -0700', '01:00 -0700', '01:00 -0800',
+                                                                '02:00 -0800'])
+
+        with unittest.mock.patch('collect.utils.utils._parse_iso_fallback') as mock_fallback:
+            result = utils.parse_iso_datetimes(['2023-11-05T08:00', '2023-11-05T09:00:00Z'], tz='UTC')
+        mock_fallback.assert_not_called()
+        self.assertEqual(result.strftime('%H:%M').tolist(), ['08:00', '09:00'])
+
+    def test_parse_iso_datetimes_invalid(self):
+        """
+        test that out-of-range components raise instead of rolling over into another timestamp
+        """
+        for value in ['2021-13-01T00:00', '2021-02-29T00:00', '2021-01-32T00:00:00Z', '2021-01-01T00:99',
+                      '2021-01-01T24:30', '2021-01-01T00:00:61-08:00']:
+            with self.assertRaises(ValueError, msg=value):
+                utils.parse_iso_datetimes(['2021-01-01T00:00:00Z', value])
+
     def test_get_water_year(self):
         self.assertEqual(utils.get_water_year(dt.datetime(2023, 5, 12)), 2023)
         self.assertEqual(utils.get_water_year(dt.datetime(2023, 11, 12)), 2024)
 
+    def test_serialize_columns(self):
+        df = pd.DataFrame(index=pd.date_range('2020-12-01', '2020-12-03', freq='D'),
+                          data={'VALUE': [42, np.nan, 43], 'UNITS': ['cfs', None, 'cfs']})
+        expected = df.copy()
+        self.assertEqual(json.loads(utils.serialize_columns(df, tz='UTC')),
+                         {'columns': ['VALUE', 'UNITS'],
+                          'index': [1606780800000, 1606867200000, 1606953600000],
+                          'data': [[42.0, None, 43.0], ['cfs', None, 'cfs']]})
+        pd.testing.assert_frame_equal(df, expected)
+
+        # naive indexes are localized before conversion to epoch timestamps
+        self.assertEqual(json.loads(utils.serialize_columns(df, tz='US/Pacific'))['index'][0], 1606809600000)
+        with self.assertRaises(ValueError):
+            utils.serialize_columns(df)
+
+        # the repeated hour on the fall-back day is kept, with distinct timestamps
+        index = pd.DatetimeIndex(['2023-11-05 00:00', '2023-11-05 01:00', '2023-11-05 01:00', '2023-11-05 02:00'])
+        result = json.loads(utils.serialize_columns(pd.DataFrame({'VALUE': range(4)}, index=index), tz='US/Pacific'))
+        self.assertEqual([(x - result['index'][0]) // 3600000 for x in result['index']], [0, 1, 2, 3])
+
+        # chunked writes to a file object match the in-memory result
+        buffer = io.BytesIO()
+        utils.serialize_columns(df.tz_localize('US/Pacific'), fp=buffer, timestamps='iso', chunk_size=2)
+        self.assertEqual(json.loads(buffer.getvalue())['index'], ['2020-12-01T08:00:00Z',
+                                                                  '2020-12-02T08:00:00Z',
+                                                                  '2020-12-03T08:00:00Z'])
+
 
 if __name__ == '__main__':
     unittest.main()
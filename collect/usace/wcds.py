@@ -17,15 +17,28 @@ import ssl
 from collect import utils
 
 
-def get_water_year_data(reservoir, water_year, interval='d'):
+_FCR_TEXT_CACHE = {}
+
+_FCR_SECTION_PATTERN = re.compile(r'(?<=Sacramento Valley)[\S\s]*(?=San Joaquin Valley)')
+
+_RELEASE_HEADER_PATTERN = re.compile(r'(\|\s+From\|\s+To\|.*\r\n)')
+
+_RELEASE_TIME_PATTERN = re.compile(r'Change for\s+(\d{1,2}\w{3}\d{4} @ \d{4})')
+
+
+def get_water_year_data(reservoir, water_year, interval='d', session=None, cache=True):
     """
     Scrape water year operations data from Folsom entry on USACE-SPK's WCDS.
     Note: times formatted as 2400 are assigned to 0000 of the next date. (hourly and daily)
 
+    Completed water years do not change and are cached locally after the first download.
+
     Arguments:
         reservoir (str): three-letter reservoir code; i.e. 'fol'
         water_year (int): the water year
         interval (str): data interval; i.e. 'd' 
+        session (requests.Session): optional session for connection reuse
+        cache (bool): flag to read/write completed water years from the local cache
 
     Returns:
         result (dict): query result dictionary with 'data' and 'info' keys
@@ -33,11 +46,18 @@ def get_water_year_data(reservoir, water_year, interval='d'):
     # reservoir code is case-sensitive
     reservoir = reservoir.lower()
 
+    # completed water years are immutable; reuse the cached result if available
+    path = utils.get_cache_dir('usace', 'wcds').joinpath(f'{reservoir}{interval}_{water_year}.pkl')
+    if cache and path.exists():
+        return pd.read_pickle(path)
+
+    session = session or utils.get_session(pool_size=1)
+
     # USACE-SPK Folsom page
     url = f'https://www.spk-wc.usace.army.mil/plots/csv/{reservoir}{interval}_{water_year}.plot'
 
     # Read url data
-    response = requests.get(url, verify=ssl.CERT_NONE).content
+    response = session.get(url, verify=ssl.CERT_NONE).content
     df = pd.read_csv(io.StringIO(response.decode('utf-8')), header=0, na_values=['-', 'M'])
 
     # Check that user chosen water year is within range with data
@@ -60,39 +80,151 @@ def get_water_year_data(reservoir, water_year, interval='d'):
     # Convert to date time object
     df.set_index('ISO 8601 Date Time', inplace=True)
 
-    # add a day to timesteps where 24T is in the index (TODO: when numpy <1.26 include format='mixed')
-    new_index = pd.Series(pd.to_datetime(df.index.str.replace('T24:', ' ')), index=df.index)
-    mask = df.index.str.contains('T24:')
-    new_index[mask] += pd.Timedelta(days=1)
-
-    # create datetime index in US/Pacific time to match WCDS
-    df.index = pd.to_datetime(new_index.values, utc=True).tz_convert('US/Pacific')
+    # create datetime index in US/Pacific time to match WCDS; T24:00 timesteps roll over to 0000 of the next day
+    df.index = utils.parse_iso_datetimes(df.index, tz='US/Pacific')
 
     # Define variable for reservoir metadata
-    metadata_dict = get_reservoir_metadata(reservoir, water_year, interval)
+    metadata_dict = get_reservoir_metadata(reservoir, water_year, interval, session=session)
     
-    return {'data': df, 
-            'info': {'reservoir': reservoir,
-                     'water year': water_year,
-                     'interval': interval,
-                     'metadata': metadata_dict}}
+    result = {'data': df, 
+              'info': {'reservoir': reservoir,
+                       'water year': water_year,
+                       'interval': interval,
+                       'metadata': metadata_dict}}
 
+    if cache and _is_complete_water_year(water_year):
+        pd.to_pickle(result, path)
 
-def get_data(reservoir, start_time, end_time, interval='d', clean_column_headers=True):
+    return result
+
+
+def get_data(reservoir, start_time, end_time, interval='d', clean_column_headers=True, workers=8, cache=True):
     """
-    Scrape water year operations data from reservoir page on USACE-SPK's WCDS.
+    Scrape water year operations data from reservoir page on USACE-SPK's WCDS.  Water years are fetched
+    concurrently over a pooled session; completed water years are read from the local cache.
     
     Arguments:
         reservoir (str): three-letter reservoir code
         start_time (datetime.datetime): query start datetime
         end_time (datetime.datetime): query end datetime
         interval (str): data interval
+        workers (int): number of concurrent water year requests
+        cache (bool): flag to read/write completed water years from the local cache
     Returns:
         result (dict): query result dictionary with data and info keys
     """
     # reservoir code is case-sensitive
     reservoir = reservoir.lower()
 
+    start_time, end_time = _get_time_bounds(start_time, end_time)
+
+    # fetch all water years concurrently
+    water_years = range(utils.get_water_year(start_time), utils.get_water_year(end_time) + 1)
+    session = utils.get_session(pool_size=workers)
+    results = utils.get_concurrent_results(lambda x: get_water_year_data(reservoir,
+                                                                         x,
+                                                                         interval,
+                                                                         session=session,
+                                                                         cache=cache),
+                                           water_years,
+                                           workers)
+
+    for result in results.values():
+        if isinstance(result, Exception):
+            raise result
+
+    df, metadata_dict, metadata_changes = _combine_water_years(results, start_time, end_time, clean_column_headers)
+
+    # return timeseries data and record metadata
+    return {'data': df, 
+            'info': {'reservoir': reservoir, 
+                     'interval': interval, 
+                     'notes': 'daily data value occurs on midnight of entry date',
+                     'metadata': metadata_dict,
+                     'metadata changes': metadata_changes}}
+
+
+def get_all_data(start_time, end_time, interval='d', region=None, basin=None, clean_column_headers=True, workers=8,
+                 cache=True):
+    """
+    Scrape water year operations data for every WCDS reservoir matching the region/basin filter and reporting
+    data at the requested interval.  All (reservoir, water year) requests are fetched concurrently over one
+    pooled session; reservoirs with failed requests are reported in the result info and omitted from the panel.
+
+    Arguments:
+        start_time (datetime.datetime): query start datetime
+        end_time (datetime.datetime): query end datetime
+        interval (str): data interval; 'd' for daily or 'h' for hourly
+        region (str or list): optional region name(s) from get_wcds_reservoirs; i.e. 'Sacramento Valley'
+        basin (str or list): optional river basin name(s) from get_wcds_reservoirs; i.e. 'American River'
+        clean_column_headers (bool): flag to strip units from column headers
+        workers (int): number of concurrent water year requests
+        cache (bool): flag to read/write completed water years from the local cache
+    Returns:
+        result (dict): query result dictionary with data and info keys; data columns are keyed by
+                       (reservoir, variable)
+    """
+    reservoirs = get_wcds_reservoirs()
+    reservoirs = reservoirs.loc[reservoirs['Hourly Data' if interval == 'h' else 'Daily Data']]
+    if region is not None:
+        reservoirs = reservoirs.loc[reservoirs['Region'].isin([region] if isinstance(region, str) else region)]
+    if basin is not None:
+        reservoirs = reservoirs.loc[reservoirs['River Basin'].isin([basin] if isinstance(basin, str) else basin)]
+
+    start_time, end_time = _get_time_bounds(start_time, end_time)
+
+    # fan out across every reservoir and water year
+    water_years = range(utils.get_water_year(start_time), utils.get_water_year(end_time) + 1)
+    items = [(reservoir.lower(), water_year) for reservoir in reservoirs.index for water_year in water_years]
+    session = utils.get_session(pool_size=workers)
+    results = utils.get_concurrent_results(lambda x: get_water_year_data(x[0],
+                                                                         x[1],
+                                                                         interval,
+                                                                         session=session,
+                                                                         cache=cache),
+                                           items,
+                                           workers)
+
+    frames = {}
+    metadata = {}
+    errors = {}
+    for reservoir in reservoirs.index.str.lower():
+        reservoir_results = {water_year: results[(reservoir, water_year)] for water_year in water_years}
+        failed = {k: v for k, v in reservoir_results.items() if isinstance(v, Exception)}
+        if failed:
+            errors.update({reservoir: {k: str(v) for k, v in failed.items()}})
+            print(f'WARNING: WCDS data not retrieved for {reservoir} water years {", ".join(map(str, failed))}')
+            continue
+
+        df, metadata_dict, metadata_changes = _combine_water_years(reservoir_results,
+                                                                   start_time,
+                                                                   end_time,
+                                                                   clean_column_headers)
+        frames.update({reservoir: df})
+        metadata.update({reservoir: {'metadata': metadata_dict, 'metadata changes': metadata_changes}})
+
+    # align all reservoirs on a shared time index
+    df = pd.concat(frames, axis=1, names=['reservoir', 'variable']) if frames else pd.DataFrame()
+    df.index.name = 'ISO 8601 Date Time'
+
+    return {'data': df,
+            'info': {'reservoirs': list(frames),
+                     'interval': interval,
+                     'region': region,
+                     'basin': basin,
+                     'notes': 'daily data value occurs on midnight of entry date',
+                     'metadata': metadata,
+                     'errors': errors}}
+
+
+def _get_time_bounds(start_time, end_time):
+    """
+    Arguments:
+        start_time (datetime.datetime): query start datetime
+        end_time (datetime.datetime): query end datetime
+    Returns:
+        (tuple): timezone-aware start and end datetimes, with the start bounded by the WCDS period of record
+    """
     # Check that user-chosen water year is within range with data
     earliest_time = dt.datetime.strptime('1994-10-01', '%Y-%m-%d')
 
@@ -109,15 +241,36 @@ def get_data(reservoir, start_time, end_time, interval='d', clean_column_headers
     if end_time.tzinfo is None:
         end_time = end_time.astimezone(dt.timezone.utc)
 
+    return start_time, end_time
+
+
+def _combine_water_years(results, start_time, end_time, clean_column_headers=True):
+    """
+    Arguments:
+        results (dict): get_water_year_data results keyed by water year, in water year order
+        start_time (datetime.datetime): query start datetime
+        end_time (datetime.datetime): query end datetime
+        clean_column_headers (bool): flag to strip units from column headers
+    Returns:
+        (tuple): the truncated timeseries, metadata keyed by water year and the water years with metadata changes
+    """
     # Make new dataframe
     frames = []
     metadata_dict = {}
+    metadata_changes = []
 
-    for water_year in range(utils.get_water_year(start_time), utils.get_water_year(end_time) + 1):
-        result = get_water_year_data(reservoir, water_year, interval)
+    for water_year, result in results.items():
         truncate_result = result['data'].truncate(before=start_time, after=end_time)
         frames.append(truncate_result)
-        metadata_dict.update({water_year: result['info']['metadata']})
+
+        # share metadata across water years when the reservoir metadata is unchanged
+        metadata = result['info']['metadata']
+        previous = metadata_dict.get(water_year - 1)
+        if previous is not None and _metadata_key(previous) == _metadata_key(metadata):
+            metadata = previous
+        else:
+            metadata_changes.append(water_year)
+        metadata_dict.update({water_year: metadata})
 
     df = pd.concat(frames)
     df.index.name = 'ISO 8601 Date Time'
@@ -126,12 +279,30 @@ def get_data(reservoir, start_time, end_time, interval='d', clean_column_headers
     if clean_column_headers:
         df.rename(_cleaned_columns_map(df.columns), axis=1, inplace=True)
 
-    # return timeseries data and record metadata
-    return {'data': df, 
-            'info': {'reservoir': reservoir, 
-                     'interval': interval, 
-                     'notes': 'daily data value occurs on midnight of entry date',
-                     'metadata': metadata_dict}}
+    return df, metadata_dict, metadata_changes
+
+
+def _is_complete_water_year(water_year, settling_period=dt.timedelta(days=30)):
+    """
+    water years are treated as complete (immutable) once the settling period after September 30 has passed
+
+    Arguments:
+        water_year (int): the water year
+        settling_period (datetime.timedelta): time after the end of the water year for late revisions
+    Returns:
+        (bool): flag to indicate whether the water year data is complete
+    """
+    return dt.datetime.now() >= dt.datetime(water_year, 10, 1) + settling_period
+
+
+def _metadata_key(metadata):
+    """
+    Arguments:
+        metadata (dict): reservoir metadata from get_reservoir_metadata
+    Returns:
+        (str): comparable representation of the metadata, excluding the generation time
+    """
+    return repr(sorted((k, v) for k, v in metadata.items() if k != 'generated'))
 
 
 def get_wcds_reservoirs():
@@ -213,7 +384,7 @@ def _cleaned_columns_map(columns):
     return {x: re.sub(r'(\(.*\))', '', x).replace('  ', ' ').strip() for x in columns}
 
 
-def get_release_report(reservoir):
+def get_release_report(reservoir, session=None):
     """
     download release change data reports from https://www.spk-wc.usace.army.mil/reports/release_changes.html
     each reservoir release change report is provided via email; as such, there is no one standard format
@@ -221,6 +392,7 @@ def get_release_report(reservoir):
     
     Arguments:
         reservoir (str): three-letter reservoir code, lowercase
+        session (requests.Session): optional session for connection reuse
     Returns:
         (dict): dictionary containing the release change email and other reservoir info
     """
@@ -234,11 +406,11 @@ def get_release_report(reservoir):
     url = f'https://www.spk-wc.usace.army.mil/fcgi-bin/release.py?project={reservoir}&textonly=true'
 
     # request data from url
-    response = requests.get(url, verify=ssl.CERT_NONE).content
+    response = (session or requests).get(url, verify=ssl.CERT_NONE).content
     raw = response.decode('utf-8')
 
     # check for header matching pattern with pipe delimiters
-    header = re.findall(r'(\|\s+From\|\s+To\|.*\r\n)', raw)
+    header = _RELEASE_HEADER_PATTERN.findall(raw)
     if len(header) > 0:
         # determine column labels from pipe-deplimited header row
         column_headers = ['Description', *[x.strip() for x in header[0].split('|')  if bool(x.strip())]]
@@ -248,8 +420,9 @@ def get_release_report(reservoir):
         df = pd.read_csv(io.StringIO(table), header=None, delimiter='|', usecols=list(range(len(column_headers))))
         df.columns = column_headers
 
-        # create a date/time index
-        df.index = df.loc[:, 'Description'].apply(lambda x: dt.datetime.strptime(re.findall(r'Change for\s+(\d{1,2}\w{3}\d{4} @ \d{4}).*', x)[0], '%d%b%Y @ %H%M'))
+        # create a date/time index from the change time in each description
+        df.index = pd.to_datetime(df['Description'].str.extract(_RELEASE_TIME_PATTERN, expand=False),
+                                  format='%d%b%Y @ %H%M')
         df.index.name = 'Date/Time'
 
         # extract the email comment footer
@@ -274,7 +447,48 @@ def get_release_report(reservoir):
     return {'data': raw, 'info': info}
 
 
-def get_reservoir_metadata(reservoir, water_year, interval='d'):
+def get_release_reports(reservoirs=None, workers=8):
+    """
+    download the release change reports for many WCDS projects concurrently and combine the tabular
+    reports into a single long table of release changes
+
+    Arguments:
+        reservoirs (list): optional reservoir codes; defaults to all projects from get_wcds_reservoirs
+        workers (int): number of concurrent report requests
+    Returns:
+        (dict): dictionary containing the release changes indexed by (Project, Date/Time), with the email
+                comment of each project, and info on the reports that could not be retrieved or tabulated
+    """
+    if reservoirs is None:
+        reservoirs = get_wcds_reservoirs().index.unique().tolist()
+    reservoirs = [x.lower() for x in reservoirs]
+
+    session = utils.get_session(pool_size=workers)
+    results = utils.get_concurrent_results(lambda x: get_release_report(x, session=session), reservoirs, workers)
+
+    frames = {}
+    units = {}
+    unparsed = {}
+    errors = {}
+    for reservoir, result in results.items():
+        if isinstance(result, Exception):
+            errors.update({reservoir: str(result)})
+            print(f'WARNING: release report unavailable for {reservoir}: {result}')
+        elif isinstance(result['data'], pd.DataFrame):
+            frames.update({reservoir: result['data'].assign(Comment=result['info']['comment'])})
+            units.update({reservoir: result['info']['units']})
+        else:
+            unparsed.update({reservoir: result['data']})
+
+    df = pd.concat(frames, names=['Project']) if frames else pd.DataFrame()
+
+    return {'data': df,
+            'info': {'units': units,
+                     'unparsed': unparsed,
+                     'errors': errors}}
+
+
+def get_reservoir_metadata(reservoir, water_year, interval='d', session=None):
     """
     Retrieves website metadata from USACE-SPK's WCDS.
     
@@ -282,6 +496,7 @@ def get_reservoir_metadata(reservoir, water_year, interval='d'):
         reservoir (str): three-letter reservoir code; i.e. 'fol'
         water_year (int): the water year
         interval (str): data interval; i.e. 'd' 
+        session (requests.Session): optional session for connection reuse
 
     Returns:
         result (dict): query result dictionary
@@ -293,7 +508,7 @@ def get_reservoir_metadata(reservoir, water_year, interval='d'):
     url = f'https://www.spk-wc.usace.army.mil/plots/csv/{reservoir}{interval}_{water_year}.meta'
     
     # read data from url using requests session with retries
-    response = requests.get(url, verify=ssl.CERT_NONE)
+    response = (session or requests).get(url, verify=ssl.CERT_NONE)
 
     # complete metadata dictionary
     metadata_dict = response.json()
@@ -315,12 +530,15 @@ def get_reservoir_metadata(reservoir, water_year, interval='d'):
     return result
 
 
-def extract_fcr_text(datetime_structure):
+def extract_fcr_text(datetime_structure, session=None, cache=True):
     """
-    read the text in the Sacramento Valley section of the USACE SPK FCR report
+    read the text in the Sacramento Valley section of the USACE SPK FCR report; the report for each
+    Pacific date is downloaded once and reused by the table parsers in this module
 
     Arguments:
         datetime_structure (datetime.datetime): datetime object
+        session (requests.Session): optional session for connection reuse
+        cache (bool): flag to read/write the report section from the local cache
     Returns:
         (list): list of text from the FCR report
     """
@@ -329,6 +547,15 @@ def extract_fcr_text(datetime_structure):
     # data on WCDS is in Pacific
     datetime_structure_pacific = datetime_structure.astimezone(utils.tz_function('US/Pacific'))
 
+    # reuse the report section already extracted for this date
+    date = f'{datetime_structure_pacific:%Y-%m-%d}'
+    path = utils.get_cache_dir('usace', 'wcds', 'fcr').joinpath(f'fcr_{date}.txt')
+    if cache and date in _FCR_TEXT_CACHE:
+        return _FCR_TEXT_CACHE[date]
+    if cache and path.exists() and path.stat().st_size > 0:
+        _FCR_TEXT_CACHE[date] = [path.read_text(encoding='utf-8')]
+        return _FCR_TEXT_CACHE[date]
+
     # get today's date in pacific time for 0000 Pacific
     today_pacific = dt.datetime.now(tz=datetime_structure_pacific.tzinfo).replace(hour=0)
 
@@ -339,17 +566,29 @@ def extract_fcr_text(datetime_structure):
         raise NotImplementedError(f'Date unavailable: {datetime_structure_pacific:%Y-%m-%d}')
 
     url = f'https://www.spk-wc.usace.army.mil/fcgi-bin/midnight.py?days={days+1}&report=FCR&textonly=true'
-    content = utils.get_session_response(url, verify=ssl.CERT_NONE).text
+    if session is None:
+        content = utils.get_session_response(url, verify=ssl.CERT_NONE).text
+    else:
+        content = session.get(url, verify=ssl.CERT_NONE).text
+
     # get the list of text between Sacramento Valley and San Joaquin Valley
-    return re.findall(r'(?<=Sacramento Valley)[\S\s]*(?=San Joaquin Valley)', content)
+    result = _FCR_SECTION_PATTERN.findall(content)
+
+    # missing sections (error pages, reports not yet issued) and current reports are not cached, so they are
+    # requested again on the next call
+    if cache and len(result) > 0 and datetime_structure_pacific.date() < today_pacific.date():
+        path.write_text(result[0], encoding='utf-8')
+        _FCR_TEXT_CACHE[date] = result
+    return result
 
 
-def extract_sac_valley_fcr_data(datetime_structure):
+def extract_sac_valley_fcr_data(datetime_structure, content=None):
     """
     get the Sacramento Valley Storages and Flood Control Parameters from the FCR report
 
     Arguments:
         datetime_structure (datetime): datetime object
+        content (list): optional FCR report text from extract_fcr_text; retrieved if not provided
     Returns:
         df (pandas.DataFrame): the USACE SPK station storage and flood control parameters data,
             specific to Sacramento Valley
@@ -359,7 +598,7 @@ def extract_sac_valley_fcr_data(datetime_structure):
         print(f'WARNING: Sac Valley table unavailable before {last_date:%Y-%m-%d}')
         return None
 
-    query = extract_fcr_text(datetime_structure)
+    query = extract_fcr_text(datetime_structure) if content is None else content
     if len(query) > 0:
         query = query[0]
     else:
@@ -411,13 +650,14 @@ def extract_sac_valley_fcr_data(datetime_structure):
     return df.dropna(how='all').astype(float, errors='ignore').replace(np.nan, None)
 
 
-def extract_folsom_fcr_data(datetime_structure):
+def extract_folsom_fcr_data(datetime_structure, content=None):
     """
     get the Folsom Storages, Flood Control Parameters, and Forecasted Volumes from the Sacramento Valley
     section of the FCR report
 
     Arguments:
         datetime_structure (datetime): datetime object
+        content (list): optional FCR report text from extract_fcr_text; retrieved if not provided
     Returns:
         df (pandas.DataFrame): the USACE SPK station storage, flood control parameters, and forecasted volumes,
             specific to Folsom
@@ -427,7 +667,7 @@ def extract_folsom_fcr_data(datetime_structure):
         print(f'WARNING: Folsom forecasted volumes table unavailable before {last_date:%Y-%m-%d}')
         return None
 
-    query = extract_fcr_text(datetime_structure)[0]
+    query = (extract_fcr_text(datetime_structure) if content is None else content)[0]
     table_query = re.findall(r'(?=Forecasted Volumes)[\S\s]*(?=BASIN TOTALS)', query)[0].split('Forecasted Volumes****')[1]
     for symbol in ['-', '(', ')', ';', ',']:
         table_query = table_query.replace(symbol, '')
@@ -460,18 +700,19 @@ def extract_folsom_fcr_data(datetime_structure):
     return df.dropna(how='all').astype(float, errors='ignore').replace(np.nan, None)
 
 
-def extract_basin_totals(datetime_structure):
+def extract_basin_totals(datetime_structure, content=None):
     """
     get the Sacramento Valley basin FCR totals
 
     Arguments:
         datetime_structure (datetime): datetime object
+        content (list): optional FCR report text from extract_fcr_text; retrieved if not provided
     Returns:
         df (pandas.DataFrame): the USACE SPK total Sacramento Valley basin FCR values
         OR
         table_query (str): raw text for basin totals
     """
-    query = extract_fcr_text(datetime_structure)[0]
+    query = (extract_fcr_text(datetime_structure) if content is None else content)[0]
 
     # try reading data in one of two formats
     try:
@@ -522,16 +763,52 @@ def extract_basin_totals(datetime_structure):
     except (KeyError, ValueError, AttributeError):
         return table_query
 
-def get_fcr_data(datetime_structure):
+def get_fcr_data(datetime_structure, session=None):
     """
-    get all of the FCR date for Sacramento Valley basin
+    get all of the FCR date for Sacramento Valley basin; the report is downloaded once and each table
+    is parsed from the same text
 
     Arguments:
         datetime_structure (datetime): datetime object
+        session (requests.Session): optional session for connection reuse
     Returns:
         (dict): dictionary containing each dataframe for all FCR, Folsom specific metrics, and basin totals
     """
+    content = extract_fcr_text(datetime_structure, session=session)
     return {'date': f'{datetime_structure:%Y-%m-%d}',
-            'fcr': extract_sac_valley_fcr_data(datetime_structure),
-            'folsom': extract_folsom_fcr_data(datetime_structure),
-            'totals': extract_basin_totals(datetime_structure)}
+            'fcr': extract_sac_valley_fcr_data(datetime_structure, content=content),
+            'folsom': extract_folsom_fcr_data(datetime_structure, content=content),
+            'totals': extract_basin_totals(datetime_structure, content=content)}
+
+
+def get_fcr_history(start, end, workers=8):
+    """
+    get the FCR tables for each day from start to end, with reports for all dates fetched concurrently
+
+    Arguments:
+        start (datetime.datetime): timezone-aware first report date
+        end (datetime.datetime): timezone-aware last report date
+        workers (int): number of concurrent report requests
+    Returns:
+        (dict): dictionary of date-stacked dataframes for all FCR, Folsom specific metrics, and basin totals,
+                with the dates that could not be retrieved or parsed under 'errors'
+    """
+    dates = pd.date_range(start, end, freq='D').to_pydatetime().tolist()
+    session = utils.get_session(pool_size=workers)
+    results = utils.get_concurrent_results(lambda x: get_fcr_data(x, session=session), dates, workers)
+
+    frames = {'fcr': {}, 'folsom': {}, 'totals': {}}
+    errors = {}
+    for date, result in results.items():
+        if isinstance(result, Exception):
+            errors.update({f'{date:%Y-%m-%d}': str(result)})
+            print(f'WARNING: FCR report unavailable for {date:%Y-%m-%d}: {result}')
+            continue
+
+        # unsupported formats return None (or raw text for basin totals) and are omitted
+        for key in frames:
+            if isinstance(result[key], pd.DataFrame):
+                frames[key].update({pd.Timestamp(result['date']): result[key]})
+
+    return {**{key: pd.concat(value, names=['Date']) if value else pd.DataFrame() for key, value in frames.items()},
+            'errors': errors}
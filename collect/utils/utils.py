@@ -4,6 +4,16 @@ collect.utils.utils
 The utilities module of MBK Engineers' collect project
 """
 # -*- coding: utf-8 -*-
+import concurrent.futures
+import datetime as dt
+import hashlib
+import io
+import json
+import os
+import pathlib
+
+import numpy as np
+import pandas as pd
 import urllib3
 # disable warnings in crontab logs
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -27,6 +37,27 @@ except:
     tz_function = timezone
 
 
+def get_session(pool_size=10, retries=5):
+    """
+    create a requests session with retries and a connection pool sized for concurrent requests
+
+    Arguments:
+        pool_size (int): maximum number of pooled connections per host
+        retries (int): number of retries for connection errors and 5xx responses
+    Returns:
+        session (requests.Session): the configured session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size,
+                          pool_maxsize=pool_size,
+                          max_retries=Retry(total=retries,
+                                            backoff_factor=0.1,
+                                            status_forcelist=[500, 502, 503, 504]))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
 def get_session_response(url, auth=None, verify=None):
     """
     wraps request with a session and 5 retries; provides optional auth and verify parameters
@@ -41,14 +72,104 @@ def get_session_response(url, auth=None, verify=None):
     verify_kwarg = {} if verify is None else {'verify': verify}
 
     # initialize connection
-    session = requests.Session()
-    retries = Retry(total=5,
-                    backoff_factor=0.1,
-                    status_forcelist=[500, 502, 503, 504])
-    session.mount('https://', HTTPAdapter(max_retries=retries))
+    session = get_session(pool_size=1)
     return session.get(url, auth=auth, **verify_kwarg)
 
 
+def get_concurrent_results(function, items, workers=8):
+    """
+    apply `function` to each entry of `items` on a thread pool; failures are returned in place of results
+    so that one bad request does not interrupt a batch
+
+    Arguments:
+        function (callable): function accepting a single item
+        items (iterable): the items to process (i.e. station IDs, water years or URLs)
+        workers (int): number of worker threads
+    Returns:
+        results (dict): map of each item to its result or the raised exception, in input order
+    """
+    items = list(items)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {item: executor.submit(function, item) for item in items}
+
+    results = {}
+    for item, future in futures.items():
+        error = future.exception()
+        results[item] = future.result() if error is None else error
+    return results
+
+
+def get_cache_dir(*subdirectories):
+    """
+    path to the local cache directory used by collect, optionally nested by source; the base
+    directory is set with the COLLECT_CACHE_DIR environment variable (default ~/.collect)
+
+    Arguments:
+        subdirectories (str): optional subdirectory names (i.e. 'dwr', 'cdec')
+    Returns:
+        path (pathlib.Path): the cache directory, created if it does not exist
+    """
+    path = pathlib.Path(os.getenv('COLLECT_CACHE_DIR', pathlib.Path.home().joinpath('.collect')))
+    path = path.joinpath(*subdirectories)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def get_cached_content(url, cache_dir, session=None, verify=None, revalidate=True):
+    """
+    return URL content from a local cache, revalidating with a conditional request (ETag/Last-Modified)
+    so that unchanged resources are not downloaded again
+
+    Arguments:
+        url (str): valid web URL
+        cache_dir (pathlib.Path): directory storing cached content and its validators
+        session (requests.Session): optional session for connection reuse
+        verify (bool or ssl.CERT_NONE): if provided, this verify parameter is passed to session.get
+        revalidate (bool): if False, cached content is returned without a request
+    Returns:
+        content (bytes): the resource content
+        changed (bool): flag to indicate the content differs from the previously cached copy
+    """
+    key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    content_path = pathlib.Path(cache_dir).joinpath(f'{key}.bin')
+    manifest_path = pathlib.Path(cache_dir).joinpath(f'{key}.json')
+
+    manifest = {}
+    if content_path.exists() and manifest_path.exists():
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        if not revalidate:
+            return content_path.read_bytes(), False
+
+    # conditional request headers from the cached response
+    headers = {}
+    if manifest.get('etag'):
+        headers['If-None-Match'] = manifest['etag']
+    if manifest.get('last_modified'):
+        headers['If-Modified-Since'] = manifest['last_modified']
+
+    verify_kwarg = {} if verify is None else {'verify': verify}
+    response = (session or get_session(pool_size=1)).get(url, headers=headers, **verify_kwarg)
+    if response.status_code == 304:
+        return content_path.read_bytes(), False
+    response.raise_for_status()
+
+    content = response.content
+    digest = hashlib.sha256(content).hexdigest()
+    changed = digest != manifest.get('sha256')
+    if changed:
+        content_path.write_bytes(content)
+
+    with open(manifest_path, 'w') as f:
+        json.dump({'url': url,
+                   'etag': response.headers.get('ETag'),
+                   'last_modified': response.headers.get('Last-Modified'),
+                   'sha256': digest,
+                   'retrieved': dt.datetime.now().isoformat(timespec='seconds')}, f, indent=4)
+
+    return content, changed
+
+
 def get_web_status(url):
     """
     check status of a URL
@@ -100,6 +221,229 @@ def get_water_year(datetime_structure):
     return datetime_structure.year + 1
 
 
+def serialize_columns(df, fp=None, timestamps='epoch', tz=None, chunk_size=100000):
+    """
+    serialize a date/time-indexed dataframe to columnar JSON bytes, {"columns": [...], "index": [...],
+    "data": [[...], ...]}, with one array of timestamps and one value array per column; missing values are
+    written as null. The dataframe is not modified, and rows are encoded `chunk_size` at a time so that
+    large frames can be streamed to `fp`.
+
+    Epoch timestamps require a timezone: a naive index is localized to `tz` first, and a ValueError is raised
+    for a naive index without `tz`. The repeated hour at the end of daylight saving time is inferred from
+    the order of a monotonic index, and raises for an unordered index. Aware (or localized) ISO timestamps are written in UTC with a 'Z' suffix;
+    a naive index without `tz` is written as naive ISO strings.
+
+    Arguments:
+        df (pandas.DataFrame): a pandas dataframe with date/time index
+        fp (file-like): optional binary file object; if provided, the JSON is written to `fp`
+        timestamps (str): 'epoch' for milliseconds since 1970-01-01 UTC, or 'iso' for ISO 8601 strings
+        tz (str): timezone of a naive index (i.e. 'US/Pacific'); ignored for a timezone-aware index
+        chunk_size (int): number of rows encoded per write
+    Returns:
+        content (bytes): the JSON content, or None if written to `fp`
+    """
+    if timestamps not in ('epoch', 'iso'):
+        raise ValueError(f'timestamps must be "epoch" or "iso", not "{timestamps}"')
+
+    index = pd.DatetimeIndex(df.index)
+    if index.tz is None and tz is not None:
+        # the repeated fall-back hour is inferred from the order of a monotonic index; otherwise it raises
+        index = index.tz_localize(tz,
+                                  ambiguous='infer' if index.is_monotonic_increasing else 'raise',
+                                  nonexistent='shift_forward')
+    elif index.tz is None and timestamps == 'epoch':
+        raise ValueError('epoch timestamps require a timezone-aware index or `tz`')
+
+    missing = index.isna()
+    if timestamps == 'epoch':
+        index = (index.asi8 // 10**6).astype(object)
+    elif index.tz is not None:
+        index = np.datetime_as_string(index.tz_convert('UTC').tz_localize(None).values, unit='s').astype(object) + 'Z'
+    else:
+        index = np.datetime_as_string(index.values, unit='s').astype(object)
+    index[missing] = None
+
+    buffer = io.BytesIO() if fp is None else fp
+    encoder = json.JSONEncoder(separators=(',', ':'), default=str)
+
+    def _write_array(values):
+        buffer.write(b'[')
+        for start in range(0, len(values), chunk_size):
+            if start > 0:
+                buffer.write(b',')
+            buffer.write(encoder.encode(values[start:start + chunk_size].tolist())[1:-1].encode('utf-8'))
+        buffer.write(b']')
+
+    buffer.write(b'{"columns":')
+    buffer.write(encoder.encode([list(x) if isinstance(x, tuple) else x for x in df.columns]).encode('utf-8'))
+    buffer.write(b',"index":')
+    _write_array(index)
+    buffer.write(b',"data":[')
+    for i in range(df.shape[1]):
+        if i > 0:
+            buffer.write(b',')
+        column = df.iloc[:, i]
+        values = column.to_numpy(dtype=object, copy=True)
+        values[column.isna().to_numpy()] = None
+        _write_array(values)
+    buffer.write(b']}')
+    return buffer.getvalue() if fp is None else None
+
+
+def parse_iso_datetimes(values, tz='UTC'):
+    """
+    parse ISO 8601 date/time strings (YYYY-MM-DDTHH:MM[:SS][Z|+HH:MM|-HH:MM]) in a single vectorized pass over
+    their integer components; hour 24 is handled arithmetically as midnight at the end of the day (2400 convention).
+    Strings without a UTC offset are interpreted as local time in `tz`; the repeated fall-back hour is inferred
+    from the order of the strings.
+
+    Arguments:
+        values (list, array, pandas.Index): date/time strings
+        tz (str): timezone for the result (i.e. 'US/Pacific')
+    Returns:
+        (pandas.DatetimeIndex): timezone-aware index in `tz`
+    """
+    strings = np.asarray(values, dtype=str)
+    result = np.empty(len(strings), dtype='datetime64[ns]')
+    aware = np.zeros(len(strings), dtype=bool)
+
+    # fixed-position parsing requires equal-length strings; group by length
+    lengths = np.char.str_len(strings)
+    for length in np.unique(lengths):
+        mask = lengths == length
+        parsed = _parse_iso_components(strings[mask], int(length))
+        if parsed is None:
+            # non-standard layout; defer to the general parser
+            parsed = _parse_iso_fallback(strings[mask])
+        result[mask], aware[mask] = parsed
+
+    index = pd.DatetimeIndex(result)
+    if aware.all():
+        return index.tz_localize('UTC').tz_convert(tz)
+    if not aware.any():
+        return _localize(index, tz)
+
+    # mixed offsets and local times
+    local = _localize(pd.DatetimeIndex(result[~aware]), tz)
+    utc = pd.Series(index.tz_localize('UTC'))
+    utc[~aware] = local.tz_convert('UTC')
+    return pd.DatetimeIndex(utc).tz_convert(tz)
+
+
+def _localize(index, tz):
+    """
+    localize naive local times; the repeated hour at the end of daylight saving time is inferred from the
+    order of a monotonic index, and raises for an unordered index
+
+    Arguments:
+        index (pandas.DatetimeIndex): naive local date/times
+        tz (str): timezone of the local times
+    Returns:
+        (pandas.DatetimeIndex): timezone-aware index in `tz`
+    """
+    return index.tz_localize(tz,
+                             ambiguous='infer' if index.is_monotonic_increasing else 'raise',
+                             nonexistent='shift_forward')
+
+
+def _parse_iso_components(strings, length):
+    """
+    Arguments:
+        strings (numpy.ndarray): equal-length ISO 8601 date/time strings
+        length (int): the string length
+    Returns:
+        (tuple): naive datetime64 values (UTC where an offset is present) and the offset flag, or None if
+            the strings do not match a supported layout
+    """
+    seconds = length >= 19 and length != 22 and length != 17
+    offset_position = 19 if seconds else 16
+    if length not in (16, 17, 19, 20, 22, 25):
+        return None
+
+    try:
+        codes = strings.astype(f'S{length}').view(np.uint8).reshape(len(strings), length).astype(np.int64)
+    except (UnicodeEncodeError, ValueError):
+        return None
+
+    digits = codes - ord('0')
+
+    def _number(*positions):
+        value = np.zeros(len(strings), dtype=np.int64)
+        for i in positions:
+            value = value * 10 + digits[:, i]
+        return value
+
+    # validate digit and separator positions
+    digit_positions = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15] + ([17, 18] if seconds else [])
+    if ((digits[:, digit_positions] < 0) | (digits[:, digit_positions] > 9)).any():
+        return None
+    if not ((codes[:, 4] == ord('-')).all() and (codes[:, 7] == ord('-')).all()
+            and np.isin(codes[:, 10], [ord('T'), ord(' ')]).all() and (codes[:, 13] == ord(':')).all()):
+        return None
+
+    years, months, days = _number(0, 1, 2, 3), _number(5, 6), _number(8, 9)
+    hours, minutes = _number(11, 12), _number(14, 15)
+    secs = _number(17, 18) if seconds else np.zeros(len(strings), dtype=np.int64)
+    total_seconds = hours * 3600 + minutes * 60 + secs
+
+    # validate component ranges; hour 24 is only valid as 24:00:00
+    month_starts = ((years - 1970) * 12 + np.clip(months, 1, 12) - 1).astype('datetime64[M]')
+    days_in_month = ((month_starts + 1).astype('datetime64[D]') - month_starts.astype('datetime64[D]')).astype(int)
+    valid = ((months >= 1) & (months <= 12) & (days >= 1) & (days <= days_in_month)
+             & (minutes <= 59) & (secs <= 59) & ((hours < 24) | ((hours == 24) & (minutes == 0) & (secs == 0))))
+
+    # UTC offset (Z, +HH:MM or -HH:MM)
+    aware = length > offset_position
+    if aware:
+        designator = codes[:, offset_position]
+        if length == offset_position + 1:
+            if not (designator == ord('Z')).all():
+                return None
+        else:
+            if not np.isin(designator, [ord('+'), ord('-')]).all():
+                return None
+            sign = np.where(designator == ord('-'), -1, 1)
+            offset_hours = _number(offset_position + 1, offset_position + 2)
+            offset_minutes = _number(offset_position + 4, offset_position + 5)
+            valid &= (offset_hours <= 23) & (offset_minutes <= 59)
+            total_seconds = total_seconds - sign * (offset_hours * 60 + offset_minutes) * 60
+
+    # assemble dates from integer components; hour 24 rolls over to the next day through the seconds offset
+    dates = month_starts.astype('datetime64[D]') + (days - 1).astype('timedelta64[D]')
+    values = dates.astype('datetime64[ns]') + total_seconds.astype('timedelta64[s]')
+    aware = np.full(len(strings), aware)
+
+    # out-of-range components are deferred to the general parser, which raises for invalid dates
+    if not valid.all():
+        values[~valid], aware[~valid] = _parse_iso_fallback(strings[~valid])
+    return values, aware
+
+
+def _parse_iso_fallback(strings):
+    """
+    general (slower) parser for date/time strings that do not match a fixed ISO 8601 layout
+
+    Arguments:
+        strings (numpy.ndarray): date/time strings
+    Returns:
+        (tuple): naive datetime64 values (UTC where an offset is present) and the offset flag
+    """
+    group = pd.Index(strings)
+    aware = np.asarray(group.str.contains(r'(?:Z|[+-]\d{2}:?\d{2})$', regex=True), dtype=bool)
+    # only 24:00[:00] rolls over to the next day; other hour 24 times are left for pandas to reject
+    rollover = pd.to_timedelta(group.str.contains(r'[T ]24(?::00){0,2}(?:$|Z|[+-])', regex=True).astype(int),
+                               unit='D')
+    group = group.str.replace(r'([T ])24((?::00){0,2})(?=$|Z|[+-])', r'\g<1>00\g<2>', regex=True)
+
+    values = np.empty(len(strings), dtype='datetime64[ns]')
+    if aware.any():
+        values[aware] = (pd.to_datetime(group[aware], utc=True, errors='raise')
+                         + rollover[aware]).tz_convert(None).values
+    if not aware.all():
+        values[~aware] = (pd.to_datetime(group[~aware], errors='raise') + rollover[~aware]).values
+    return values, aware
+
+
 def get_localized_datetime(naive_datetime, timezone_string):
     """
     provides cross-version support for python versions before existence of zoneinfo module
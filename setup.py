@@ -22,6 +22,7 @@ setuptools.setup(
         'beautifulsoup4==4.12.3',
         'html5lib==1.1',
         'pandas==1.5.3',
+        'pyarrow==14.0.2',
         'pyOpenSSL==23.3.0',
         'python-dateutil==2.9.0',
         'python-dotenv==1.0.0',
@@ -35,6 +36,7 @@ setuptools.setup(
             'sphinx-readable-theme==1.3.0', 
             'sphinx-rtd-theme==1.0.0'
         ],
+        'cvo': 'jpype1==1.5.0',
         'filters': 'scipy==1.10.1',
         'swp': 'pdftotext==2.2.2'
     },